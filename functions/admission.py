@@ -0,0 +1,265 @@
+import collections
+import contextvars
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+###############################################################################
+# Memory-aware Admission Control
+###############################################################################
+# Scratch files live in /tmp, which on Cloud Functions is RAM, so a few large
+# conversions at once (GLB on disk, mesh arrays, STL and other outputs) can
+# OOM-kill the instance and every request on it. Each request reserves its
+# estimated footprint from a fixed budget before doing the work:
+#  - estimate(stage, input_bytes) = base + factor * input size, per stage
+#    (FOOTPRINTS); an unknown input size is assumed to be DEFAULT_INPUT_BYTES
+#  - the reservation follows the request in a contextvar; once the real size
+#    is known (Content-Length, or the finished download) note_input_size()
+#    re-estimates it, which can wait or reject before the body is streamed;
+#    growing gives its bytes back and queues again at the new size
+#  - waiters are served first come, first served; if a reservation doesn't
+#    fit within max_wait seconds, AdmissionRejected carries a Retry-After
+#    based on how long reservations have recently been held
+#  - an idle budget admits anything, so one oversized request still runs
+#  - memory held outside any reservation (external_usage, e.g. the RSS of
+#    warm Blender workers) is taken off the budget while it is held
+# stats() reports reserved/available bytes, queue depth, outcomes and the
+# measured cgroup memory and tmpfs usage next to the reservations.
+
+MB = 1024 * 1024
+DEFAULT_INPUT_BYTES = int(os.environ.get('ADMISSION_DEFAULT_INPUT_MB', 32)) * MB
+
+# stage -> (base bytes, bytes per input byte). 'convert' is sized from the
+# benchmark corpus: peak RSS is ~11x the GLB, plus the GLB and STL in tmpfs.
+FOOTPRINTS = {
+    'download': (16 * MB, 1.0),
+    'convert': (64 * MB, float(os.environ.get('ADMISSION_CONVERT_FACTOR', 15))),
+    'generate': (int(os.environ.get('ADMISSION_GENERATE_MB', 384)) * MB, 1.0),
+}
+
+# reserve(max_wait=DEFAULT_WAIT) uses the controller's max_wait
+DEFAULT_WAIT = object()
+
+# How often waiters re-check external_usage, which changes without notifying them
+EXTERNAL_POLL_SECONDS = 1.0
+
+CGROUP_MEMORY_FILES = ('/sys/fs/cgroup/memory.current', '/sys/fs/cgroup/memory/memory.usage_in_bytes')
+
+
+class AdmissionRejected(Exception):
+    """Not enough memory budget within the wait limit. Respond 429 + Retry-After."""
+
+    def __init__(self, message: str, retry_after: int, needed: int, available: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.needed = needed
+        self.available = available
+
+
+def cgroup_memory_usage():
+    """Container memory in use (includes tmpfs pages), or None outside a cgroup."""
+    for path in CGROUP_MEMORY_FILES:
+        try:
+            with open(path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def is_tmpfs(path: str) -> bool:
+    try:
+        with open('/proc/mounts') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    best, fs_type = '', None
+    for fields in mounts:
+        if len(fields) >= 3 and (path == fields[1] or path.startswith(fields[1].rstrip('/') + '/')):
+            if len(fields[1]) > len(best):
+                best, fs_type = fields[1], fields[2]
+    return fs_type == 'tmpfs'
+
+
+_current = contextvars.ContextVar('admission_reservation', default=None)
+
+
+class Reservation:
+    def __init__(self, controller, stage: str, nbytes: int, input_bytes, max_wait):
+        self.controller = controller
+        self.stage = stage
+        self.bytes = nbytes
+        self.input_bytes = input_bytes
+        self.max_wait = max_wait
+        self.start = controller.clock()
+
+    def update_input(self, input_bytes: int):
+        """Re-estimates for the real input size; growing may wait or raise AdmissionRejected."""
+        if input_bytes is None or input_bytes == self.input_bytes:
+            return
+        self.input_bytes = input_bytes
+        self.controller._resize(self, self.controller.estimate(self.stage, input_bytes))
+
+
+class MemoryAdmission:
+    def __init__(self, capacity_bytes: int, max_wait: float = 10.0, footprints: dict = None,
+                 usage_probe=cgroup_memory_usage, tmp_dir: str = None, clock=time.monotonic,
+                 external_usage=None):
+        self.capacity = int(capacity_bytes)
+        self.external_usage = external_usage
+        self.max_wait = max_wait
+        self.footprints = dict(FOOTPRINTS, **(footprints or {}))
+        self.usage_probe = usage_probe
+        self.tmp_dir = tmp_dir or tempfile.gettempdir()
+        self.tmp_is_memory = is_tmpfs(self.tmp_dir)
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._waiting = collections.deque()
+        self._active = set()
+        self.reserved = 0
+        self.peak_reserved = 0
+        self._hold_ewma = None
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "resized": 0, "oversized": 0}
+        self.wait_seconds = 0.0
+
+    def estimate(self, stage: str, input_bytes: int = None) -> int:
+        base, factor = self.footprints[stage]
+        return int(base + factor * (DEFAULT_INPUT_BYTES if input_bytes is None else input_bytes))
+
+    def _external_bytes(self) -> int:
+        if self.external_usage is None:
+            return 0
+        try:
+            return max(int(self.external_usage()), 0)
+        except Exception as e:
+            print(f"[admission] external_usage failed: {e}")
+            return 0
+
+    def available(self) -> int:
+        return max(self.capacity - self._external_bytes() - self.reserved, 0)
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.reserved == 0 or self.reserved + nbytes <= self.capacity - self._external_bytes()
+
+    def _wait(self, remaining):
+        if self.external_usage is not None:
+            remaining = EXTERNAL_POLL_SECONDS if remaining is None else min(remaining, EXTERNAL_POLL_SECONDS)
+        self._cond.wait(remaining)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: about one recent reservation lifetime."""
+        hold = self._hold_ewma if self._hold_ewma is not None else 10.0
+        return int(min(max(round(hold), 1), 120))
+
+    def _reject(self, stage: str, nbytes: int):
+        self.counters['rejected'] += 1
+        available = self.available()
+        raise AdmissionRejected(
+            f"Not enough memory for {stage}: needs {nbytes // MB} MB, {available // MB} MB of "
+            f"{self.capacity // MB} MB available", self.retry_after(), nbytes, available)
+
+    def _acquire(self, stage: str, nbytes: int, max_wait, outcome: str = 'admitted'):
+        ticket = object()
+        start = self.clock()
+        deadline = None if max_wait is None else start + max_wait
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                queued = False
+                while not (self._waiting[0] is ticket and self._fits(nbytes)):
+                    remaining = None if deadline is None else deadline - self.clock()
+                    if remaining is not None and remaining <= 0:
+                        self._reject(stage, nbytes)
+                    if not queued:
+                        queued = True
+                        self.counters['queued'] += 1
+                    self._wait(remaining)
+                if nbytes > self.capacity:
+                    self.counters['oversized'] += 1
+                self.reserved += nbytes
+                self.peak_reserved = max(self.peak_reserved, self.reserved)
+                self.counters[outcome] += 1
+                self.wait_seconds += self.clock() - start
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def _resize(self, reservation: Reservation, nbytes: int):
+        with self._cond:
+            held = reservation.bytes
+            self.reserved -= held
+            reservation.bytes = 0
+            if nbytes <= held:
+                self.reserved += nbytes
+                reservation.bytes = nbytes
+                self.counters['resized'] += 1
+            self._cond.notify_all()
+        if nbytes > held:
+            # Growing gives its bytes back and queues at the end: holding them while waiting
+            # for more lets two growers wait on each other for good
+            self._acquire(reservation.stage, nbytes, reservation.max_wait, outcome='resized')
+            with self._cond:
+                reservation.bytes = nbytes
+
+    def _release(self, reservation: Reservation):
+        held = self.clock() - reservation.start
+        with self._cond:
+            self._active.discard(reservation)
+            self.reserved -= reservation.bytes
+            self._hold_ewma = held if self._hold_ewma is None else 0.8 * self._hold_ewma + 0.2 * held
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, stage: str, input_bytes: int = None, max_wait=DEFAULT_WAIT):
+        """Holds the stage's estimated footprint for the block. max_wait=None waits indefinitely."""
+        max_wait = self.max_wait if max_wait is DEFAULT_WAIT else max_wait
+        nbytes = self.estimate(stage, input_bytes)
+        self._acquire(stage, nbytes, max_wait)
+        reservation = Reservation(self, stage, nbytes, input_bytes, max_wait)
+        with self._cond:
+            self._active.add(reservation)
+        token = _current.set(reservation)
+        try:
+            yield reservation
+        finally:
+            _current.reset(token)
+            self._release(reservation)
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(
+                self.counters,
+                capacity_bytes=self.capacity,
+                reserved_bytes=self.reserved,
+                available_bytes=self.available(),
+                external_bytes=self._external_bytes(),
+                peak_reserved_bytes=self.peak_reserved,
+                active=len(self._active),
+                waiting=len(self._waiting),
+                wait_seconds=round(self.wait_seconds, 3),
+                retry_after=self.retry_after(),
+            )
+        usage = self.usage_probe() if self.usage_probe else None
+        if usage is not None:
+            stats['cgroup_usage_bytes'] = usage
+        try:
+            stats['tmp_used_bytes'] = shutil.disk_usage(self.tmp_dir).used
+            stats['tmp_is_memory'] = self.tmp_is_memory
+        except OSError:
+            pass
+        return stats
+
+
+def current():
+    return _current.get()
+
+
+def note_input_size(input_bytes: int):
+    """Re-estimates the active request's reservation (no-op outside one)."""
+    reservation = _current.get()
+    if reservation is not None:
+        reservation.update_input(input_bytes)
@@ -0,0 +1,172 @@
+import contextlib
+import contextvars
+import os
+import shutil
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import glb_engine
+import mesh_analysis
+import mesh_formats
+
+###############################################################################
+# Batch Conversion
+###############################################################################
+# BatchRunner pushes many designs through download -> convert -> upload in
+# one request:
+#  - each item runs its stages in order on a pool of `concurrency` threads,
+#    so downloads and uploads of some items overlap other items' conversions
+#  - at most `convert_slots` conversions run at once (the size of the
+#    converter process pool); the rest wait for a slot, not for a thread
+#  - items fail independently: the error is recorded on that item and the
+#    rest of the batch carries on
+# The stage functions are passed in, so the runner works the same against
+# Firebase Storage or local_storage.LocalBucket and file:// URLs.
+#
+# convert_item() is the converter side: numpy engine plus every requested
+# format (and the mesh analysis), from the same arrays. It's a module-level function so it
+# can run in a ProcessPoolExecutor worker; only paths and stats cross the
+# process boundary, never the mesh.
+
+STAGES = ('admission', 'download', 'convert', 'upload')
+
+
+def write_formats(vertices, faces, stl_path: str, out_dir: str, design_id: str, formats: list) -> dict:
+    """Writes every requested format next to the STL. Returns {format: {path, file_size, write_time}}."""
+    files = {}
+    for name in formats:
+        spec = mesh_formats.FORMATS[name]
+        start = time.perf_counter()
+        if name == 'stl':
+            path, file_size = stl_path, os.path.getsize(stl_path)
+        else:
+            path = os.path.join(out_dir, f"{design_id}{spec['suffix']}")
+            file_size = spec['writer'](path, vertices, faces)
+        files[name] = {"path": path, "file_size": file_size, "write_time": round(time.perf_counter() - start, 4)}
+    return files
+
+
+def convert_item(glb_path: str, out_dir: str, design_id: str, formats: list, analyze: bool = True) -> dict:
+    """Numpy-engine conversion of one design (runs in a converter worker process)."""
+    start = time.perf_counter()
+    stl_path = os.path.join(out_dir, f"{design_id}.stl")
+    vertices, faces, stats = glb_engine.convert_glb(glb_path, stl_path)
+    files = write_formats(vertices, faces, stl_path, out_dir, design_id, formats)
+    return {
+        "engine": "numpy",
+        "stats": stats,
+        "stl_path": stl_path,
+        "files": files,
+        "analysis": mesh_analysis.analyze_mesh(vertices, faces) if analyze else None,
+        "worker_pid": os.getpid(),
+        "convert_time": round(time.perf_counter() - start, 4),
+    }
+
+
+class BatchRunner:
+    """
+    download(item, work_dir) -> dict with at least 'path'
+    lookup(item, downloaded) -> finished result dict, or None to convert
+    admit(item) -> context manager held around the item's stages (memory admission)
+    convert(item, downloaded, work_dir) -> dict (e.g. convert_item's result)
+    upload(item, downloaded, converted) -> finished result dict
+    """
+
+    def __init__(self, download, convert, upload, lookup=None, admit=None, concurrency: int = 8,
+                 convert_slots: int = 1, clock=time.perf_counter):
+        self.download = download
+        self.convert = convert
+        self.upload = upload
+        self.lookup = lookup
+        self.admit = admit or (lambda item: contextlib.nullcontext())
+        self.concurrency = max(1, concurrency)
+        self.convert_slots = max(1, convert_slots)
+        self.clock = clock
+        self._slots = threading.BoundedSemaphore(self.convert_slots)
+
+    def _run_item(self, index: int, item: dict, work_dir: str) -> dict:
+        item_dir = os.path.join(work_dir, f"item{index}")
+        os.makedirs(item_dir, exist_ok=True)
+        timings = {}
+        stage = 'admission'
+        start = self.clock()
+        try:
+            with self.admit(item):
+                timings['admission'] = self.clock() - start
+                stage = 'download'
+                stage_start = self.clock()
+                downloaded = self.download(item, item_dir)
+                timings['download'] = self.clock() - stage_start
+
+                cached = self.lookup(item, downloaded) if self.lookup else None
+                if cached is not None:
+                    return dict(cached, designId=item['designId'], success=True,
+                                timings=_rounded(timings), item_time=round(self.clock() - start, 3))
+
+                stage = 'convert'
+                with self._slots:
+                    stage_start = self.clock()
+                    converted = self.convert(item, downloaded, item_dir)
+                    timings['convert'] = self.clock() - stage_start
+
+                stage = 'upload'
+                stage_start = self.clock()
+                result = self.upload(item, downloaded, converted)
+                timings['upload'] = self.clock() - stage_start
+
+            return dict(result, designId=item['designId'], success=True,
+                        timings=_rounded(timings), item_time=round(self.clock() - start, 3))
+        except Exception as e:
+            print(f"[batch] {item['designId']} failed during {stage}: {e}")
+            print(f"Error traceback: {traceback.format_exc()}")
+            return {
+                "designId": item['designId'],
+                "success": False,
+                "stage": stage,
+                "error": str(e),
+                "timings": _rounded(timings),
+                "item_time": round(self.clock() - start, 3),
+            }
+        finally:
+            # /tmp is memory on Cloud Functions; don't hold finished items until the batch ends
+            shutil.rmtree(item_dir, ignore_errors=True)
+
+    def run(self, items: list, work_dir: str) -> dict:
+        """Runs every item. Returns {"results": [...] in input order, "batch": {...}}."""
+        start = self.clock()
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, max(len(items), 1)),
+                                thread_name_prefix='batch') as executor:
+            # Copy the caller's context per item so spans land on its request trace
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._run_item, index, item, work_dir)
+                for index, item in enumerate(items)
+            ]
+            results = [future.result() for future in futures]
+        wall_time = self.clock() - start
+
+        succeeded = [result for result in results if result['success']]
+        stage_seconds = {
+            name: round(sum(result['timings'].get(name, 0.0) for result in results), 3)
+            for name in STAGES
+        }
+        return {
+            "results": results,
+            "batch": {
+                "items": len(items),
+                "succeeded": len(succeeded),
+                "failed": len(results) - len(succeeded),
+                "cached": sum(1 for result in succeeded if result.get('cache') not in (None, 'miss', 'disabled')),
+                "wall_time": round(wall_time, 3),
+                "designs_per_minute": round(len(succeeded) * 60.0 / wall_time, 2) if wall_time > 0 else None,
+                # Summed per-item stage times; more than wall_time means the stages overlapped
+                "stage_seconds": stage_seconds,
+                "concurrency": self.concurrency,
+                "convert_slots": self.convert_slots,
+            },
+        }
+
+
+def _rounded(timings: dict) -> dict:
+    return {name: round(seconds, 4) for name, seconds in timings.items()}
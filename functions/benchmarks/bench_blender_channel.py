@@ -0,0 +1,170 @@
+"""
+Blender progress channel (blender_channel.py) against a stub conversion.
+
+    python benchmarks/bench_blender_channel.py
+    python benchmarks/bench_blender_channel.py --noise-lines 1000000 --stall-timeout 2
+
+The stub (this file's `_stub` mode) speaks the same channel as the Blender
+script: progress per step, then a result or an error. Scenarios:
+  ok       five steps, then the STL; progress must arrive while it runs
+  noisy    one log line per face, as a bad mesh used to produce; the host
+           must keep only the last lines and stay within its memory
+  stall    stops reporting after 'import'; must be killed after
+           --stall-timeout, long before --timeout
+  chatty   a step that reports nothing for twice --stall-timeout but keeps
+           printing; output counts as liveness, so it must finish
+  fail     raises during 'prepare'; the error, stage and traceback come back
+  no_result exits 0 without reporting a result
+Exits with status 1 when a scenario does not behave as expected.
+
+The same stub can stand in for Blender in main.py:
+    BLENDER_MODE=spawn CONVERSION_ENGINE=blender \\
+    BLENDER_SCRIPT_COMMAND="python benchmarks/bench_blender_channel.py _stub --mode ok"
+"""
+import argparse
+import os
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+import blender_channel
+
+STEPS = ('import', 'join', 'prepare', 'validate', 'export')
+
+
+###############################################################################
+# Stub (child side)
+###############################################################################
+def stub(mode: str, glb_path: str, stl_path: str, step_seconds: float, noise_lines: int, stall_timeout: float):
+    def convert():
+        for step in STEPS:
+            time.sleep(step_seconds)
+            print(f"Running {step}...")
+            if mode == 'noisy' and step == 'validate':
+                for face in range(noise_lines):
+                    print(f"Warning: Face {face} has zero area")
+            if mode == 'stall' and step == 'join':
+                time.sleep(3600)
+            if mode == 'chatty' and step == 'join':
+                for _ in range(int(2 * stall_timeout / 0.1)):
+                    print("Still joining...", flush=True)
+                    time.sleep(0.1)
+            if mode == 'fail' and step == 'prepare':
+                raise RuntimeError("Non-manifold geometry could not be triangulated")
+            blender_channel.progress(step, step_index=STEPS.index(step))
+        # A one-triangle binary STL, so the host's post-processing has something to read
+        with open(stl_path, 'wb') as f:
+            f.write(b'\0' * 80 + struct.pack('<I', 1))
+            f.write(struct.pack('<12fH', 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0))
+        return {"file_size": os.path.getsize(stl_path)}
+
+    if mode == 'no_result':
+        print("Exiting without a result")
+        return
+    blender_channel.run_main(convert)
+
+
+###############################################################################
+# Scenarios (host side)
+###############################################################################
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_scenario(mode: str, args) -> dict:
+    work_dir = tempfile.mkdtemp()
+    try:
+        glb_path = os.path.join(work_dir, 'in.glb')
+        with open(glb_path, 'wb') as f:
+            f.write(os.urandom(4096))
+        command = [sys.executable, os.path.abspath(__file__), '_stub', '--mode', mode,
+                   '--step-seconds', str(args.step_seconds), '--noise-lines', str(args.noise_lines),
+                   '--stall-timeout', str(args.stall_timeout),
+                   glb_path, os.path.join(work_dir, 'out.stl')]
+        arrivals = []
+        start = time.monotonic()
+        outcome = {"mode": mode, "ok": False, "error": None, "stage": None}
+        try:
+            run = blender_channel.run_script(
+                command, stall_timeout=args.stall_timeout, timeout=args.timeout,
+                on_progress=lambda stage, data, seconds: arrivals.append((stage, time.monotonic() - start)))
+            outcome.update(ok=True, stages=[s['stage'] for s in run['stages']], log_lines=run['log_lines'],
+                           dropped_log_lines=run['dropped_log_lines'], tail_chars=len(run['log_tail']))
+        except blender_channel.ScriptError as e:
+            outcome.update(error=type(e).__name__, stage=e.stage, message=str(e),
+                           has_traceback=bool(e.worker_traceback), tail_chars=len(e.log_tail))
+        seconds = time.monotonic() - start
+        outcome['seconds'] = round(seconds, 2)
+        # Streaming: the first step is seen well before the process finishes
+        outcome['first_progress'] = round(arrivals[0][1], 2) if arrivals else None
+        outcome['peak_rss_mb'] = peak_rss_mb()
+        return outcome
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def expected(outcome: dict, args) -> bool:
+    mode = outcome['mode']
+    if mode == 'ok':
+        return (outcome['ok'] and outcome['stages'] == list(STEPS)
+                and outcome['first_progress'] < outcome['seconds'] - args.step_seconds)
+    if mode == 'noisy':
+        return (outcome['ok'] and outcome['log_lines'] >= args.noise_lines
+                and outcome['dropped_log_lines'] >= args.noise_lines - blender_channel.LOG_LINES)
+    if mode == 'stall':
+        return outcome['error'] == 'ScriptStalled' and outcome['seconds'] < args.stall_timeout + 5
+    if mode == 'chatty':
+        return outcome['ok'] and outcome['seconds'] > 2 * args.stall_timeout
+    if mode == 'fail':
+        return outcome['error'] == 'ScriptError' and outcome['stage'] == 'join' and outcome['has_traceback']
+    if mode == 'no_result':
+        return outcome['error'] == 'ScriptError'
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command')
+    stub_parser = sub.add_parser('_stub')
+    stub_parser.add_argument('--mode', default='ok')
+    stub_parser.add_argument('--step-seconds', type=float, default=0.2)
+    stub_parser.add_argument('--noise-lines', type=int, default=200000)
+    stub_parser.add_argument('--stall-timeout', type=float, default=2.0)
+    stub_parser.add_argument('glb_path')
+    stub_parser.add_argument('stl_path')
+    parser.add_argument('--modes', nargs='*', default=['ok', 'noisy', 'stall', 'chatty', 'fail', 'no_result'])
+    parser.add_argument('--step-seconds', type=float, default=0.2)
+    parser.add_argument('--noise-lines', type=int, default=200000)
+    parser.add_argument('--stall-timeout', type=float, default=2.0)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    if args.command == '_stub':
+        stub(args.mode, args.glb_path, args.stl_path, args.step_seconds, args.noise_lines, args.stall_timeout)
+        return 0
+
+    failed = []
+    print(f"{'mode':>10} {'ok':>5} {'seconds':>8} {'first':>6} {'log lines':>10} {'error':>14} {'stage':>9} "
+          f"{'rss MB':>7} {'expected':>9}")
+    for mode in args.modes:
+        outcome = run_scenario(mode, args)
+        good = expected(outcome, args)
+        if not good:
+            failed.append(mode)
+        print(f"{mode:>10} {str(outcome['ok']):>5} {outcome['seconds']:>8.2f} "
+              f"{outcome['first_progress'] if outcome['first_progress'] is not None else '-':>6} "
+              f"{outcome.get('log_lines', '-'):>10} {outcome['error'] or '-':>14} {outcome['stage'] or '-':>9} "
+              f"{outcome['peak_rss_mb']:>7} {'yes' if good else 'NO':>9}")
+    if failed:
+        print(f"\nUnexpected behaviour: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
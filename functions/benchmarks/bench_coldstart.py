@@ -0,0 +1,73 @@
+"""
+Cold-start import budget for main.py.
+
+    python benchmarks/bench_coldstart.py
+    python benchmarks/bench_coldstart.py --budget-ms 400 --repeat 5 --out coldstart.json
+
+Imports main.py in fresh interpreters with `python -X importtime`
+(coldstart.import_profile), keeps the fastest run, and prints the most
+expensive modules imported at load time. Exits with status 1 when the import
+takes longer than --budget-ms, or when a module that should load lazily
+(coldstart.DEFERRED_MODULES plus any --deferred) shows up at import time.
+
+Run it where the deployment's requirements are installed; Cloud Functions
+imports main.py the same way on every cold start.
+"""
+import argparse
+import json
+import os
+import sys
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+import coldstart
+
+
+def top_modules(profile: dict, count: int, depth: int) -> list:
+    """Most expensive modules at or above `depth` by cumulative import time."""
+    shallow = [m for m in profile['modules'] if m['depth'] <= depth]
+    return sorted(shallow, key=lambda m: m['cumulative_us'], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='main', help="module to import (default main)")
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    parser.add_argument('--repeat', type=int, default=3, help="runs; the fastest one is reported")
+    parser.add_argument('--deferred', nargs='*', default=[],
+                        help="more modules that must not be imported at load time")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--depth', type=int, default=1, help="import nesting depth shown in the table")
+    parser.add_argument('--out', help="write the fastest profile as JSON")
+    args = parser.parse_args()
+
+    profiles = [coldstart.import_profile(args.target, cwd=FUNCTIONS_DIR) for _ in range(max(1, args.repeat))]
+    failed = [p for p in profiles if not p['ok']]
+    profile = failed[0] if failed else min(profiles, key=lambda p: p['total_us'] or float('inf'))
+
+    if profile['ok']:
+        print(f"import {args.target}: {profile['total_us'] / 1000:.1f}ms "
+              f"(fastest of {len(profiles)}, {len(profile['modules'])} modules)")
+        print(f"\n{'module':>40} {'self ms':>9} {'cumulative ms':>14}")
+        for module in top_modules(profile, args.top, args.depth):
+            print(f"{'  ' * module['depth'] + module['name']:>40} {module['self_us'] / 1000:>9.1f} "
+                  f"{module['cumulative_us'] / 1000:>14.1f}")
+
+    if args.out:
+        with open(args.out, 'w') as fp:
+            json.dump(dict(profile, target=args.target, budget_ms=args.budget_ms), fp, indent=2)
+        print(f"\nProfile written to {args.out}")
+
+    violations = coldstart.check_budget(profile, args.budget_ms,
+                                        deferred=tuple(coldstart.DEFERRED_MODULES) + tuple(args.deferred))
+    if violations:
+        print(f"\n{len(violations)} cold-start budget violation(s):")
+        for line in violations:
+            print(f"  - {line}")
+        return 1
+    print(f"\nWithin the {args.budget_ms:.0f}ms budget; deferred modules stay deferred.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Conversion benchmark over the synthetic GLB corpus (glb_corpus.py).
+
+    python benchmarks/bench_conversion.py run --tier quick --out report.json
+    python benchmarks/bench_conversion.py run --tier full --baseline baseline.json --out report.json
+    python benchmarks/bench_conversion.py compare baseline.json report.json --latency-threshold 0.25
+
+For every corpus case, each stage of convert_glb_http runs against local
+stand-ins:
+  download   downloads.Download from a local HTTP server
+  load_mesh  glb_engine.load_glb_mesh + weld_vertices
+  convert    glb_engine.convert_glb_to_stl (the whole in-process conversion)
+  write_stl  stl_writer.write_binary_stl on the already-welded mesh
+  upload     local_storage.LocalBucket upload of the STL
+It records median/min latency, triangles per second, output size and the
+peak RSS of the process that ran the case. Each case runs in its own
+subprocess so the peak RSS belongs to that case only.
+
+Compare mode (or run --baseline) exits with status 1 when a case regresses
+past a threshold: latency or peak RSS grew by more than the given fraction,
+or the STL size changed by more than --size-threshold.
+"""
+import argparse
+import http.server
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import glb_corpus
+
+OPERATIONS = ('download', 'load_mesh', 'convert', 'write_stl', 'upload')
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'glb_corpus')
+
+
+###############################################################################
+# Running a Case (child process)
+###############################################################################
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def timed(fn, repeat: int):
+    """Returns (last result, list of durations)."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def run_case(name: str, glb_path: str, url: str, repeat: int) -> dict:
+    import downloads
+    import glb_engine
+    import local_storage
+    import stl_writer
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        bucket = local_storage.LocalBucket(os.path.join(work_dir, 'bucket'))
+        downloaded = os.path.join(work_dir, 'download.glb')
+        stl_path = os.path.join(work_dir, 'out.stl')
+        samples = {}
+
+        def download():
+            if os.path.exists(downloaded):
+                os.remove(downloaded)
+            job = downloads.Download(url, downloaded)
+            job.attempt()
+            return job.result()
+        _, samples['download'] = timed(download, repeat)
+
+        def load_mesh():
+            vertices, faces = glb_engine.load_glb_mesh(glb_path)
+            return glb_engine.weld_vertices(vertices, faces)
+        (vertices, faces), samples['load_mesh'] = timed(load_mesh, repeat)
+
+        stats, samples['convert'] = timed(lambda: glb_engine.convert_glb_to_stl(glb_path, stl_path), repeat)
+
+        write_path = os.path.join(work_dir, 'write.stl')
+        _, samples['write_stl'] = timed(lambda: stl_writer.write_binary_stl(write_path, vertices, faces), repeat)
+
+        _, samples['upload'] = timed(lambda: bucket.blob(f"conversions/{name}/{name}.stl")
+                                     .upload_from_filename(stl_path), repeat)
+
+        sizes = {
+            'download': os.path.getsize(downloaded),
+            'load_mesh': None,
+            'convert': stats['file_size'],
+            'write_stl': os.path.getsize(write_path),
+            'upload': stats['file_size'],
+        }
+        triangles = stats['source_faces']
+        operations = {}
+        for op in OPERATIONS:
+            median = statistics.median(samples[op])
+            operations[op] = {
+                "seconds": round(median, 6),
+                "min_seconds": round(min(samples[op]), 6),
+                "triangles_per_sec": round(triangles / median) if median else None,
+                "bytes": sizes[op],
+            }
+
+    return {
+        "triangles": triangles,
+        "output_faces": stats['faces'],
+        "output_vertices": stats['vertices'],
+        "glb_bytes": os.path.getsize(glb_path),
+        "peak_rss_mb": peak_rss_mb(),
+        "operations": operations,
+    }
+
+
+###############################################################################
+# Orchestration
+###############################################################################
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_directory(directory: str):
+    """Serves `directory` over HTTP on a free port. Returns (server, base_url)."""
+    handler = lambda *args, **kwargs: _QuietHandler(*args, directory=directory, **kwargs)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_case_isolated(name: str, glb_path: str, url: str, repeat: int) -> dict:
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '_case', '--name', name, '--glb', glb_path,
+         '--url', url, '--repeat', str(repeat)],
+        capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Case {name} failed:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(args) -> dict:
+    cases = glb_corpus.cases_for_tier(args.tier)
+    if args.cases:
+        cases = [case for case in cases if case['name'] in args.cases]
+    paths = glb_corpus.ensure_corpus(args.corpus_dir, cases, args.seed)
+    server, base_url = serve_directory(args.corpus_dir)
+
+    results = {}
+    try:
+        print(f"{'case':>26} {'tris':>10} {'convert s':>10} {'tri/s':>12} {'stl bytes':>12} {'rss MB':>8}")
+        for case in cases:
+            name = case['name']
+            url = f"{base_url}/{os.path.basename(paths[name])}"
+            if args.in_process:
+                result = run_case(name, paths[name], url, args.repeat)
+            else:
+                result = run_case_isolated(name, paths[name], url, args.repeat)
+            results[name] = result
+            convert = result['operations']['convert']
+            print(f"{name:>26} {result['triangles']:>10,} {convert['seconds']:>10.3f} "
+                  f"{convert['triangles_per_sec']:>12,} {convert['bytes']:>12,} {result['peak_rss_mb']:>8}")
+    finally:
+        server.shutdown()
+
+    return {
+        "meta": {
+            "created": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tier": args.tier,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "isolated": not args.in_process,
+        },
+        "cases": results,
+    }
+
+
+###############################################################################
+# Comparison
+###############################################################################
+def compare_reports(baseline: dict, current: dict, latency_threshold=0.2, rss_threshold=0.2,
+                    size_threshold=0.0, min_seconds=0.005) -> list:
+    """
+    Returns a list of regression descriptions. Latencies below min_seconds in
+    both reports are treated as noise.
+    """
+    regressions = []
+    for name, result in current['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            continue
+
+        for op in OPERATIONS:
+            old, new = base['operations'].get(op), result['operations'].get(op)
+            if not old or not new:
+                continue
+            if max(old['seconds'], new['seconds']) >= min_seconds and \
+                    new['seconds'] > old['seconds'] * (1 + latency_threshold):
+                regressions.append(f"{name}/{op}: latency {old['seconds']:.4f}s -> {new['seconds']:.4f}s "
+                                   f"(+{new['seconds'] / old['seconds'] - 1:.0%})")
+
+        old_size = base['operations']['convert']['bytes']
+        new_size = result['operations']['convert']['bytes']
+        if old_size and abs(new_size - old_size) / old_size > size_threshold:
+            regressions.append(f"{name}: STL size {old_size} -> {new_size} bytes")
+
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_threshold):
+            regressions.append(f"{name}: peak RSS {base['peak_rss_mb']} -> {result['peak_rss_mb']} MB")
+    return regressions
+
+
+def report_comparison(baseline: dict, current: dict, args) -> int:
+    regressions = compare_reports(baseline, current, args.latency_threshold, args.rss_threshold,
+                                  args.size_threshold, args.min_seconds)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) past thresholds:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\nNo regressions past thresholds.")
+    return 0
+
+
+def add_threshold_args(parser):
+    parser.add_argument('--latency-threshold', type=float, default=0.2,
+                        help="allowed fractional latency increase per operation (default 0.2)")
+    parser.add_argument('--rss-threshold', type=float, default=0.2,
+                        help="allowed fractional peak RSS increase per case (default 0.2)")
+    parser.add_argument('--size-threshold', type=float, default=0.0,
+                        help="allowed fractional STL size change per case (default 0)")
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help="ignore latency changes when both runs are faster than this")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="run the corpus and write a JSON report")
+    run.add_argument('--tier', choices=glb_corpus.TIERS, default='quick')
+    run.add_argument('--cases', nargs='+', help="only run these case names")
+    run.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--in-process', action='store_true',
+                     help="run cases in this process (faster, but peak RSS is cumulative)")
+    run.add_argument('--out', help="write the JSON report here")
+    run.add_argument('--baseline', help="compare against this report and exit 1 on regressions")
+    add_threshold_args(run)
+
+    compare = commands.add_parser('compare', help="compare two reports")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    add_threshold_args(compare)
+
+    case = commands.add_parser('_case')  # internal: one isolated case
+    case.add_argument('--name', required=True)
+    case.add_argument('--glb', required=True)
+    case.add_argument('--url', required=True)
+    case.add_argument('--repeat', type=int, default=3)
+
+    args = parser.parse_args()
+
+    if args.command == '_case':
+        print(json.dumps(run_case(args.name, args.glb, args.url, args.repeat)))
+        return 0
+
+    if args.command == 'compare':
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        with open(args.current) as fp:
+            current = json.load(fp)
+        return report_comparison(baseline, current, args)
+
+    report = run_benchmarks(args)
+    if args.out:
+        with open(args.out, 'w') as fp:
+            json.dump(report, fp, indent=2)
+        print(f"\nReport written to {args.out}")
+    if args.baseline:
+        with open(args.baseline) as fp:
+            return report_comparison(json.load(fp), report, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Retry, deadline and hedging behaviour against a local flaky HTTP server.
+
+    python benchmarks/bench_retries.py
+    python benchmarks/bench_retries.py --deadline 8 --hedge-after 0.5 --out retries.json
+
+Each scenario downloads a file through downloads.Download with the same
+retry policy shape main.py uses (retries.RetryPolicy), under a request
+deadline (retries.deadline):
+  ok          plain success
+  drop        the connection drops mid-body twice; resumed with Range
+  changed     the connection drops, then the file changes: If-Range must
+              get the new file whole instead of splicing it onto the old
+  unavailable 503 twice, then success
+  not_found   404: must fail after exactly one attempt
+  trickle     the body trickles in slower than the deadline allows: must
+              stop at the deadline, not at the 180s read timeout
+  hedge       the first response stalls; a hedged second attempt wins
+Prints each outcome and the retry metrics (attempts, wasted retries,
+p50/p99 call latency, hedges). Exits with status 1 when a scenario does
+not behave as expected.
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+import downloads
+import retries
+import tracing
+
+BODY = os.urandom(2 * 1024 * 1024 + 17)
+
+
+###############################################################################
+# Flaky Server
+###############################################################################
+class FlakyHandler(http.server.BaseHTTPRequestHandler):
+    """GET /<scenario>/<fault>?n=K -- the fault hits the first K requests for that path."""
+    protocol_version = 'HTTP/1.1'
+    seen = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        fault = path.rsplit('/', 1)[-1]
+        times = int(dict(p.split('=') for p in query.split('&') if p).get('n', 0))
+        with self.lock:
+            count = self.seen[path] = self.seen.get(path, 0) + 1
+        faulty = count <= times
+
+        if fault == 'not_found':
+            return self._status(404)
+        if fault == 'unavailable' and faulty:
+            return self._status(503)
+
+        # The body changes after the first request for 'changed': If-Range must catch it
+        body, etag = BODY, '"v1"'
+        if fault == 'changed' and count > 1:
+            body, etag = BODY[::-1], '"v2"'
+        start = 0
+        match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match and self.headers.get('If-Range', etag) == etag:
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        body = body[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if fault in ('drop', 'changed') and faulty:
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        if fault in ('trickle', 'stall') and faulty:
+            # Live but slow: a little data every 0.2s ('stall' sends the first piece only)
+            for offset in range(0, len(body), 4096):
+                try:
+                    self.wfile.write(body[offset:offset + 4096])
+                    self.wfile.flush()
+                except OSError:
+                    return
+                time.sleep(0.2 if fault == 'trickle' else 60)
+            return
+        self.wfile.write(body)
+
+    def _status(self, code):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def serve():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+###############################################################################
+# Scenarios
+###############################################################################
+def fetch(url: str, work_dir: str, policy, hedge_after=None) -> dict:
+    """Download with retries (and optionally a hedge), like main.download_image."""
+    primary = downloads.Download(url, os.path.join(work_dir, 'a'))
+    hedge = downloads.Download(url, os.path.join(work_dir, 'b')) if hedge_after else None
+
+    def attempt(index, cancel):
+        candidate = (primary, hedge)[index]
+        candidate.attempt(cancel=cancel)
+        return candidate
+
+    def attempt_once():
+        if hedge is None:
+            return attempt(0, None)
+        return retries.hedged(attempt, hedge_after, 'download')
+
+    winner = policy.call(attempt_once)
+    result = winner.result()
+    result['attempts'] = primary.attempts + (hedge.attempts if hedge else 0)
+    result['hedge_won'] = winner is hedge
+    return result
+
+
+SCENARIOS = {
+    # name: (fault, faulty requests, hedge, expectation)
+    'ok': ('ok', 0, False, lambda r: r['ok'] and r['attempts'] == 1),
+    'drop': ('drop', 2, False, lambda r: r['ok'] and r['attempts'] == 3 and r['resumed_bytes'] > 0),
+    'changed': ('changed', 1, False, lambda r: r['ok'] and r['resumed_bytes'] == 0
+                and r['sha256'] == hashlib.sha256(BODY[::-1]).hexdigest()),
+    'unavailable': ('unavailable', 2, False, lambda r: r['ok'] and r['attempts'] == 3),
+    'not_found': ('not_found', 0, False, lambda r: not r['ok'] and r['attempts'] == 1),
+    'trickle': ('trickle', 99, False, lambda r: not r['ok'] and r['error'] == 'DeadlineExceeded'),
+    'hedge': ('stall', 1, True, lambda r: r['ok'] and r['hedge_won']),
+}
+
+
+def run_scenario(name: str, base_url: str, args) -> dict:
+    fault, times, hedge, expect = SCENARIOS[name]
+    policy = retries.RetryPolicy(name, max_attempts=3, base_delay=0.1, max_delay=0.5,
+                                 giveup=(downloads.DownloadTooLarge,))
+    url = f"{base_url}/{name}/{fault}?n={times}"
+    start = time.perf_counter()
+    outcome = {"ok": False, "attempts": 0, "resumed_bytes": 0, "hedge_won": False, "error": None, "sha256": None}
+    with tempfile.TemporaryDirectory() as work_dir, retries.deadline(args.deadline):
+        try:
+            result = fetch(url, work_dir, policy, args.hedge_after if hedge else None)
+            outcome.update(ok=result['size'] == len(BODY), attempts=result['attempts'],
+                           resumed_bytes=result['resumed_bytes'], hedge_won=result['hedge_won'],
+                           sha256=result['sha256'])
+        except Exception as e:
+            outcome['error'] = type(e).__name__
+            outcome['attempts'] = int(sum(s['value'] for s in tracing.registry.export_json()['counters']
+                                          .get('retry_attempts_total', []) if s['labels'].get('operation') == name))
+    outcome['seconds'] = round(time.perf_counter() - start, 3)
+    # Nothing may outlive the deadline by more than a moment
+    outcome['as_expected'] = bool(expect(outcome)) and outcome['seconds'] <= args.deadline + 1.0
+    return outcome
+
+
+def retry_metrics() -> dict:
+    exported = tracing.registry.export_json()
+    metrics = {}
+    for name in ('retry_attempts_total', 'retry_failed_attempts_total', 'retry_giveups_total',
+                 'retry_deadline_giveups_total', 'retry_wasted_total', 'retry_recovered_total',
+                 'hedge_started_total', 'hedge_won_total'):
+        metrics[name] = sum(series['value'] for series in exported['counters'].get(name, []))
+    latencies = exported['histograms'].get('retry_operation_seconds', [])
+    metrics['retry_operation_seconds'] = {
+        f"{s['labels']['operation']}/{s['labels']['outcome']}": {"p50": s['p50'], "p99": s['p99']}
+        for s in latencies
+    }
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deadline', type=float, default=5.0, help="per-scenario request deadline (s)")
+    parser.add_argument('--hedge-after', type=float, default=0.5)
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS))
+    parser.add_argument('--out', help="write the report as JSON")
+    args = parser.parse_args()
+
+    server, base_url = serve()
+    try:
+        results = {}
+        print(f"{'scenario':>12} {'ok':>5} {'attempts':>9} {'seconds':>8} {'error':>18} {'expected':>9}")
+        for name in args.scenarios:
+            outcome = results[name] = run_scenario(name, base_url, args)
+            print(f"{name:>12} {str(outcome['ok']):>5} {outcome['attempts']:>9} {outcome['seconds']:>8.2f} "
+                  f"{outcome['error'] or '-':>18} {'yes' if outcome['as_expected'] else 'NO':>9}")
+    finally:
+        server.shutdown()
+
+    report = {"scenarios": results, "metrics": retry_metrics()}
+    print(json.dumps(report['metrics'], indent=2))
+    if args.out:
+        with open(args.out, 'w') as fp:
+            json.dump(report, fp, indent=2)
+        print(f"\nReport written to {args.out}")
+    failed = [name for name, outcome in results.items() if not outcome['as_expected']]
+    if failed:
+        print(f"\nUnexpected behaviour: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark: vectorized stl_writer vs. the old per-face struct.pack loop.
+
+    python benchmarks/bench_stl_writer.py --faces 200000 500000
+
+The legacy writer below is a Blender-free copy of the old write_stl loop
+(per-face matrix multiply, NaN check and four struct.pack writes).
+"""
+import argparse
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stl_writer
+
+
+def legacy_write_stl(filepath, vertices, faces, normals, matrix):
+    """The pre-vectorization writer, with mathutils replaced by plain tuples."""
+    m = [list(row) for row in matrix]
+    with open(filepath, 'wb') as fp:
+        header = b'Binary STL generated by Blender advanced script'
+        fp.write(header + (80 - len(header)) * b'\0')
+        fp.write(struct.pack('<I', len(faces)))
+        for face, n in zip(faces.tolist(), normals.tolist()):
+            nx = m[0][0] * n[0] + m[0][1] * n[1] + m[0][2] * n[2]
+            ny = m[1][0] * n[0] + m[1][1] * n[1] + m[1][2] * n[2]
+            nz = m[2][0] * n[0] + m[2][1] * n[1] + m[2][2] * n[2]
+            length = math.sqrt(nx * nx + ny * ny + nz * nz)
+            if length:
+                nx, ny, nz = nx / length, ny / length, nz / length
+            if math.isnan(nx) or math.isnan(ny) or math.isnan(nz):
+                nx, ny, nz = 0.0, 0.0, 1.0
+            fp.write(struct.pack('<3f', nx, ny, nz))
+            for vert_idx in face:
+                x, y, z = vertices[vert_idx]
+                fp.write(struct.pack(
+                    '<3f',
+                    m[0][0] * x + m[0][1] * y + m[0][2] * z + m[0][3],
+                    m[1][0] * x + m[1][1] * y + m[1][2] * z + m[1][3],
+                    m[2][0] * x + m[2][1] * y + m[2][2] * z + m[2][3],
+                ))
+            fp.write(struct.pack('<H', 0))
+    return os.path.getsize(filepath)
+
+
+def make_mesh(face_count, seed=0):
+    rng = np.random.default_rng(seed)
+    vertex_count = max(3, face_count // 2)
+    vertices = rng.standard_normal((vertex_count, 3)).astype(np.float32)
+    faces = rng.integers(0, vertex_count, (face_count, 3), dtype=np.int64)
+    tris = vertices[faces].astype(np.float64)
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    matrix = np.eye(4)
+    matrix[:3, 3] = (1.0, 2.0, 3.0)
+    return vertices, faces, normals, matrix
+
+
+def time_call(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faces', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--chunk-faces', type=int, default=stl_writer.CHUNK_FACES)
+    parser.add_argument('--skip-legacy-above', type=int, default=2000000,
+                        help="don't run the (slow) legacy writer above this face count")
+    args = parser.parse_args()
+
+    print(f"{'faces':>10} {'legacy tri/s':>14} {'vector tri/s':>14} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for face_count in args.faces:
+            vertices, faces, normals, matrix = make_mesh(face_count)
+            new_path = os.path.join(temp_dir, 'new.stl')
+            old_path = os.path.join(temp_dir, 'old.stl')
+
+            new_time = time_call(stl_writer.write_binary_stl, new_path, vertices, faces,
+                                 normals=normals, matrix=matrix, chunk_faces=args.chunk_faces)
+            new_rate = face_count / new_time
+
+            if face_count <= args.skip_legacy_above:
+                old_time = time_call(legacy_write_stl, old_path, vertices, faces, normals, matrix)
+                old_rate = face_count / old_time
+                if os.path.getsize(old_path) != os.path.getsize(new_path):
+                    raise SystemExit("Output size mismatch between legacy and vectorized writers")
+                print(f"{face_count:>10} {old_rate:>14,.0f} {new_rate:>14,.0f} {new_rate / old_rate:>7.1f}x")
+            else:
+                print(f"{face_count:>10} {'-':>14} {new_rate:>14,.0f} {'-':>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Deterministic synthetic GLB corpus for the conversion benchmarks.
+
+    python benchmarks/glb_corpus.py --out /tmp/glb_corpus --tier full
+
+Every case is generated from a fixed seed, so the same name always produces
+the same bytes. Cases cover plain height-field grids from 1k to 5M
+triangles, multi-mesh scenes with nested node transforms and instancing,
+unwelded meshes (every face has its own three vertices) and meshes with a
+share of degenerate faces.
+"""
+import argparse
+import json
+import math
+import os
+import struct
+
+import numpy as np
+
+GLB_MAGIC = 0x46546C67
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+FLOAT = 5126
+UNSIGNED_INT = 5125
+
+# tier: 'quick' runs by default, 'full' adds ~1M triangle cases, 'huge' adds 5M
+CORPUS = [
+    {"name": "grid_1k", "triangles": 1_000, "tier": "quick"},
+    {"name": "grid_10k", "triangles": 10_000, "tier": "quick"},
+    {"name": "grid_100k", "triangles": 100_000, "tier": "quick"},
+    {"name": "multi_16x10k_transforms", "triangles": 160_000, "meshes": 16, "transforms": True, "tier": "quick"},
+    {"name": "unwelded_100k", "triangles": 100_000, "unwelded": True, "tier": "quick"},
+    {"name": "degenerate_100k", "triangles": 100_000, "degenerate": 0.05, "tier": "quick"},
+    {"name": "grid_1m", "triangles": 1_000_000, "tier": "full"},
+    {"name": "mixed_8x125k", "triangles": 1_000_000, "meshes": 8, "transforms": True, "unwelded": True,
+     "degenerate": 0.02, "tier": "full"},
+    {"name": "grid_5m", "triangles": 5_000_000, "tier": "huge"},
+]
+TIERS = ("quick", "full", "huge")
+
+
+def cases_for_tier(tier: str) -> list:
+    allowed = TIERS[:TIERS.index(tier) + 1]
+    return [case for case in CORPUS if case["tier"] in allowed]
+
+
+def grid_mesh(triangles: int, rng) -> tuple:
+    """Height-field grid with about `triangles` faces. Returns (float32 vertices, uint32 faces)."""
+    cells = max(1, triangles // 2)
+    nx = max(1, int(math.sqrt(cells)))
+    ny = max(1, math.ceil(cells / nx))
+    xs, ys = np.meshgrid(np.linspace(0.0, 1.0, nx + 1), np.linspace(0.0, 1.0, ny + 1))
+    phase = rng.uniform(0.0, 2.0 * math.pi, 2)
+    zs = 0.05 * np.sin(6.0 * xs + phase[0]) * np.cos(6.0 * ys + phase[1])
+    vertices = np.stack([xs, zs, ys], axis=-1).reshape(-1, 3).astype(np.float32)
+
+    idx = np.arange((nx + 1) * (ny + 1), dtype=np.uint32).reshape(ny + 1, nx + 1)
+    a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+    c, d = idx[1:, :-1].ravel(), idx[1:, 1:].ravel()
+    faces = np.empty((len(a) * 2, 3), dtype=np.uint32)
+    faces[0::2] = np.stack([a, c, b], axis=1)
+    faces[1::2] = np.stack([b, c, d], axis=1)
+    return vertices, faces[:triangles]
+
+
+def unweld(vertices, faces) -> tuple:
+    """Gives every face its own copy of its vertices (like an unindexed export)."""
+    expanded = vertices[faces].reshape(-1, 3)
+    return expanded, np.arange(len(expanded), dtype=np.uint32).reshape(-1, 3)
+
+
+def add_degenerates(faces, fraction: float, rng):
+    """Collapses a `fraction` of faces to repeat one of their corners."""
+    faces = faces.copy()
+    picked = rng.choice(len(faces), int(len(faces) * fraction), replace=False)
+    faces[picked, 2] = faces[picked, 0]
+    return faces
+
+
+def random_transform(rng) -> dict:
+    axis = rng.standard_normal(3)
+    axis /= np.linalg.norm(axis)
+    angle = rng.uniform(0.0, math.pi)
+    rotation = list(axis * math.sin(angle / 2)) + [math.cos(angle / 2)]
+    return {
+        "translation": [float(v) for v in rng.uniform(-3.0, 3.0, 3)],
+        "rotation": [float(v) for v in rotation],
+        "scale": [float(v) for v in rng.uniform(0.5, 2.0, 3)],
+    }
+
+
+def build_case(case: dict, seed: int = 0) -> tuple:
+    """Returns (meshes, nodes, root_nodes) for a corpus entry."""
+    rng = np.random.default_rng([seed, sum(case["name"].encode())])
+    mesh_count = case.get("meshes", 1)
+    per_mesh = case["triangles"] // mesh_count
+
+    meshes = []
+    for _ in range(mesh_count):
+        vertices, faces = grid_mesh(per_mesh, rng)
+        if case.get("degenerate"):
+            faces = add_degenerates(faces, case["degenerate"], rng)
+        if case.get("unwelded"):
+            vertices, faces = unweld(vertices, faces)
+        meshes.append((vertices, faces))
+
+    if not case.get("transforms"):
+        nodes = [{"mesh": i} for i in range(mesh_count)]
+        return meshes, nodes, list(range(mesh_count))
+
+    # Nested transforms: a scaled root, one group per pair of meshes, and the
+    # first mesh instanced a second time under a different parent
+    nodes = [dict(random_transform(rng), children=[])]
+    for i in range(mesh_count):
+        if i % 2 == 0:
+            nodes.append(dict(random_transform(rng), children=[]))
+            group = len(nodes) - 1
+            nodes[0]["children"].append(group)
+        nodes.append(dict(random_transform(rng), mesh=i))
+        nodes[group]["children"].append(len(nodes) - 1)
+    nodes.append(dict(random_transform(rng), mesh=0))
+    nodes[0]["children"].append(len(nodes) - 1)
+    return meshes, nodes, [0]
+
+
+def write_glb(path: str, meshes: list, nodes: list, root_nodes: list) -> int:
+    """Writes float32 positions + uint32 indices per mesh. Returns the file size."""
+    chunks, views, accessors, gltf_meshes = [], [], [], []
+    offset = 0
+
+    def add_view(data: bytes):
+        nonlocal offset
+        views.append({"buffer": 0, "byteOffset": offset, "byteLength": len(data)})
+        chunks.append(data)
+        offset += len(data)
+        return len(views) - 1
+
+    for vertices, faces in meshes:
+        position = add_view(vertices.tobytes())
+        accessors.append({"bufferView": position, "componentType": FLOAT, "count": len(vertices),
+                          "type": "VEC3", "min": vertices.min(axis=0).tolist(),
+                          "max": vertices.max(axis=0).tolist()})
+        indices = add_view(faces.astype(np.uint32).tobytes())
+        accessors.append({"bufferView": indices, "componentType": UNSIGNED_INT,
+                          "count": faces.size, "type": "SCALAR"})
+        gltf_meshes.append({"primitives": [{"attributes": {"POSITION": len(accessors) - 2},
+                                            "indices": len(accessors) - 1}]})
+
+    binary = b''.join(chunks)
+    binary += b'\0' * (-len(binary) % 4)
+    gltf = {
+        "asset": {"version": "2.0", "generator": "glb_corpus.py"},
+        "scene": 0,
+        "scenes": [{"nodes": root_nodes}],
+        "nodes": nodes,
+        "meshes": gltf_meshes,
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": views,
+        "accessors": accessors,
+    }
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+
+    total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    with open(path, 'wb') as fp:
+        fp.write(struct.pack('<III', GLB_MAGIC, 2, total))
+        fp.write(struct.pack('<II', len(json_chunk), CHUNK_JSON))
+        fp.write(json_chunk)
+        fp.write(struct.pack('<II', len(binary), CHUNK_BIN))
+        fp.write(binary)
+    return total
+
+
+def ensure_corpus(directory: str, cases: list, seed: int = 0) -> dict:
+    """Generates any missing case files. Returns {name: path}."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for case in cases:
+        path = os.path.join(directory, f"{case['name']}_s{seed}.glb")
+        if not os.path.exists(path):
+            tmp_path = path + '.part'
+            write_glb(tmp_path, *build_case(case, seed))
+            os.replace(tmp_path, path)
+        paths[case["name"]] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--tier', choices=TIERS, default='quick')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for name, path in ensure_corpus(args.out, cases_for_tier(args.tier), args.seed).items():
+        print(f"{name:>28} {os.path.getsize(path):>14,} bytes  {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Admission-control simulation: a burst of concurrent requests against one
+instance's memory budget.
+
+    python benchmarks/sim_admission.py
+    python benchmarks/sim_admission.py --requests 200 --capacity-mb 3072 --max-wait 10
+
+Each simulated request reserves the 'convert' footprint (admission.py),
+learns its real input size part-way through (as a download does from
+Content-Length), then "works" for a time proportional to its size. Input
+sizes are drawn log-uniformly between --min-mb and --max-mb. Reports how
+many requests were admitted, queued and rejected, and checks the reserved
+bytes never exceeded the budget (except for lone oversized requests).
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+import admission
+
+
+def run(args) -> dict:
+    controller = admission.MemoryAdmission(args.capacity_mb * admission.MB, max_wait=args.max_wait,
+                                           usage_probe=None)
+    rng = random.Random(args.seed)
+    sizes = [int(math.exp(rng.uniform(math.log(args.min_mb), math.log(args.max_mb))) * admission.MB)
+             for _ in range(args.requests)]
+    outcomes = []
+    lock = threading.Lock()
+    overcommitted = []
+
+    def request(size: int):
+        start = time.perf_counter()
+        try:
+            with controller.reserve('convert') as reservation:
+                time.sleep(args.seconds_per_mb * 0.1)
+                admission.note_input_size(size)
+                # Over capacity is only allowed when this reservation is alone
+                with controller._cond:
+                    if controller.reserved > controller.capacity and controller.reserved != reservation.bytes:
+                        overcommitted.append(controller.reserved)
+                time.sleep(args.seconds_per_mb * size / admission.MB)
+            outcome = 'ok'
+        except admission.AdmissionRejected:
+            outcome = 'rejected'
+        with lock:
+            outcomes.append((outcome, time.perf_counter() - start))
+
+    threads = []
+    start = time.perf_counter()
+    for size in sizes:
+        thread = threading.Thread(target=request, args=(size,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(rng.expovariate(args.rate))
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(seconds for outcome, seconds in outcomes if outcome == 'ok')
+    stats = controller.stats()
+    return {
+        "requests": len(sizes),
+        "ok": len(latencies),
+        "rejected": sum(1 for outcome, _ in outcomes if outcome == 'rejected'),
+        "queued": stats['queued'],
+        "oversized": stats['oversized'],
+        "wall_time": round(time.perf_counter() - start, 2),
+        "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "p99_latency": round(latencies[int(len(latencies) * 0.99)], 3) if latencies else None,
+        "capacity_mb": args.capacity_mb,
+        "peak_reserved_mb": round(stats['peak_reserved_bytes'] / admission.MB, 1),
+        "overcommitted": len(overcommitted),
+        "retry_after": stats['retry_after'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=50.0, help="arrivals per second")
+    parser.add_argument('--capacity-mb', type=int, default=3072)
+    parser.add_argument('--max-wait', type=float, default=2.0)
+    parser.add_argument('--min-mb', type=float, default=1.0)
+    parser.add_argument('--max-mb', type=float, default=150.0)
+    parser.add_argument('--seconds-per-mb', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if report['overcommitted']:
+        print(f"\nBudget exceeded {report['overcommitted']} time(s)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import collections
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+###############################################################################
+# Blender Progress/Result Channel
+###############################################################################
+# A spawned conversion reports over its own pipe instead of through stdout:
+#  - the host opens a pipe and passes the write end to the child (pass_fds),
+#    announcing its number in BLENDER_PROGRESS_FD
+#  - the child writes JSON lines to it:
+#      {"event": "progress", "stage": ..., "t": ..., "data": {...}}
+#      {"event": "result", "t": ..., "result": {...}}
+#      {"event": "error", "t": ..., "error": ..., "traceback": ...}
+#  - stdout/stderr (Blender's chatter, per-object prints) go to a bounded
+#    ring buffer: the last LOG_LINES lines are kept for error reports and the
+#    rest are only counted
+#  - run_script() hands each progress event to a callback as it arrives, and
+#    kills the process when neither an event nor an output line has arrived
+#    for stall_timeout seconds (or the overall timeout passes) instead of
+#    waiting for it to exit; a long step that keeps printing stays alive
+#  - pooled workers (blender_pool.py) use the same channel for the life of
+#    the process, for their protocol messages too (send()); set_job() tags
+#    events with the job they belong to
+#
+# Only the standard library is used: the child side (progress/result/
+# run_main/set_job) is imported inside Blender's Python, and any script that
+# writes the same lines, e.g. a stub for local runs, can stand in for Blender.
+
+PROGRESS_FD_ENV = 'BLENDER_PROGRESS_FD'
+LOG_LINES = 200
+MAX_LINE_CHARS = 2000
+
+
+class ScriptError(Exception):
+    """The script failed or exited without a result. log_tail holds its last output lines."""
+
+    def __init__(self, message, log_tail='', worker_traceback=None, stage=None):
+        super().__init__(message)
+        self.log_tail = log_tail
+        self.worker_traceback = worker_traceback
+        self.stage = stage
+
+
+class ScriptStalled(ScriptError):
+    """No progress or output for stall_timeout seconds (or past the overall timeout); the process was killed."""
+
+
+###############################################################################
+# Child Side
+###############################################################################
+_channel = None
+_started = time.time()
+_job = None
+
+
+def _emit(message: dict) -> bool:
+    global _channel
+    if _channel is None:
+        fd = os.environ.get(PROGRESS_FD_ENV)
+        if not fd:
+            return False
+        _channel = os.fdopen(int(fd), 'w', buffering=1)
+    message['t'] = round(time.time() - _started, 4)
+    if _job is not None:
+        message['job'] = _job
+    _channel.write(json.dumps(message, default=str) + '\n')
+    _channel.flush()
+    return True
+
+
+def send(message: dict) -> bool:
+    """Writes any other message to the channel; False when there is none."""
+    return _emit(dict(message))
+
+
+def set_job(job_id) -> None:
+    """Tags the following events with job_id (None to stop), for pooled workers."""
+    global _job
+    _job = job_id
+
+
+def progress(stage: str, **data) -> None:
+    """Reports that `stage` finished (no-op without a channel)."""
+    _emit({"event": "progress", "stage": stage, "data": data})
+
+
+def result(value: dict) -> None:
+    _emit({"event": "result", "result": value})
+
+
+def run_main(fn) -> None:
+    """Runs fn() in the child, reports its return value or error, and exits non-zero on failure."""
+    try:
+        value = fn()
+    except Exception as e:
+        _emit({"event": "error", "error": str(e), "traceback": traceback.format_exc()})
+        traceback.print_exc()
+        sys.stdout.flush()
+        os._exit(1)
+    result(value)
+
+
+###############################################################################
+# Host Side
+###############################################################################
+class RingBuffer:
+    """Keeps the last `max_lines` lines (each cut to max_chars); counts the rest."""
+
+    def __init__(self, max_lines: int = LOG_LINES, max_chars: int = MAX_LINE_CHARS):
+        self.max_chars = max_chars
+        self._lines = collections.deque(maxlen=max_lines)
+        self.total_lines = 0
+        self.last_append = time.monotonic()
+
+    def append(self, line: str):
+        line = line.rstrip('\n')
+        if len(line) > self.max_chars:
+            line = line[:self.max_chars] + f"... [{len(line) - self.max_chars} chars cut]"
+        self._lines.append(line)
+        self.total_lines += 1
+        self.last_append = time.monotonic()
+
+    @property
+    def dropped_lines(self) -> int:
+        return self.total_lines - len(self._lines)
+
+    def text(self) -> str:
+        lines = list(self._lines)
+        if self.dropped_lines:
+            lines.insert(0, f"[{self.dropped_lines} earlier lines dropped]")
+        return '\n'.join(lines)
+
+
+def _read_logs(stream, logs: RingBuffer):
+    for line in iter(stream.readline, b''):
+        logs.append(line.decode('utf-8', errors='replace'))
+    stream.close()
+
+
+def _read_channel(stream, events: queue.Queue, logs: RingBuffer):
+    for line in stream:
+        try:
+            events.put(json.loads(line))
+        except ValueError:
+            logs.append(f"[channel] Bad line: {line.rstrip()}")
+    stream.close()
+    # EOF: every copy of the write end is closed, i.e. the process exited
+    events.put(None)
+
+
+def run_script(command, env: dict = None, on_progress=None, stall_timeout: float = 120.0,
+               timeout: float = None, log_lines: int = LOG_LINES) -> dict:
+    """
+    Runs `command` with a progress channel. on_progress(stage, data, seconds)
+    is called for each progress event (seconds since the previous one).
+    Returns {result, stages, seconds, log_lines, dropped_log_lines, log_tail};
+    raises ScriptStalled or ScriptError.
+    """
+    read_fd, write_fd = os.pipe()
+    env = dict(os.environ if env is None else env, **{PROGRESS_FD_ENV: str(write_fd)})
+    logs = RingBuffer(log_lines)
+    events = queue.Queue()
+    start = time.monotonic()
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, pass_fds=(write_fd,), env=env)
+    finally:
+        # Only the child holds the write end now, so the reader sees EOF when it exits
+        os.close(write_fd)
+    channel = os.fdopen(read_fd, 'r')
+    readers = [
+        threading.Thread(target=_read_logs, args=(process.stdout, logs), daemon=True),
+        threading.Thread(target=_read_channel, args=(channel, events, logs), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    stages = []
+    value = None
+    failure = None
+    stage = 'start'
+    last_event = start
+    try:
+        while True:
+            now = time.monotonic()
+            # Any output line counts as a sign of life, not just progress events
+            last_active = max(last_event, logs.last_append)
+            wait = stall_timeout - (now - last_active)
+            if timeout is not None:
+                wait = min(wait, timeout - (now - start))
+            try:
+                message = events.get(timeout=max(wait, 0))
+            except queue.Empty:
+                now = time.monotonic()
+                timed_out = timeout is not None and now - start >= timeout
+                if not timed_out and value is None and now - max(last_event, logs.last_append) < stall_timeout:
+                    continue
+                process.kill()
+                if value is not None:
+                    # Done, but slow to exit; the result is all we need
+                    break
+                limit = 'timeout' if timed_out else 'stall'
+                waited = now - (start if timed_out else max(last_event, logs.last_append))
+                raise ScriptStalled(f"Killed after {waited:.0f}s without progress or output past '{stage}' "
+                                    f"({limit})", logs.text(), stage=stage) from None
+            if message is None:
+                break
+            now = time.monotonic()
+            event = message.get('event')
+            if event == 'progress':
+                stage = message.get('stage', stage)
+                seconds = now - last_event
+                stages.append({"stage": stage, "seconds": round(seconds, 4), "data": message.get('data') or {}})
+                if on_progress is not None:
+                    try:
+                        on_progress(stage, message.get('data') or {}, seconds)
+                    except Exception as e:
+                        print(f"[blender_channel] Progress callback failed for {stage}: {e}")
+            elif event == 'result':
+                value = message.get('result') or {}
+            elif event == 'error':
+                failure = message
+            last_event = now
+    finally:
+        if process.poll() is None and (value is None and failure is None):
+            process.kill()
+        code = process.wait()
+        for reader in readers:
+            reader.join(timeout=5)
+
+    if failure is not None:
+        raise ScriptError(f"Script failed after '{stage}': {failure.get('error')}", logs.text(),
+                          worker_traceback=failure.get('traceback'), stage=stage)
+    if code != 0 or value is None:
+        raise ScriptError(f"Script exited with code {code} without a result after '{stage}'", logs.text(),
+                          stage=stage)
+    return {
+        "result": value,
+        "stages": stages,
+        "seconds": round(time.monotonic() - start, 3),
+        "log_lines": logs.total_lines,
+        "dropped_log_lines": logs.dropped_lines,
+        "log_tail": logs.text(),
+    }
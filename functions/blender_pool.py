@@ -0,0 +1,443 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+import blender_channel
+
+###############################################################################
+# Persistent Blender Worker Pool
+###############################################################################
+# Instead of starting Blender for every conversion, we keep a few long-lived
+# `blender --background` processes per container and send them jobs.
+#
+# Protocol (JSON lines):
+#  - host -> worker stdin:    {"id": ..., "input": ..., "output": ..., "options": {...}}
+#                             {"command": "shutdown"}
+#  - worker -> host channel:  {"event": "ready", "pid": ...}
+#                             {"event": "progress", "job": ..., "stage": ..., "data": {...}}
+#                             {"id": ..., "ok": true, "result": {...}}
+#                             {"id": ..., "ok": false, "error": ..., "traceback": ...}
+#
+# The channel is the worker's blender_channel pipe, so a job's progress
+# events and its result arrive in order. A worker started without one writes
+# its protocol messages to stdout behind RESULT_PREFIX instead. Everything
+# else on stdout (Blender's chatter) goes to a bounded ring buffer per job
+# (blender_channel.RingBuffer) whose tail is attached to errors.
+#
+# run_job() hands progress to on_progress, and kills a worker that has
+# neither reported progress nor printed anything for stall_timeout seconds.
+#
+# This module only uses the standard library: the worker side (serve_jobs)
+# is imported inside Blender's Python, and any executable that speaks the
+# same protocol (e.g. a plain Python script calling serve_jobs with a fake
+# handler) can stand in for Blender.
+
+RESULT_PREFIX = '@@BLENDER_POOL@@ '
+
+
+class WorkerError(Exception):
+    """Base class for worker pool failures. log_tail holds the worker's last output lines."""
+
+    def __init__(self, message, log_tail='', stage=None):
+        super().__init__(message)
+        self.log_tail = log_tail
+        self.stage = stage
+
+
+class WorkerStartupError(WorkerError):
+    """The worker process did not report ready in time."""
+
+
+class WorkerCrashed(WorkerError):
+    """The worker process exited while a job was running."""
+
+
+class WorkerTimeout(WorkerError):
+    """A job exceeded its timeout; the worker has been killed."""
+
+
+class PoolBusy(WorkerError):
+    """No worker became free within the timeout. Worth retrying later."""
+
+
+class WorkerStalled(WorkerTimeout):
+    """A job went stall_timeout seconds without progress or output; the worker has been killed."""
+
+
+class JobFailed(WorkerError):
+    """The job raised inside a healthy worker (bad input, etc.)."""
+
+    def __init__(self, message, worker_traceback=None, log_tail='', stage=None):
+        super().__init__(message, log_tail, stage)
+        self.worker_traceback = worker_traceback
+
+
+###############################################################################
+# Worker Side
+###############################################################################
+def _emit(stream, message: dict) -> None:
+    if blender_channel.send(message):
+        return
+    stream.write(RESULT_PREFIX + json.dumps(message) + '\n')
+    stream.flush()
+
+
+def serve_jobs(handler, reset=None, stdin=None, stdout=None) -> None:
+    """
+    Worker main loop. Calls handler(input_path, output_path, options) for each
+    job and reports its (JSON-serializable) return value. `reset` runs before
+    every job to give it a clean scene.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    _emit(stdout, {"event": "ready", "pid": os.getpid()})
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        job = json.loads(line)
+        if job.get('command') == 'shutdown':
+            break
+
+        start = time.time()
+        blender_channel.set_job(job.get('id'))
+        try:
+            if reset:
+                reset()
+            result = handler(job['input'], job['output'], job.get('options') or {})
+            _emit(stdout, {"id": job.get('id'), "ok": True, "result": result,
+                           "duration": time.time() - start})
+        except Exception as e:
+            _emit(stdout, {"id": job.get('id'), "ok": False, "error": str(e),
+                           "traceback": traceback.format_exc(),
+                           "duration": time.time() - start})
+        finally:
+            blender_channel.set_job(None)
+
+
+###############################################################################
+# Host Side
+###############################################################################
+def _rss_bytes(pid: int) -> int:
+    """Resident set size of a process from /proc (0 if unavailable)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+class BlenderWorker:
+    """One long-lived worker process."""
+
+    def __init__(self, command, startup_timeout=120.0, env=None, log_lines=blender_channel.LOG_LINES):
+        self.command = list(command)
+        self.startup_timeout = startup_timeout
+        self.env = env
+        self.log_lines = log_lines
+        self.logs = blender_channel.RingBuffer(log_lines)
+        self.process = None
+        self.jobs_done = 0
+        self._messages = queue.Queue()
+        self._reader = None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def start(self):
+        read_fd, write_fd = os.pipe()
+        env = dict(os.environ if self.env is None else self.env,
+                   **{blender_channel.PROGRESS_FD_ENV: str(write_fd)})
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                env=env,
+                pass_fds=(write_fd,),
+            )
+        except Exception:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        channel_reader = threading.Thread(target=self._read_channel, args=(os.fdopen(read_fd, 'r'),), daemon=True)
+        channel_reader.start()
+        self._reader = threading.Thread(target=self._read_output, args=(channel_reader,), daemon=True)
+        self._reader.start()
+
+        try:
+            message = self._messages.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            self.kill()
+            raise WorkerStartupError(f"Worker did not become ready within {self.startup_timeout}s")
+        if message is None or message.get('event') != 'ready':
+            self.kill()
+            raise WorkerStartupError(f"Worker failed to start (exit code {self.process.poll()})")
+        print(f"[blender_pool] Worker {self.pid} ready")
+
+    def _read_output(self, channel_reader):
+        for line in self.process.stdout:
+            if line.startswith(RESULT_PREFIX):
+                try:
+                    self._messages.put(json.loads(line[len(RESULT_PREFIX):]))
+                except ValueError:
+                    self.logs.append(f"[protocol] Bad line: {line.rstrip()}")
+            else:
+                self.logs.append(line)
+        # EOF: the process exited (or closed stdout); let the channel drain first
+        channel_reader.join(timeout=5)
+        self._messages.put(None)
+
+    def _read_channel(self, stream):
+        for line in stream:
+            try:
+                self._messages.put(json.loads(line))
+            except ValueError:
+                self.logs.append(f"[channel] Bad line: {line.rstrip()}")
+        stream.close()
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def rss_bytes(self) -> int:
+        return _rss_bytes(self.pid) if self.alive() else 0
+
+    def run_job(self, input_path: str, output_path: str, options=None, timeout=300.0, on_progress=None,
+                stall_timeout=None) -> dict:
+        """
+        Runs one job; on_progress(stage, data, seconds) is called for each
+        progress event. Raises JobFailed, WorkerCrashed, WorkerTimeout or
+        WorkerStalled (the last two kill the worker).
+        """
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "input": input_path, "output": output_path, "options": options or {}}
+        self.logs = blender_channel.RingBuffer(self.log_lines)
+        try:
+            self.process.stdin.write(json.dumps(job) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise WorkerCrashed(f"Worker {self.pid} not accepting jobs: {e}", self.logs.text())
+
+        start = time.monotonic()
+        deadline = start + timeout
+        last_event = start
+        stage = 'start'
+        while True:
+            now = time.monotonic()
+            wait = deadline - now
+            if stall_timeout:
+                # Any output line counts as a sign of life, not just progress events
+                wait = min(wait, stall_timeout - (now - max(last_event, self.logs.last_append)))
+            try:
+                message = self._messages.get(timeout=max(wait, 0))
+            except queue.Empty:
+                now = time.monotonic()
+                if now >= deadline:
+                    self.kill()
+                    raise WorkerTimeout(f"Job {job_id} timed out after {timeout}s on worker {self.pid} "
+                                        f"past '{stage}'", self.logs.text(), stage) from None
+                if stall_timeout and now - max(last_event, self.logs.last_append) >= stall_timeout:
+                    self.kill()
+                    raise WorkerStalled(f"Job {job_id} made no progress or output for {stall_timeout}s past "
+                                        f"'{stage}' on worker {self.pid}", self.logs.text(), stage) from None
+                continue
+            if message is None:
+                code = self.process.wait()
+                raise WorkerCrashed(f"Worker {self.pid} exited with code {code} during job {job_id} past "
+                                    f"'{stage}'", self.logs.text(), stage)
+            if message.get('event') == 'progress':
+                if message.get('job') != job_id:
+                    continue
+                now = time.monotonic()
+                stage = message.get('stage', stage)
+                seconds, last_event = now - last_event, now
+                if on_progress is not None:
+                    try:
+                        on_progress(stage, message.get('data') or {}, seconds)
+                    except Exception as e:
+                        print(f"[blender_pool] Progress callback failed for {stage}: {e}")
+                continue
+            if message.get('id') != job_id:
+                continue
+
+            self.jobs_done += 1
+            if not message.get('ok'):
+                raise JobFailed(message.get('error', 'Unknown worker error'), message.get('traceback'),
+                                self.logs.text(), stage)
+            return message.get('result') or {}
+
+    def stop(self, timeout=10.0):
+        if not self.alive():
+            return
+        try:
+            self.process.stdin.write(json.dumps({"command": "shutdown"}) + '\n')
+            self.process.stdin.flush()
+            self.process.wait(timeout=timeout)
+        except Exception:
+            self.kill()
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+            self.process.wait()
+
+
+class BlenderWorkerPool:
+    """
+    Fixed-size pool of BlenderWorker processes, started lazily. Workers are
+    recycled after `max_jobs_per_worker` jobs or when their RSS exceeds
+    `max_rss_mb`; crashed or timed-out workers are replaced and the job is
+    retried up to `crash_retries` times. A job with no progress or output
+    for `stall_timeout` seconds counts as timed out.
+    """
+
+    def __init__(self, command, size=1, job_timeout=300.0, max_jobs_per_worker=25,
+                 max_rss_mb=2048, startup_timeout=120.0, crash_retries=1, env=None, stall_timeout=None):
+        self.command = list(command)
+        self.size = size
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else 0
+        self.startup_timeout = startup_timeout
+        self.crash_retries = crash_retries
+        self.env = env
+        self.stall_timeout = stall_timeout
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._workers = set()
+        self._closed = False
+        self.counters = {
+            "jobs": 0,
+            "failures": 0,
+            "crashes": 0,
+            "timeouts": 0,
+            "stalls": 0,
+            "busy": 0,
+            "workers_started": 0,
+            "workers_recycled": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _acquire(self, timeout=None) -> BlenderWorker:
+        if not self._slots.acquire(timeout=timeout):
+            self._count("busy")
+            raise PoolBusy(f"No Blender worker free within {timeout:.1f}s")
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+                self._workers.discard(worker)
+        try:
+            worker = BlenderWorker(self.command, startup_timeout=self.startup_timeout, env=self.env)
+            worker.start()
+            with self._lock:
+                self._workers.add(worker)
+            self._count("workers_started")
+            return worker
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: BlenderWorker, discard=False):
+        try:
+            if not discard and self._should_recycle(worker):
+                print(f"[blender_pool] Recycling worker {worker.pid} after {worker.jobs_done} jobs")
+                self._count("workers_recycled")
+                discard = True
+            if discard or self._closed:
+                worker.stop()
+                with self._lock:
+                    self._workers.discard(worker)
+            else:
+                with self._lock:
+                    self._idle.append(worker)
+        finally:
+            self._slots.release()
+
+    def _should_recycle(self, worker: BlenderWorker) -> bool:
+        if not worker.alive():
+            return True
+        if self.max_jobs_per_worker and worker.jobs_done >= self.max_jobs_per_worker:
+            return True
+        return bool(self.max_rss_bytes) and worker.rss_bytes() > self.max_rss_bytes
+
+    def run(self, input_path: str, output_path: str, options=None, timeout=None, on_progress=None) -> dict:
+        """
+        Runs one job on a pooled worker and returns the worker's result dict.
+        on_progress(stage, data, seconds) is called as the worker reports progress.
+        `timeout` covers waiting for a free worker too (PoolBusy if none frees up).
+        """
+        if self._closed:
+            raise WorkerError("Pool is shut down")
+        timeout = timeout or self.job_timeout
+        deadline = time.monotonic() + timeout
+
+        for attempt in range(self.crash_retries + 1):
+            worker = self._acquire(max(deadline - time.monotonic(), 0))
+            left = deadline - time.monotonic()
+            if left <= 0:
+                # Starting the worker used up the time; it's still good for the next job
+                self._release(worker)
+                raise PoolBusy(f"No time left for the job within {timeout:.1f}s")
+            discard = False
+            try:
+                self._count("jobs")
+                return worker.run_job(input_path, output_path, options, timeout=left, on_progress=on_progress,
+                                      stall_timeout=self.stall_timeout)
+            except JobFailed:
+                self._count("failures")
+                raise
+            except WorkerTimeout as e:
+                # A job that hangs once will most likely hang again; don't retry
+                self._count("stalls" if isinstance(e, WorkerStalled) else "timeouts")
+                discard = True
+                raise
+            except WorkerCrashed as e:
+                self._count("crashes")
+                discard = True
+                print(f"[blender_pool] {e}")
+                if attempt >= self.crash_retries:
+                    raise
+            finally:
+                self._release(worker, discard=discard)
+
+    def rss_bytes(self) -> int:
+        """Combined RSS of the live workers, idle or busy."""
+        with self._lock:
+            workers = list(self._workers)
+        return sum(worker.rss_bytes() for worker in workers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, size=self.size, idle=len(self._idle), workers=len(self._workers))
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+            with self._lock:
+                self._workers.discard(worker)
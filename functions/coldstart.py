@@ -0,0 +1,189 @@
+import importlib
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+###############################################################################
+# Cold-start Profiling and Lazy Imports
+###############################################################################
+# Functions scale to zero, so every cold start pays for main.py's imports and
+# for whatever the entry point initializes on its first request. Heavy
+# subsystems (gradio_client, numpy and the mesh modules, httpx) are imported
+# through lazy_import(): it returns a stand-in that does the real import on
+# first attribute access, so only the entry points that use a subsystem pay
+# for it. Handles (Firebase app, bucket, pools) are created on first use.
+#
+# Recorded per process, for the metrics endpoint (report()/gauges()):
+#   main_import  this module's import -> mark_ready() at the end of main.py
+#   imports      each lazy module's real import time
+#   init         each phase('...') block (Firebase app, first bucket, ...)
+#
+# import_profile() runs `python -X importtime` in a fresh interpreter for
+# per-module costs; benchmarks/bench_coldstart.py uses it to hold main.py's
+# import to a budget and to check the deferred modules stay deferred.
+
+LOADED_AT = time.perf_counter()
+
+# Modules main.py must not import at load time (see bench_coldstart.py)
+DEFERRED_MODULES = ('gradio_client', 'google.cloud.storage', 'numpy')
+
+_lock = threading.RLock()
+_profile = {"main_import": None, "imports": {}, "init": {}}
+
+
+def _record(kind: str, name: str, seconds: float):
+    with _lock:
+        _profile[kind][name] = {
+            "seconds": round(seconds, 4),
+            "at": round(time.perf_counter() - LOADED_AT, 3),
+        }
+    print(f"[coldstart] {kind} {name}: {seconds:.3f}s")
+
+
+class LazyModule:
+    """Module stand-in; the real import happens on first attribute access."""
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    name = self.__dict__['_name']
+                    already_loaded = name in sys.modules
+                    start = time.perf_counter()
+                    module = importlib.import_module(name)
+                    if not already_loaded:
+                        _record('imports', name, time.perf_counter() - start)
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+@contextmanager
+def phase(name: str):
+    """Times a first-use initialization (recorded even if it fails)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record('init', name, time.perf_counter() - start)
+
+
+def mark_ready():
+    """Call at the end of main.py: records how long its import took."""
+    with _lock:
+        if _profile['main_import'] is None:
+            _profile['main_import'] = round(time.perf_counter() - LOADED_AT, 4)
+    print(f"[coldstart] main.py imported in {_profile['main_import']:.3f}s")
+
+
+def report() -> dict:
+    with _lock:
+        return {
+            "main_import": _profile['main_import'],
+            "uptime": round(time.perf_counter() - LOADED_AT, 3),
+            "imports": dict(_profile['imports']),
+            "init": dict(_profile['init']),
+        }
+
+
+def gauges() -> dict:
+    """Flat numeric view of report() for tracing.registry.add_collector()."""
+    current = report()
+    values = {}
+    if current['main_import'] is not None:
+        values['main_import_seconds'] = current['main_import']
+    for kind in ('imports', 'init'):
+        for name, entry in current[kind].items():
+            values[f"{kind}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_seconds"] = entry['seconds']
+    return values
+
+
+###############################################################################
+# Import-time Profile (fresh interpreter)
+###############################################################################
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def parse_importtime(stderr: str) -> list:
+    """`-X importtime` output -> [{name, self_us, cumulative_us, depth}] in import order."""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules.append({
+                "name": match.group(4),
+                "self_us": int(match.group(1)),
+                "cumulative_us": int(match.group(2)),
+                "depth": len(match.group(3)) // 2,
+            })
+    return modules
+
+
+def target_modules(modules: list, target: str) -> list:
+    """The part of a parsed profile imported by `target` (importtime lists children first)."""
+    for index, module in enumerate(modules):
+        if module['name'] == target and module['depth'] == 0:
+            start = index
+            while start > 0 and modules[start - 1]['depth'] > 0:
+                start -= 1
+            return modules[start:index]
+    return []
+
+
+def import_profile(target: str = 'main', cwd: str = None, env: dict = None, python: str = sys.executable) -> dict:
+    """
+    Imports `target` in a new interpreter with -X importtime. Returns
+    {ok, wall_seconds, total_us, modules, error}; total_us is the target's
+    cumulative import time and modules only lists what the target imported
+    (not the interpreter's own startup).
+    """
+    start = time.perf_counter()
+    process = subprocess.run([python, '-X', 'importtime', '-c', f'import {target}'],
+                             cwd=cwd, env=env, capture_output=True, text=True)
+    wall_seconds = time.perf_counter() - start
+    modules = parse_importtime(process.stderr)
+    total = next((m['cumulative_us'] for m in modules if m['name'] == target and m['depth'] == 0), None)
+    errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+    return {
+        "ok": process.returncode == 0,
+        "wall_seconds": round(wall_seconds, 3),
+        "total_us": total,
+        "modules": target_modules(modules, target),
+        "error": '\n'.join(errors[-20:]) if process.returncode != 0 else None,
+    }
+
+
+def check_budget(profile: dict, budget_ms: float = None, deferred=DEFERRED_MODULES) -> list:
+    """Returns a list of budget violations (empty when within budget)."""
+    violations = []
+    if not profile['ok']:
+        return [f"import failed:\n{profile['error']}"]
+    if budget_ms is not None and profile['total_us'] is not None and profile['total_us'] / 1000 > budget_ms:
+        violations.append(f"import took {profile['total_us'] / 1000:.0f}ms, budget is {budget_ms:.0f}ms")
+    loaded = {m['name']: m for m in profile['modules']}
+    for name in deferred:
+        if name in loaded:
+            violations.append(f"{name} is imported at load time ({loaded[name]['cumulative_us'] / 1000:.0f}ms)")
+    return violations
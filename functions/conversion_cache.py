@@ -0,0 +1,170 @@
+import hashlib
+import json
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+###############################################################################
+# Content-addressed Conversion Cache
+###############################################################################
+# Key = sha256(GLB bytes) + conversion options (weld threshold, triangulation,
+# output format, pipeline version). Two tiers:
+#  - local: in-memory LRU of index entries for the warm instance, capped in
+#    entries (metadata only; the files are in storage)
+#  - storage: a small JSON index blob per key under conversions/_index/ that
+#    points at the blobs we already uploaded for an earlier request.
+# Cached outputs are uploaded under conversions/_cas/{key}/ (content_blob_base)
+# rather than under a design's folder, so converting another GLB for the same
+# design can't overwrite what an index entry points at.
+# A hit in either tier lets convert_glb_http skip both conversion and upload.
+# A storage entry only counts as a hit if its index parses and the blob it
+# points at is still there at the recorded size (not deleted or half written);
+# otherwise it's counted as invalid and treated as a miss.
+# Cache failures are logged and counted, never raised to the caller.
+
+INDEX_PREFIX = 'conversions/_index'
+CAS_PREFIX = 'conversions/_cas'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(content_hash: str, options: dict) -> str:
+    """Stable key for (GLB content, conversion options)."""
+    payload = json.dumps({"content": content_hash, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def content_blob_base(key: str) -> str:
+    """Blob path stem (add a suffix) for outputs stored under a cache key."""
+    return f"{CAS_PREFIX}/{key}/model"
+
+
+class LocalLRUCache:
+    """Entry-capped in-memory LRU of index entries for the current instance."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> index entry
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry)
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = dict(entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ConversionCache:
+    """
+    Two-tier cache. `get_bucket` is a zero-arg callable returning the storage
+    bucket (Firebase, or local_storage.LocalBucket in tests).
+    """
+
+    def __init__(self, get_bucket, local: LocalLRUCache = None, index_prefix: str = INDEX_PREFIX):
+        self.get_bucket = get_bucket
+        self.local = local
+        self.index_prefix = index_prefix
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits_local": 0,
+            "hits_storage": 0,
+            "misses": 0,
+            "invalid": 0,
+            "stores": 0,
+            "errors": 0,
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _index_path(self, key: str) -> str:
+        return f"{self.index_prefix}/{key}.json"
+
+    @staticmethod
+    def _read_entry(index_blob):
+        """The parsed index entry, or None if it is corrupt."""
+        try:
+            entry = json.loads(index_blob.download_as_bytes())
+            return entry if isinstance(entry, dict) and isinstance(entry.get('blob_path'), str) else None
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _blob_intact(bucket, entry: dict) -> bool:
+        """The blob an entry points at still exists at the size recorded when it was stored."""
+        blob = bucket.get_blob(entry['blob_path'])
+        if blob is None:
+            return False
+        return entry.get('blob_size') is None or blob.size == entry['blob_size']
+
+    def lookup(self, key: str):
+        """Returns (entry, tier) on a hit, (None, 'miss') otherwise. entry has url/blob_path."""
+        if self.local is not None:
+            entry = self.local.get(key)
+            if entry is not None:
+                self._count("hits_local")
+                return entry, 'local'
+
+        try:
+            bucket = self.get_bucket()
+            index_blob = bucket.blob(self._index_path(key))
+            if index_blob.exists():
+                entry = self._read_entry(index_blob)
+                if entry is not None and self._blob_intact(bucket, entry):
+                    if self.local is not None:
+                        self.local.put(key, entry)
+                    self._count("hits_storage")
+                    return entry, 'storage'
+                self._count("invalid")
+                print(f"[conversion_cache] Ignoring invalid entry for {key}")
+        except Exception as e:
+            self._count("errors")
+            print(f"[conversion_cache] Lookup failed for {key}: {e}")
+            print(f"Error traceback: {traceback.format_exc()}")
+
+        self._count("misses")
+        return None, 'miss'
+
+    def store(self, key: str, blob_path: str, url: str, blob_size: int = None, **info):
+        """Records a freshly uploaded conversion in both tiers. blob_size lets lookups spot a partial blob."""
+        entry = dict(info, url=url, blob_path=blob_path, blob_size=blob_size, created=time.time())
+        try:
+            index_blob = self.get_bucket().blob(self._index_path(key))
+            index_blob.upload_from_string(json.dumps(entry), content_type='application/json')
+            if self.local is not None:
+                self.local.put(key, entry)
+            self._count("stores")
+        except Exception as e:
+            self._count("errors")
+            print(f"[conversion_cache] Store failed for {key}: {e}")
+            print(f"Error traceback: {traceback.format_exc()}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["hits_local"] + stats["hits_storage"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits_local"] + stats["hits_storage"]) / lookups if lookups else 0.0
+        if self.local is not None:
+            stats["local_entries"] = len(self.local)
+        return stats
@@ -0,0 +1,413 @@
+import time
+
+import numpy as np
+
+###############################################################################
+# Quadric Edge-collapse Decimation (LODs)
+###############################################################################
+# Garland-Heckbert simplification, batched so each pass is a handful of
+# array operations instead of a per-edge priority queue:
+#  - every vertex carries the sum of its faces' unit plane quadrics, plus
+#    stiff planes perpendicular to boundary edges so open borders don't
+#    erode; a quadric's cost at a point is then the sum of squared distances
+#    to those planes, never less than the squared distance to any one
+#  - a pass scores every edge (best of the quadric-optimal point, both
+#    endpoints and the midpoint), takes the cheapest edges that share no
+#    vertex, and drops any collapse that would flip a neighbouring face
+#  - passes repeat until the face target is met, no edge is under the error
+#    limit, or a pass makes no progress
+#
+# Errors are measured distances, not quadric costs: each moved vertex
+# against the original triangles it came from, and each original vertex
+# against the triangles around the vertex it was merged into. With
+# maxError, collapses whose measured error exceeds the limit are undone and
+# never retried. relative_error divides the largest by the bbox diagonal.
+
+BOUNDARY_WEIGHT = 100.0
+PASS_FRACTION = 0.25  # share of the cheapest edges considered in one pass
+MAX_PASSES = 200
+MAX_LOD_LEVELS = 4
+
+# Quadric components (symmetric 4x4 stored as its upper triangle)
+A2, AB, AC, AD, B2, BC, BD, C2, CD, D2 = range(10)
+
+
+def parse_lod_spec(spec) -> dict:
+    """
+    Accepts a number (0 < x < 1: face ratio, x >= 1: face count) or a dict
+    with targetFaces / ratio / maxError (fraction of the bbox diagonal).
+    Returns decimate() keyword arguments. Raises ValueError on bad input.
+    """
+    if isinstance(spec, bool):
+        raise ValueError(f"Invalid LOD spec: {spec!r}")
+    if isinstance(spec, (int, float)):
+        spec = {"ratio": spec} if 0 < spec < 1 else {"targetFaces": spec}
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid LOD spec: {spec!r}")
+
+    kwargs = {}
+    if spec.get("targetFaces") is not None:
+        kwargs["target_faces"] = int(spec["targetFaces"])
+        if kwargs["target_faces"] < 4:
+            raise ValueError("targetFaces must be at least 4")
+    if spec.get("ratio") is not None:
+        kwargs["target_ratio"] = float(spec["ratio"])
+        if not 0 < kwargs["target_ratio"] < 1:
+            raise ValueError("ratio must be between 0 and 1")
+    if spec.get("maxError") is not None:
+        kwargs["max_relative_error"] = float(spec["maxError"])
+        if kwargs["max_relative_error"] <= 0:
+            raise ValueError("maxError must be positive")
+    if not kwargs:
+        raise ValueError(f"LOD spec needs targetFaces, ratio or maxError: {spec!r}")
+    return kwargs
+
+
+###############################################################################
+# Quadrics
+###############################################################################
+def _plane_quadrics(normals: np.ndarray, offsets: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    a, b, c = normals[:, 0], normals[:, 1], normals[:, 2]
+    d = offsets
+    return weights[:, None] * np.stack([a * a, a * b, a * c, a * d, b * b, b * c, b * d, c * c, c * d, d * d], axis=1)
+
+
+def _accumulate(quadrics: np.ndarray, vertex_ids: np.ndarray, vertex_count: int, repeat: int) -> np.ndarray:
+    """Sums per-element quadrics onto their vertices (each element touches `repeat` vertices)."""
+    out = np.empty((vertex_count, 10))
+    for k in range(10):
+        out[:, k] = np.bincount(vertex_ids, weights=np.repeat(quadrics[:, k], repeat), minlength=vertex_count)
+    return out
+
+
+def _face_normals(vertices, faces):
+    v0 = vertices[faces[:, 0]]
+    normals = np.cross(vertices[faces[:, 1]] - v0, vertices[faces[:, 2]] - v0)
+    return normals, v0
+
+
+def _area(vertices, faces) -> float:
+    return float(np.linalg.norm(_face_normals(vertices, faces)[0], axis=1).sum() / 2)
+
+
+def _unique_edges(faces: np.ndarray, vertex_count: int):
+    """Returns (edges (e, 2) with edges[:, 0] < edges[:, 1], face index of each first use, use counts)."""
+    pairs = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    pairs.sort(axis=1)
+    keys = pairs[:, 0] * vertex_count + pairs[:, 1]
+    keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    edges = np.stack([keys // vertex_count, keys % vertex_count], axis=1)
+    return edges, first // 3, counts
+
+
+def vertex_quadrics(vertices: np.ndarray, faces: np.ndarray, boundary_weight: float = BOUNDARY_WEIGHT) -> np.ndarray:
+    """(n, 10) quadric per vertex: face planes, plus boundary-edge constraint planes."""
+    normals, v0 = _face_normals(vertices, faces)
+    double_area = np.linalg.norm(normals, axis=1)
+    unit = normals / np.where(double_area > 0, double_area, 1.0)[:, None]
+    offsets = -np.einsum('ij,ij->i', unit, v0)
+    quadrics = _accumulate(_plane_quadrics(unit, offsets, np.ones(len(faces))), faces.ravel(), len(vertices), 3)
+
+    edges, edge_faces, counts = _unique_edges(faces, len(vertices))
+    boundary = counts == 1
+    if boundary_weight and boundary.any():
+        edges, edge_faces = edges[boundary], edge_faces[boundary]
+        direction = vertices[edges[:, 1]] - vertices[edges[:, 0]]
+        plane_normals = np.cross(direction, unit[edge_faces])
+        length = np.linalg.norm(plane_normals, axis=1)
+        plane_normals /= np.where(length > 0, length, 1.0)[:, None]
+        plane_offsets = -np.einsum('ij,ij->i', plane_normals, vertices[edges[:, 0]])
+        weights = np.full(len(edges), float(boundary_weight))
+        quadrics += _accumulate(_plane_quadrics(plane_normals, plane_offsets, weights), edges.ravel(),
+                                len(vertices), 2)
+    return quadrics
+
+
+def quadric_cost(q: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """v^T Q v for rows of quadrics q (e, 10) and points p (e, 3)."""
+    x, y, z = p[:, 0], p[:, 1], p[:, 2]
+    cost = (q[:, A2] * x * x + q[:, B2] * y * y + q[:, C2] * z * z
+            + 2 * (q[:, AB] * x * y + q[:, AC] * x * z + q[:, BC] * y * z)
+            + 2 * (q[:, AD] * x + q[:, BD] * y + q[:, CD] * z) + q[:, D2])
+    return np.maximum(cost, 0.0)
+
+
+def edge_collapse_costs(quadrics: np.ndarray, vertices: np.ndarray, edges: np.ndarray):
+    """Returns (cost, position) of the cheapest collapse target for every edge."""
+    q = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    p0, p1 = vertices[edges[:, 0]], vertices[edges[:, 1]]
+    mid = (p0 + p1) / 2
+
+    # Quadric-optimal point where the 3x3 system is well conditioned and the
+    # result stays near the edge
+    # (closed-form 3x3 inverse; much faster than batched np.linalg for this size)
+    a, b, c, d, e, f = q[:, A2], q[:, AB], q[:, AC], q[:, B2], q[:, BC], q[:, C2]
+    co_a, co_b, co_c = d * f - e * e, c * e - b * f, b * e - c * d
+    co_d, co_e, co_f = a * f - c * c, b * c - a * e, a * d - b * b
+    det = a * co_a + b * co_b + c * co_c
+    scale = np.abs(a + d + f) ** 3
+    solvable = np.abs(det) > 1e-10 * np.maximum(scale, 1e-300)
+    safe_det = np.where(solvable, det, 1.0)
+    rx, ry, rz = -q[:, AD], -q[:, BD], -q[:, CD]
+    optimal = np.stack([co_a * rx + co_b * ry + co_c * rz,
+                        co_b * rx + co_d * ry + co_e * rz,
+                        co_c * rx + co_e * ry + co_f * rz], axis=1) / safe_det[:, None]
+    optimal[~solvable] = mid[~solvable]
+    near = np.linalg.norm(optimal - mid, axis=1) <= np.linalg.norm(p1 - p0, axis=1)
+    usable = solvable & near
+
+    candidates = np.stack([optimal, p0, p1, mid], axis=1)
+    costs = np.stack([quadric_cost(q, optimal), quadric_cost(q, p0), quadric_cost(q, p1), quadric_cost(q, mid)], axis=1)
+    costs[~usable, 0] = np.inf
+    best = np.argmin(costs, axis=1)
+    rows = np.arange(len(edges))
+    return costs[rows, best], candidates[rows, best]
+
+
+###############################################################################
+# Measured Error
+###############################################################################
+DISTANCE_CHUNK = 262144  # point/triangle pairs per batch
+
+
+def _segment_distance(p, a, b):
+    ab = b - a
+    length = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', p - a, ab) / np.where(length > 0, length, 1.0)
+    closest = a + np.clip(t, 0.0, 1.0)[:, None] * ab
+    return np.linalg.norm(p - closest, axis=1)
+
+
+def point_triangle_distance(p: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Distance from each point p[i] to the triangle (a[i], b[i], c[i])."""
+    normals = np.cross(b - a, c - a)
+    norm2 = np.einsum('ij,ij->i', normals, normals)
+    safe = np.where(norm2 > 0, norm2, 1.0)
+    offset = p - a
+    plane = np.einsum('ij,ij->i', offset, normals) / safe
+    projected = p - plane[:, None] * normals
+    # Barycentric signs of the projection; outside it, the nearest point is on an edge
+    u = np.einsum('ij,ij->i', np.cross(c - b, projected - b), normals)
+    v = np.einsum('ij,ij->i', np.cross(a - c, projected - c), normals)
+    w = np.einsum('ij,ij->i', np.cross(b - a, projected - a), normals)
+    inside = (norm2 > 0) & (u >= 0) & (v >= 0) & (w >= 0)
+    edge = np.minimum(np.minimum(_segment_distance(p, a, b), _segment_distance(p, b, c)), _segment_distance(p, c, a))
+    return np.where(inside, np.abs(plane) * np.sqrt(norm2), edge)
+
+
+def _min_distances(points, point_ids, tri_vertices, tri_faces, face_ids, size) -> np.ndarray:
+    """Per point id, the smallest distance over its (point, face) pairs; inf for ids without pairs."""
+    out = np.full(size, np.inf)
+    for lo in range(0, len(point_ids), DISTANCE_CHUNK):
+        ids = point_ids[lo:lo + DISTANCE_CHUNK]
+        corners = tri_faces[face_ids[lo:lo + DISTANCE_CHUNK]]
+        distance = point_triangle_distance(points[ids], tri_vertices[corners[:, 0]],
+                                           tri_vertices[corners[:, 1]], tri_vertices[corners[:, 2]])
+        np.minimum.at(out, ids, distance)
+    return out
+
+
+def surface_deviation(original_vertices, original_faces, vertices, faces, rep, moved):
+    """
+    Measured errors around the `moved` (mask over `vertices`) vertices:
+      (per vertex: distance to the original faces merged into it,
+       per original vertex: distance to the faces around rep[vertex])
+    with inf where nothing was measured. rep maps original vertices to the
+    rows of `vertices` they were merged into.
+    """
+    # Moved vertices against the original triangles of their cluster
+    corner_rep = rep[original_faces]
+    face_ids, corner = np.nonzero(moved[corner_rep])
+    cluster_error = _min_distances(vertices, corner_rep[face_ids, corner], original_vertices, original_faces,
+                                   face_ids, len(vertices))
+
+    # Original vertices whose representative's one-ring changed shape, against that ring
+    near = np.zeros(len(vertices), dtype=bool)
+    near[faces[moved[faces].any(axis=1)]] = True
+    face_ids, corner = np.nonzero(near[faces])
+    ring_vertex = faces[face_ids, corner]
+    members = np.argsort(rep, kind='stable')
+    counts = np.bincount(rep, minlength=len(vertices))
+    starts = np.cumsum(counts) - counts
+    per_corner = counts[ring_vertex]
+    total = int(per_corner.sum())
+    offsets = np.repeat(starts[ring_vertex] - (np.cumsum(per_corner) - per_corner), per_corner) + np.arange(total)
+    vertex_error = _min_distances(original_vertices, members[offsets], vertices, faces,
+                                  np.repeat(face_ids, per_corner), len(original_vertices))
+    return cluster_error, vertex_error
+
+
+###############################################################################
+# Decimation
+###############################################################################
+def _independent(edges: np.ndarray, vertex_count: int, rounds: int = 8) -> np.ndarray:
+    """
+    Mask of edges (given in priority order) sharing no vertex. Each round,
+    an edge wins if it's the best remaining claim on both endpoints; edges
+    touching a winner drop out, and the rest try again.
+    """
+    selected = np.zeros(len(edges), dtype=bool)
+    taken = np.zeros(vertex_count, dtype=bool)
+    remaining = np.arange(len(edges))
+    for _ in range(rounds):
+        remaining = remaining[~(taken[edges[remaining, 0]] | taken[edges[remaining, 1]])]
+        if not len(remaining):
+            break
+        rank = np.arange(len(remaining))
+        claim = np.full(vertex_count, len(remaining))
+        np.minimum.at(claim, edges[remaining, 0], rank)
+        np.minimum.at(claim, edges[remaining, 1], rank)
+        winners = remaining[(claim[edges[remaining, 0]] == rank) & (claim[edges[remaining, 1]] == rank)]
+        selected[winners] = True
+        taken[edges[winners].ravel()] = True
+    return selected
+
+
+def _reject_flips(vertices, faces, edges, positions, max_rounds=3) -> np.ndarray:
+    """Mask of collapses that don't turn any surviving neighbouring face over."""
+    keep = np.ones(len(edges), dtype=bool)
+    for _ in range(max_rounds):
+        owner = np.full(len(vertices), -1)
+        owner[edges[keep, 0]] = np.flatnonzero(keep)
+        owner[edges[keep, 1]] = np.flatnonzero(keep)
+        face_owner = owner[faces]
+        touched = (face_owner >= 0).any(axis=1)
+        removed = (((face_owner[:, 0] == face_owner[:, 1]) | (face_owner[:, 0] == face_owner[:, 2]))
+                   & (face_owner[:, 0] >= 0)) | ((face_owner[:, 1] == face_owner[:, 2]) & (face_owner[:, 1] >= 0))
+        check = np.flatnonzero(touched & ~removed)
+        if not len(check):
+            break
+
+        moved = vertices[faces[check]]
+        check_owner = face_owner[check]
+        moved_mask = check_owner >= 0
+        moved[moved_mask] = positions[check_owner[moved_mask]]
+        old, _ = _face_normals(vertices, faces[check])
+        new = np.cross(moved[:, 1] - moved[:, 0], moved[:, 2] - moved[:, 0])
+        flipped = np.einsum('ij,ij->i', old, new) <= 0
+        if not flipped.any():
+            break
+        bad = np.unique(check_owner[flipped])
+        keep[bad[bad >= 0]] = False
+    return keep
+
+
+def decimate(vertices: np.ndarray, faces: np.ndarray, target_faces: int = None, target_ratio: float = None,
+             max_relative_error: float = None, boundary_weight: float = BOUNDARY_WEIGHT,
+             max_passes: int = MAX_PASSES):
+    """
+    Simplifies an indexed triangle mesh towards target_faces (or
+    target_ratio * faces) without exceeding max_relative_error (fraction of
+    the bbox diagonal). Returns (vertices, faces, stats).
+    """
+    start = time.perf_counter()
+    vertices = np.array(vertices, dtype=np.float64)
+    faces = np.array(faces, dtype=np.int64)
+    input_faces = len(faces)
+
+    target = 0
+    if target_faces is not None:
+        target = max(target, int(target_faces))
+    if target_ratio is not None:
+        target = max(target, int(input_faces * target_ratio))
+
+    bbox_diagonal = float(np.linalg.norm(np.ptp(vertices, axis=0))) if len(vertices) else 0.0
+    error_limit = np.inf
+    if max_relative_error is not None:
+        error_limit = max_relative_error * bbox_diagonal
+    cost_limit = error_limit ** 2
+
+    input_area = _area(vertices, faces)
+    quadrics = vertex_quadrics(vertices, faces, boundary_weight)
+    original_vertices, original_faces = vertices.copy(), faces
+    rep = np.arange(len(vertices))  # original vertex -> the vertex it was merged into
+    frozen = np.zeros(0, dtype=np.int64)  # keys of edges whose collapse measured over the limit
+    passes = 0
+
+    while len(faces) > target and passes < max_passes:
+        passes += 1
+        edges, _, _ = _unique_edges(faces, len(vertices))
+        costs, positions = edge_collapse_costs(quadrics, vertices, edges)
+        if len(frozen):
+            costs[np.isin(edges[:, 0] * len(vertices) + edges[:, 1], frozen)] = np.inf
+
+        # Interior collapses remove two faces each
+        needed = max(1, (len(faces) - target + 1) // 2)
+        pool = max(1, min(int(len(edges) * PASS_FRACTION), needed * 2))
+        if pool < len(costs):
+            order = np.argpartition(costs, pool - 1)[:pool]
+            order = order[np.argsort(costs[order], kind='stable')]
+        else:
+            order = np.argsort(costs, kind='stable')
+        order = order[costs[order] <= cost_limit]
+        if not len(order):
+            break
+        order = order[_independent(edges[order], len(vertices))][:needed]
+        order = order[_reject_flips(vertices, faces, edges[order], positions[order])]
+        if not len(order):
+            break
+
+        while len(order):
+            keep_v, drop_v = edges[order, 0], edges[order, 1]
+            new_vertices = vertices.copy()
+            new_vertices[keep_v] = positions[order]
+            remap = np.arange(len(vertices))
+            remap[drop_v] = keep_v
+            new_faces = remap[faces]
+            new_faces = new_faces[(new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2])
+                                  & (new_faces[:, 0] != new_faces[:, 2])]
+            if max_relative_error is None:
+                break
+            # Undo (and never retry) collapses that moved the surface further than the limit
+            moved = np.zeros(len(vertices), dtype=bool)
+            moved[keep_v] = True
+            new_rep = remap[rep]
+            cluster_error, vertex_error = surface_deviation(original_vertices, original_faces, new_vertices,
+                                                            new_faces, new_rep, moved)
+            owner = np.full(len(vertices), -1)
+            owner[keep_v] = np.arange(len(order))
+            over = np.zeros(len(vertices), dtype=bool)
+            over[np.flatnonzero(np.isfinite(cluster_error) & (cluster_error > error_limit))] = True
+            over[new_rep[np.isfinite(vertex_error) & (vertex_error > error_limit)]] = True
+            if not over.any():
+                break
+            blamed = owner[new_faces[over[new_faces].any(axis=1)]].ravel()
+            blamed = np.union1d(blamed[blamed >= 0], owner[over & (owner >= 0)])
+            bad = np.zeros(len(order), dtype=bool)
+            bad[blamed] = True
+            frozen = np.concatenate([frozen, edges[order[bad], 0] * len(vertices) + edges[order[bad], 1]])
+            order = order[~bad]
+        if not len(order):
+            continue
+
+        vertices, faces = new_vertices, new_faces
+        quadrics[keep_v] += quadrics[drop_v]
+        rep = remap[rep]
+
+    # Measured against the input everywhere, so the stats are real distances
+    cluster_error, vertex_error = surface_deviation(original_vertices, original_faces, vertices, faces, rep,
+                                                    np.ones(len(vertices), dtype=bool))
+    cluster_error = cluster_error[np.isfinite(cluster_error)]
+    vertex_error = vertex_error[np.isfinite(vertex_error)]
+    max_error = float(max(cluster_error.max(initial=0.0), vertex_error.max(initial=0.0)))
+
+    # Drop duplicate faces left by collapses in non-manifold spots, then unused vertices
+    _, unique_rows = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    faces = faces[np.sort(unique_rows)]
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    out_vertices = vertices[used]
+
+    stats = {
+        "input_faces": input_faces,
+        "faces": len(faces),
+        "vertices": len(out_vertices),
+        "target_faces": target,
+        "passes": passes,
+        "decimation_time": round(time.perf_counter() - start, 4),
+        "max_error": max_error,
+        "mean_error": float(vertex_error.mean()) if len(vertex_error) else 0.0,
+        "relative_error": max_error / bbox_diagonal if bbox_diagonal else 0.0,
+        "area_ratio": _area(out_vertices, faces) / input_area if input_area else 1.0,
+    }
+    return out_vertices, faces, stats
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import re
+import threading
+import urllib.parse
+
+import coldstart
+import retries
+
+# Imported on first download, not when main.py loads
+httpx = coldstart.lazy_import('httpx')
+
+###############################################################################
+# Streaming, Pooled, Resumable Downloads
+###############################################################################
+#  - One module-level httpx.Client per instance (keep-alive connection pool,
+#    HTTP/2 when DOWNLOAD_HTTP2=1 and the h2 package is installed)
+#  - Bodies are streamed to disk in chunks and hashed as they arrive, so we
+#    never hold a whole GLB in memory
+#  - A Download object keeps its progress between attempts; a retry asks for
+#    the remaining bytes with a Range header instead of starting over
+#  - max_bytes aborts as soon as Content-Length or the streamed byte count
+#    goes over the limit
+#  - the request deadline (retries.py) caps each attempt's timeouts, and a
+#    transfer that is still trickling in when the deadline passes is aborted
+#  - attempt(cancel=...) stops at the next chunk once the event is set (the
+#    losing side of a hedged download)
+#  - copy_file_url() handles file:// URLs for local runs (main.py only allows
+#    them when ALLOW_FILE_URLS=1)
+
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_HTTP2 = os.environ.get('DOWNLOAD_HTTP2', '0') == '1'
+
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class DownloadTooLarge(Exception):
+    """The body is bigger than the configured max size. Not worth retrying."""
+
+
+class IncompleteDownload(Exception):
+    """The connection ended before the full body arrived."""
+
+
+class DownloadCancelled(Exception):
+    """attempt() was cancelled (another hedged attempt finished first)."""
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    if not DOWNLOAD_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("[downloads] DOWNLOAD_HTTP2=1 but h2 is not installed, using HTTP/1.1")
+        return False
+
+
+def get_client() -> 'httpx.Client':
+    """Shared keep-alive client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            with coldstart.phase('http_client'):
+                _client = httpx.Client(
+                    timeout=httpx.Timeout(connect=30.0, read=180.0, write=60.0, pool=60.0),
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+                    http2=_http2_available(),
+                    follow_redirects=True,
+                    # Byte offsets for Range only make sense on the raw bytes
+                    headers={"Accept-Encoding": "identity"},
+                )
+    return _client
+
+
+def _validator(headers):
+    """A strong ETag, else Last-Modified: what If-Range may carry. None if neither is there."""
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+class Download:
+    """
+    One file download that can be attempted several times. Each attempt()
+    continues from the bytes already on disk when the server supports Range,
+    sending If-Range with the first response's strong ETag (or Last-Modified)
+    so a file changed in between comes back whole (200) instead of spliced.
+    Without either validator it starts over.
+    """
+
+    def __init__(self, url: str, path: str, max_bytes: int = None, client: 'httpx.Client' = None,
+                 chunk_size: int = CHUNK_SIZE, on_size=None):
+        self.url = url
+        self.path = path
+        self.max_bytes = max_bytes
+        self.client = client
+        self.chunk_size = chunk_size
+        # Called with the total size as soon as it's known, before the body; may raise to abort
+        self.on_size = on_size
+        self.attempts = 0
+        self.resumed_bytes = 0
+        self.total_bytes = None
+        self._reset()
+
+    def _reset(self):
+        self.bytes_written = 0
+        self.validator = None
+        self._hasher = hashlib.sha256()
+        open(self.path, 'wb').close()
+
+    def _check_size(self, size):
+        if self.max_bytes and size is not None and size > self.max_bytes:
+            raise DownloadTooLarge(f"{self.url} is larger than the {self.max_bytes} byte limit ({size} bytes)")
+
+    def _timeout(self, client) -> 'httpx.Timeout':
+        """The client's timeouts, shortened to what's left of the request deadline."""
+        if retries.remaining() is None:
+            return client.timeout
+        default = client.timeout
+        return httpx.Timeout(connect=retries.timeout(default.connect), read=retries.timeout(default.read),
+                             write=retries.timeout(default.write), pool=retries.timeout(default.pool))
+
+    def attempt(self, cancel: threading.Event = None):
+        self.attempts += 1
+        client = self.client or get_client()
+        headers = {}
+        if self.bytes_written and self.validator is None:
+            print(f"[downloads] No ETag or Last-Modified from {self.url}, restarting from 0")
+            self._reset()
+        if self.bytes_written:
+            headers['Range'] = f'bytes={self.bytes_written}-'
+            headers['If-Range'] = self.validator
+
+        with client.stream('GET', self.url, headers=headers, timeout=self._timeout(client)) as response:
+            if response.status_code == 416:
+                # Our offset no longer matches the resource; start again next attempt
+                self._reset()
+                raise IncompleteDownload(f"Range not satisfiable for {self.url}, restarting")
+            response.raise_for_status()
+
+            mode = 'wb'
+            if self.bytes_written and response.status_code == 206:
+                match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+                if not match or int(match.group(1)) != self.bytes_written:
+                    self._reset()
+                    raise IncompleteDownload(f"Unexpected Content-Range from {self.url}, restarting")
+                if match.group(3) != '*':
+                    self.total_bytes = int(match.group(3))
+                print(f"[downloads] Resuming {self.url} at byte {self.bytes_written}")
+                self.resumed_bytes += self.bytes_written
+                mode = 'ab'
+            else:
+                if self.bytes_written:
+                    print(f"[downloads] Server ignored Range or the file changed for {self.url}, restarting from 0")
+                    self._reset()
+                self.validator = _validator(response.headers)
+                length = response.headers.get('Content-Length')
+                self.total_bytes = int(length) if length is not None else None
+
+            self._check_size(self.total_bytes)
+            if self.on_size and self.total_bytes is not None:
+                self.on_size(self.total_bytes)
+
+            # Reads are handed over as they arrive (so cancel and the deadline are checked
+            # even on a trickling connection); the file buffers them into chunk_size writes
+            with open(self.path, mode, buffering=self.chunk_size) as f:
+                for chunk in response.iter_raw():
+                    if cancel is not None and cancel.is_set():
+                        raise DownloadCancelled(f"Download of {self.url} cancelled")
+                    retries.check_deadline(f"download of {self.url}")
+                    self._check_size(self.bytes_written + len(chunk))
+                    f.write(chunk)
+                    self._hasher.update(chunk)
+                    self.bytes_written += len(chunk)
+
+        if self.total_bytes is not None and self.bytes_written != self.total_bytes:
+            raise IncompleteDownload(
+                f"Got {self.bytes_written} of {self.total_bytes} bytes from {self.url}")
+
+    def result(self) -> dict:
+        return {
+            "path": self.path,
+            "size": self.bytes_written,
+            "sha256": self._hasher.hexdigest(),
+            "attempts": self.attempts,
+            "resumed_bytes": self.resumed_bytes,
+        }
+
+
+def copy_file_url(url: str, path: str, max_bytes: int = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    file:// stand-in for Download (local runs and batch tests). Copies and
+    hashes the same way and returns the same result shape.
+    """
+    source = urllib.parse.unquote(urllib.parse.urlparse(url).path)
+    size = os.path.getsize(source)
+    if max_bytes and size > max_bytes:
+        raise DownloadTooLarge(f"{url} is larger than the {max_bytes} byte limit ({size} bytes)")
+    hasher = hashlib.sha256()
+    with open(source, 'rb') as src, open(path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            dst.write(chunk)
+            hasher.update(chunk)
+    return {"path": path, "size": size, "sha256": hasher.hexdigest(), "attempts": 1, "resumed_bytes": 0}
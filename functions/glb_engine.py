@@ -0,0 +1,457 @@
+import json
+import struct
+
+import numpy as np
+
+import stl_writer
+
+###############################################################################
+# In-process GLB -> STL Conversion Engine
+###############################################################################
+# Pure NumPy version of the pipeline in BLENDER_SCRIPT:
+#  - Parses the GLB container (JSON + BIN chunks) and accessors
+#  - Applies node transforms (and the glTF Y-up -> Z-up axis conversion the
+#    Blender importer does) to every mesh instance in the scene
+#  - Concatenates all meshes into one ("join")
+#  - Welds vertices within the remove_doubles threshold
+#  - Writes a binary STL (face normals computed by stl_writer)
+#
+# Anything we can't handle here (Draco, sparse accessors, ...) raises
+# UnsupportedGLBError so the caller can fall back to Blender.
+
+GLB_MAGIC = 0x46546C67  # b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+WELD_THRESHOLD = 0.0001
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+
+TYPE_SIZES = {
+    "SCALAR": 1,
+    "VEC2": 2,
+    "VEC3": 3,
+    "VEC4": 4,
+    "MAT2": 4,
+    "MAT3": 9,
+    "MAT4": 16,
+}
+
+# Primitive modes
+MODE_TRIANGLES = 4
+MODE_TRIANGLE_STRIP = 5
+MODE_TRIANGLE_FAN = 6
+
+# glTF is Y-up, Blender (and the STL we used to produce) is Z-up
+Y_UP_TO_Z_UP = np.array([
+    [1.0, 0.0, 0.0, 0.0],
+    [0.0, 0.0, -1.0, 0.0],
+    [0.0, 1.0, 0.0, 0.0],
+    [0.0, 0.0, 0.0, 1.0],
+])
+
+STL_HEADER = b'Binary STL generated by numpy conversion engine'
+
+# Extensions that change how geometry is stored; everything else
+# (materials, textures, ...) is irrelevant for STL output.
+GEOMETRY_EXTENSIONS = {'KHR_draco_mesh_compression', 'EXT_meshopt_compression'}
+
+
+class UnsupportedGLBError(Exception):
+    """Raised for valid glTF features this engine does not implement."""
+
+
+###############################################################################
+# GLB Container / Accessors
+###############################################################################
+def parse_glb(path: str):
+    """Returns (gltf_json, bin_chunk) for a binary glTF file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < 12:
+        raise ValueError("File too small to be a GLB")
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC:
+        raise ValueError("Not a GLB file (bad magic)")
+    if version != 2:
+        raise UnsupportedGLBError(f"Unsupported GLB version: {version}")
+
+    gltf = None
+    bin_chunk = b''
+    offset = 12
+    end = min(length, len(data))
+    while offset + 8 <= end:
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        offset += 8
+        chunk = data[offset:offset + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(chunk.decode('utf-8'))
+        elif chunk_type == CHUNK_BIN and not bin_chunk:
+            bin_chunk = chunk
+        offset += chunk_length
+
+    if gltf is None:
+        raise ValueError("GLB has no JSON chunk")
+
+    unsupported = GEOMETRY_EXTENSIONS.intersection(gltf.get('extensionsRequired', []))
+    if unsupported:
+        raise UnsupportedGLBError(f"Required extensions not supported: {sorted(unsupported)}")
+
+    return gltf, memoryview(bin_chunk)
+
+
+def read_accessor(gltf, bin_chunk, index: int) -> np.ndarray:
+    """Reads an accessor into an (count, components) array (no copy when tightly packed)."""
+    accessor = gltf['accessors'][index]
+    if 'sparse' in accessor:
+        raise UnsupportedGLBError("Sparse accessors are not supported")
+
+    dtype = np.dtype(COMPONENT_DTYPES[accessor['componentType']]).newbyteorder('<')
+    components = TYPE_SIZES[accessor['type']]
+    count = accessor['count']
+
+    if count == 0 or 'bufferView' not in accessor:
+        return np.zeros((count, components), dtype=dtype)
+
+    view = gltf['bufferViews'][accessor['bufferView']]
+    if view.get('buffer', 0) != 0 or 'uri' in gltf['buffers'][view.get('buffer', 0)]:
+        raise UnsupportedGLBError("External buffers are not supported")
+
+    start = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    element_size = dtype.itemsize * components
+    stride = view.get('byteStride') or element_size
+
+    if stride == element_size:
+        arr = np.frombuffer(bin_chunk, dtype=dtype, count=count * components, offset=start)
+        arr = arr.reshape(count, components)
+    else:
+        # Interleaved attributes: view the raw bytes with the stride, then slice out ours
+        raw = np.frombuffer(bin_chunk, dtype=np.uint8, count=stride * (count - 1) + element_size, offset=start)
+        raw = np.lib.stride_tricks.as_strided(raw, shape=(count, element_size), strides=(stride, 1))
+        arr = np.ascontiguousarray(raw).view(dtype).reshape(count, components)
+
+    if accessor.get('normalized') and dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        arr = np.maximum(arr.astype(np.float32) / info.max, -1.0)
+
+    return arr
+
+
+###############################################################################
+# Scene Graph
+###############################################################################
+def node_matrix(node) -> np.ndarray:
+    """Local 4x4 transform of a node, from 'matrix' or TRS."""
+    if 'matrix' in node:
+        # glTF matrices are column-major
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+
+    t = node.get('translation', [0.0, 0.0, 0.0])
+    x, y, z, w = node.get('rotation', [0.0, 0.0, 0.0, 1.0])
+    s = node.get('scale', [1.0, 1.0, 1.0])
+
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ], dtype=np.float64)
+
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.asarray(s, dtype=np.float64)
+    matrix[:3, 3] = t
+    return matrix
+
+
+def iter_mesh_instances(gltf):
+    """Yields (mesh_index, world_matrix) for every mesh node in the active scene."""
+    nodes = gltf.get('nodes', [])
+    scenes = gltf.get('scenes')
+    if scenes:
+        roots = scenes[gltf.get('scene', 0)].get('nodes', [])
+    else:
+        children = {c for n in nodes for c in n.get('children', [])}
+        roots = [i for i in range(len(nodes)) if i not in children]
+
+    stack = [(root, Y_UP_TO_Z_UP) for root in roots]
+    while stack:
+        index, parent = stack.pop()
+        node = nodes[index]
+        world = parent @ node_matrix(node)
+        if 'mesh' in node:
+            yield node['mesh'], world
+        for child in node.get('children', []):
+            stack.append((child, world))
+
+
+def primitive_triangles(gltf, bin_chunk, primitive, vertex_count: int) -> np.ndarray:
+    """Returns an (n, 3) index array for a primitive, expanding strips and fans."""
+    mode = primitive.get('mode', MODE_TRIANGLES)
+    if mode not in (MODE_TRIANGLES, MODE_TRIANGLE_STRIP, MODE_TRIANGLE_FAN):
+        return np.empty((0, 3), dtype=np.int64)
+
+    if 'indices' in primitive:
+        indices = read_accessor(gltf, bin_chunk, primitive['indices']).reshape(-1).astype(np.int64)
+    else:
+        indices = np.arange(vertex_count, dtype=np.int64)
+
+    if mode == MODE_TRIANGLES:
+        usable = len(indices) - len(indices) % 3
+        return indices[:usable].reshape(-1, 3)
+
+    n = len(indices) - 2
+    if n <= 0:
+        return np.empty((0, 3), dtype=np.int64)
+    i = np.arange(n)
+    if mode == MODE_TRIANGLE_STRIP:
+        # Odd triangles are flipped to keep a consistent winding
+        odd = (i % 2).astype(bool)
+        a = indices[i]
+        b = np.where(odd, indices[i + 2], indices[i + 1])
+        c = np.where(odd, indices[i + 1], indices[i + 2])
+        return np.stack([a, b, c], axis=1)
+    return np.stack([np.full(n, indices[0]), indices[i + 1], indices[i + 2]], axis=1)
+
+
+def load_glb_mesh(path: str):
+    """
+    Loads every mesh instance in the GLB's scene, in world space,
+    joined into a single (vertices, faces) pair.
+    """
+    gltf, bin_chunk = parse_glb(path)
+    meshes = gltf.get('meshes', [])
+
+    all_vertices = []
+    all_faces = []
+    base = 0
+    for mesh_index, world in iter_mesh_instances(gltf):
+        for primitive in meshes[mesh_index].get('primitives', []):
+            unsupported = GEOMETRY_EXTENSIONS.intersection(primitive.get('extensions', {}))
+            if unsupported:
+                raise UnsupportedGLBError(f"Primitive extensions not supported: {sorted(unsupported)}")
+            if 'POSITION' not in primitive.get('attributes', {}):
+                continue
+
+            positions = read_accessor(gltf, bin_chunk, primitive['attributes']['POSITION']).astype(np.float64)
+            faces = primitive_triangles(gltf, bin_chunk, primitive, len(positions))
+            if len(faces) == 0:
+                continue
+            if faces.max() >= len(positions):
+                raise ValueError("Primitive index out of range")
+
+            vertices = positions @ world[:3, :3].T + world[:3, 3]
+            if np.linalg.det(world[:3, :3]) < 0:
+                # Mirrored instance: flip winding so normals still point outwards
+                faces = faces[:, ::-1]
+
+            all_vertices.append(vertices)
+            all_faces.append(faces + base)
+            base += len(vertices)
+
+    if not all_faces:
+        raise ValueError("No mesh objects found in GLB.")
+
+    return np.concatenate(all_vertices), np.concatenate(all_faces)
+
+
+###############################################################################
+# Mesh Preparation
+###############################################################################
+# Vertices handled per block when expanding candidate pairs (bounds their arrays)
+WELD_CHUNK = 65536
+
+# Half of the 26 neighbouring cells: every pair of adjacent cells is visited once
+FORWARD_OFFSETS = [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1) if (x, y, z) > (0, 0, 0)]
+
+# Cell key multipliers: key = x*A + y*B + z*C (wrapping int64). Being linear, the key
+# of a neighbouring cell is the cell's key plus a constant, so lookups of a whole
+# sorted key array for one offset stay (nearly) sorted, which searchsorted is fast at.
+CELL_KEY = np.array([0x2545F4914F6CDD1D, 0x1B873593A4C3E6B1, 0x3C6EF372FE94F82B], dtype=np.int64)
+
+
+def _cell_keys(cells: np.ndarray) -> np.ndarray:
+    """
+    One int64 key per integer cell. Different cells can share a key; that
+    only adds candidates, which the distance check then drops.
+    """
+    with np.errstate(over='ignore'):
+        return cells @ CELL_KEY
+
+
+def _expand(ids: np.ndarray, starts: np.ndarray, counts: np.ndarray):
+    """Repeats each id counts times, next to the run starts[k], starts[k] + 1, ... it is paired with."""
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(ids, counts), np.repeat(starts, counts) + offsets
+
+
+def _close_pairs(vertices: np.ndarray, threshold: float, chunk: int = WELD_CHUNK):
+    """
+    Every unordered pair of vertices at most `threshold` apart. Vertices are
+    hashed to cells of size threshold, so a vertex's close neighbours are in
+    its own cell or one of the 26 around it.
+    """
+    cells = np.floor(vertices / threshold).astype(np.int64)
+    keys = _cell_keys(cells)
+    by_key = np.argsort(keys)
+    sorted_keys = keys[by_key]
+    del keys
+    group_keys, group_start, group_count = np.unique(sorted_keys, return_index=True, return_counts=True)
+    del sorted_keys
+    group_of = np.repeat(np.arange(len(group_keys)), group_count)  # per position in by_key
+    del cells
+
+    # Neighbouring group of every group, per forward offset (-1 where empty)
+    neighbours = []
+    for offset in FORWARD_OFFSETS:
+        with np.errstate(over='ignore'):
+            wanted = group_keys + _cell_keys(np.array([offset]))[0]
+        index = np.minimum(np.searchsorted(group_keys, wanted), len(group_keys) - 1)
+        neighbours.append(np.where(group_keys[index] == wanted, index, -1))
+
+    first, second = [], []
+    threshold_sq = threshold * threshold
+    for begin in range(0, len(vertices), chunk):
+        positions = np.arange(begin, min(begin + chunk, len(vertices)))
+        own = group_of[positions]
+        # Later members of the same group, then every member of each forward neighbour
+        candidates = [_expand(positions, positions + 1, group_start[own] + group_count[own] - positions - 1)]
+        for neighbour in neighbours:
+            other = neighbour[own]
+            counts = np.where(other >= 0, group_count[other], 0)
+            if counts.any():
+                candidates.append(_expand(positions, group_start[other], counts))
+        for i, j in candidates:
+            i, j = by_key[i], by_key[j]
+            delta = vertices[i] - vertices[j]
+            close = (np.einsum('ij,ij->i', delta, delta) <= threshold_sq) & (i != j)
+            first.append(i[close])
+            second.append(j[close])
+
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _exact_duplicates(vertices: np.ndarray):
+    """
+    Groups bit-identical vertices, cheaply: returns each group's first index
+    and every vertex's group. Copies split up by a key collision stay apart
+    here; the distance search merges them anyway.
+    """
+    bits = np.ascontiguousarray(vertices, dtype=np.float64).view(np.int64)
+    order = np.argsort(_cell_keys(bits), kind='stable')
+    ordered = vertices[order]
+    starts = np.r_[True, np.any(ordered[1:] != ordered[:-1], axis=1)]
+    group_of = np.empty(len(vertices), dtype=np.int64)
+    group_of[order] = np.cumsum(starts) - 1
+    return order[starts], group_of
+
+
+def weld_vertices(vertices: np.ndarray, faces: np.ndarray, threshold: float = WELD_THRESHOLD):
+    """
+    Vectorized equivalent of remove_doubles: walking vertices in order of
+    x + y + z (as Blender does), each vertex not already merged absorbs
+    every later unmerged vertex within `threshold` of it. Kept vertices
+    don't move; faces that collapse as a result are dropped.
+    """
+    # Exact copies always weld to the first one: only distinct points need the distance search
+    first_copy, copy_of = _exact_duplicates(vertices)
+    points = vertices[first_copy]
+    count = len(points)
+    first, second = _close_pairs(points, threshold)
+    # Orient every pair as (earlier, later) in walk order; ties go by original index
+    walk = points.sum(axis=1)
+    swap = (walk[first] > walk[second]) | ((walk[first] == walk[second]) & (first_copy[first] > first_copy[second]))
+    first, second = np.where(swap, second, first), np.where(swap, first, second)
+    # Each point's earlier neighbours, earliest first
+    earliest = np.lexsort((first_copy[first], walk[first], second))
+    first, second = first[earliest], second[earliest]
+
+    # Resolve in rounds. A point merges into its earliest neighbour that can still
+    # claim it (kept or undecided; merged ones can't), so it is decided as soon as
+    # that neighbour is: merged into it if kept, kept itself if there is none.
+    UNDECIDED, KEPT, MERGED = 0, 1, 2
+    state = np.zeros(count, dtype=np.int8)
+    target = np.arange(count)
+    while True:
+        claimants = state[first] != MERGED
+        first, second = first[claimants], second[claimants]
+        if not len(first):
+            break
+        # First remaining pair of each point is its earliest claimant
+        heads = np.flatnonzero(np.r_[True, second[1:] != second[:-1]])
+        head_of, head = second[heads], first[heads]
+        decided = state[head] == KEPT
+        target[head_of[decided]] = head[decided]
+        state[head_of[decided]] = MERGED
+        # Undecided points that aren't waiting on a claimant are kept
+        waiting = np.zeros(count, dtype=bool)
+        waiting[head_of[~decided]] = True
+        state[(state == UNDECIDED) & ~waiting] = KEPT
+        live = state[second] == UNDECIDED
+        first, second = first[live], second[live]
+
+    # Surviving points keep their first copy; everything else follows its point's target
+    kept = np.zeros(len(vertices), dtype=bool)
+    kept[first_copy[state != MERGED]] = True
+    target = first_copy[target[copy_of]]
+    new_index = np.cumsum(kept) - 1
+    welded_faces = new_index[target[faces]]
+    degenerate = (
+        (welded_faces[:, 0] == welded_faces[:, 1])
+        | (welded_faces[:, 1] == welded_faces[:, 2])
+        | (welded_faces[:, 0] == welded_faces[:, 2])
+    )
+    return vertices[kept], welded_faces[~degenerate]
+
+
+def orient_outwards(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """
+    Flips the whole mesh if its signed volume is negative (normals pointing in).
+    glTF requires counter-clockwise front faces, so per-face winding is already
+    consistent; this only catches globally inverted meshes.
+    """
+    v0, v1, v2 = vertices[faces[:, 0]], vertices[faces[:, 1]], vertices[faces[:, 2]]
+    signed_volume = np.einsum('ij,ij->', v0, np.cross(v1, v2)) / 6.0
+    if signed_volume < 0:
+        return faces[:, ::-1]
+    return faces
+
+
+###############################################################################
+# Conversion
+###############################################################################
+def convert_glb(glb_path: str, stl_path: str, weld_threshold: float = WELD_THRESHOLD):
+    """
+    Full GLB -> STL conversion. Returns (vertices, faces, stats) so callers
+    can write other formats from the same welded mesh.
+    """
+    vertices, faces = load_glb_mesh(glb_path)
+    source_vertices, source_faces = len(vertices), len(faces)
+
+    vertices, faces = weld_vertices(vertices, faces, weld_threshold)
+    faces = orient_outwards(vertices, faces)
+
+    file_size = stl_writer.write_binary_stl(stl_path, vertices, faces, header=STL_HEADER)
+    if file_size == 0 or len(faces) == 0:
+        raise Exception("STL file is empty.")
+
+    return vertices, faces, {
+        "file_size": file_size,
+        "source_vertices": source_vertices,
+        "source_faces": source_faces,
+        "vertices": len(vertices),
+        "faces": len(faces),
+    }
+
+
+def convert_glb_to_stl(glb_path: str, stl_path: str, weld_threshold: float = WELD_THRESHOLD) -> dict:
+    """
+    Full GLB -> STL conversion. Returns stats about the exported mesh.
+    """
+    return convert_glb(glb_path, stl_path, weld_threshold)[2]
@@ -0,0 +1,261 @@
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import retries
+
+###############################################################################
+# Warm Gradio Client Pool
+###############################################################################
+# Building a gradio Client fetches the Space config and API info, and we
+# then have to start a session. Instead of paying that on every request, we
+# keep a few initialized clients (each with its own session) per instance:
+#  - borrow() hands out a ready client, refilling the pool in the background
+#  - clients idle longer than max_idle are dropped, and ones idle longer than
+#    health_check_after are re-checked before being handed out
+#  - a client whose request raised is discarded and replaced
+# Session readiness is detected by retrying start_session with backoff until
+# it succeeds (or ready_timeout passes) instead of a fixed sleep. A client
+# whose session never became ready is dropped, never handed out.
+#
+# hedged() repeats a slow call on a second, idle client (retries.hedged): the
+# first result wins and the other call is cancelled. Only for calls that
+# don't depend on session state, since the two run in different sessions.
+
+
+class SessionNotReady(ConnectionError):
+    """start_session kept failing for ready_timeout seconds. Worth retrying later."""
+
+
+class CallCancelled(Exception):
+    """A hedged call was cancelled because the other attempt finished first."""
+
+
+class PooledClient:
+    def __init__(self, client, clock):
+        self.client = client
+        self.created = clock()
+        self.last_used = self.created
+        self.uses = 0
+
+
+class GradioClientPool:
+    def __init__(self, factory, start_session=None, health_check=None, size=2, max_idle=600.0,
+                 health_check_after=120.0, ready_timeout=30.0, ready_poll=0.25, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.factory = factory
+        self.start_session = start_session
+        self.health_check = health_check or start_session
+        self.size = size
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.ready_timeout = ready_timeout
+        self.ready_poll = ready_poll
+        self.clock = clock
+        self.sleep = sleep
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []
+        self._creating = 0
+        self._in_use = 0
+        self.counters = {
+            "borrowed": 0,
+            "warm_hits": 0,
+            "cold_creates": 0,
+            "created": 0,
+            "discarded_errors": 0,
+            "discarded_idle": 0,
+            "discarded_unhealthy": 0,
+            "create_failures": 0,
+            "not_ready": 0,
+            "hedges": 0,
+            "hedges_skipped": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _wait_ready(self, client) -> bool:
+        """Starts a session, retrying with backoff until it works or ready_timeout passes."""
+        if self.start_session is None:
+            return True
+        deadline = self.clock() + self.ready_timeout
+        delay = self.ready_poll
+        while True:
+            try:
+                self.start_session(client)
+                return True
+            except Exception as e:
+                if self.clock() + delay > deadline:
+                    print(f"[gradio_pool] Session not ready after {self.ready_timeout}s: {e}")
+                    return False
+                self.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    def _create(self) -> PooledClient:
+        """Builds a client with a ready session; raises SessionNotReady (dropping the client) otherwise."""
+        start = self.clock()
+        client = self.factory()
+        if not self._wait_ready(client):
+            self._count("not_ready")
+            raise SessionNotReady(f"Gradio session not ready after {self.ready_timeout}s")
+        self._count("created")
+        print(f"[gradio_pool] Client created in {self.clock() - start:.2f}s")
+        return PooledClient(client, self.clock)
+
+    def _total(self) -> int:
+        return len(self._idle) + self._creating + self._in_use
+
+    def _fill(self, reserved=False):
+        """Creates clients until idle + being created + borrowed reaches the pool size."""
+        while True:
+            with self._lock:
+                if not reserved:
+                    if self._total() >= self.size:
+                        return
+                    self._creating += 1
+                reserved = False
+            try:
+                entry = self._create()
+            except Exception as e:
+                with self._lock:
+                    self._creating -= 1
+                    # Wake waiters so they can create their own
+                    self._available.notify_all()
+                self._count("create_failures")
+                print(f"[gradio_pool] Background client creation failed: {e}")
+                return
+            with self._lock:
+                self._creating -= 1
+                self._idle.append(entry)
+                self._available.notify_all()
+
+    def prewarm(self):
+        """Fills the pool in a background thread."""
+        with self._lock:
+            if self._total() >= self.size:
+                return
+            # Reserve the slot now so a concurrent acquire() waits for it
+            self._creating += 1
+        threading.Thread(target=self._fill, args=(True,), daemon=True, name='gradio-pool-fill').start()
+
+    def _healthy(self, entry: PooledClient) -> bool:
+        idle_for = self.clock() - entry.last_used
+        if self.max_idle and idle_for > self.max_idle:
+            self._count("discarded_idle")
+            return False
+        if self.health_check and idle_for > self.health_check_after:
+            try:
+                self.health_check(entry.client)
+            except Exception as e:
+                print(f"[gradio_pool] Health check failed, discarding client: {e}")
+                self._count("discarded_unhealthy")
+                return False
+        return True
+
+    def acquire(self) -> PooledClient:
+        entry = None
+        while True:
+            with self._lock:
+                # A client already being created will be ready sooner than a new one
+                deadline = self.clock() + self.ready_timeout
+                while not self._idle and self._creating and self.clock() < deadline:
+                    self._available.wait(timeout=max(deadline - self.clock(), 0))
+                candidate = self._idle.pop() if self._idle else None
+            if candidate is None or self._healthy(candidate):
+                entry = candidate
+                break
+
+        if entry is not None:
+            self._count("warm_hits")
+        else:
+            # Nothing warm yet: build one on the request thread
+            self._count("cold_creates")
+            entry = self._create()
+
+        with self._lock:
+            self._in_use += 1
+        self._count("borrowed")
+        self.prewarm()
+        return entry
+
+    def try_acquire(self):
+        """An idle, healthy client, or None without waiting for (or creating) one."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                candidate = self._idle.pop()
+                self._in_use += 1
+            if self._healthy(candidate):
+                self._count("warm_hits")
+                self._count("borrowed")
+                return candidate
+            with self._lock:
+                self._in_use -= 1
+            self.prewarm()
+
+    def release(self, entry: PooledClient, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+        if broken:
+            self._count("discarded_errors")
+            self.prewarm()
+            return
+        entry.uses += 1
+        entry.last_used = self.clock()
+        with self._lock:
+            # Over size only when a cold create happened while the pool was exhausted
+            if self._total() < self.size:
+                self._idle.append(entry)
+                self._available.notify()
+
+    @contextmanager
+    def borrow(self):
+        """Yields a ready client; discards it if the body raises."""
+        entry = self.acquire()
+        try:
+            yield entry.client
+        except Exception:
+            print(f"[gradio_pool] Discarding client after error:\n{traceback.format_exc()}")
+            self.release(entry, broken=True)
+            raise
+        else:
+            self.release(entry)
+
+    def hedged(self, client, call, hedge_after: float, name: str):
+        """
+        call(client, cancel) on the caller's client and, if that takes longer
+        than hedge_after, on an idle pooled client too. Returns the first
+        result. call() should raise CallCancelled once `cancel` is set; the
+        spare client then goes back to the pool, or is discarded on any other error.
+        """
+        def attempt(index, cancel):
+            if index == 0:
+                return call(client, cancel)
+            entry = self.try_acquire()
+            if entry is None:
+                self._count("hedges_skipped")
+                raise CallCancelled(f"No idle client to hedge {name}")
+            self._count("hedges")
+            try:
+                result = call(entry.client, cancel)
+            except CallCancelled:
+                self.release(entry)
+                raise
+            except Exception:
+                print(f"[gradio_pool] Discarding hedge client after error:\n{traceback.format_exc()}")
+                self.release(entry, broken=True)
+                raise
+            self.release(entry)
+            return result
+
+        return retries.hedged(attempt, hedge_after, name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, size=self.size, idle=len(self._idle),
+                        creating=self._creating, in_use=self._in_use)
@@ -0,0 +1,231 @@
+import copy
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+###############################################################################
+# Asynchronous Job API
+###############################################################################
+# Long-running 3D generations run as jobs: submit() returns a job id right
+# away, a bounded worker pool runs the stages, and every stage result is
+# written to the job store as soon as it's known so clients can poll it or
+# follow it as server-sent events.
+#
+# Job document:
+#   {id, status, version, created, updated, request, stages: {name: {...}},
+#    result, error}, plus started/deadline once running and finished at the end
+# status: queued -> running -> succeeded | failed
+# deadline (epoch seconds) is when job_fn gives up, so clients know how long
+# a running job can take before it fails.
+#
+# update() takes dotted keys ("stages.preprocess") so the same calls work
+# for the in-memory store and Firestore.
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TERMINAL_STATES = (SUCCEEDED, FAILED)
+
+
+class JobNotFound(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def new_job(request: dict) -> dict:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "status": QUEUED,
+        "version": 0,
+        "created": now,
+        "updated": now,
+        "request": request,
+        "stages": {},
+        "result": None,
+        "error": None,
+    }
+
+
+###############################################################################
+# Job Stores
+###############################################################################
+class InMemoryJobStore:
+    """Per-instance store. Jobs expire `ttl` seconds after their last update."""
+
+    def __init__(self, ttl=3600.0):
+        self.ttl = ttl
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self._jobs.items() if job['updated'] < cutoff]:
+            del self._jobs[job_id]
+
+    def create(self, job: dict):
+        with self._changed:
+            self._expire()
+            self._jobs[job['id']] = copy.deepcopy(job)
+            self._changed.notify_all()
+
+    def update(self, job_id: str, fields: dict):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobNotFound(job_id)
+            for key, value in fields.items():
+                target = job
+                parts = key.split('.')
+                for part in parts[:-1]:
+                    if not isinstance(target.get(part), dict):
+                        target[part] = {}
+                    target = target[part]
+                target[parts[-1]] = copy.deepcopy(value)
+            job['version'] += 1
+            job['updated'] = time.time()
+            self._changed.notify_all()
+
+    def get(self, job_id: str) -> dict:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                raise JobNotFound(job_id)
+            return copy.deepcopy(job)
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float) -> dict:
+        """Returns the job once its version differs from `version`, or after timeout."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]['version'] != version,
+                timeout=timeout,
+            )
+        return self.get(job_id)
+
+
+class FirestoreJobStore:
+    """
+    Jobs as documents in a Firestore collection. Honors FIRESTORE_EMULATOR_HOST,
+    so it can run against the local emulator.
+    """
+
+    def __init__(self, collection='process3dJobs', poll_interval=1.0, client=None):
+        self.collection_name = collection
+        self.poll_interval = poll_interval
+        self._client = client
+
+    def _collection(self):
+        if self._client is None:
+            from firebase_admin import firestore
+            self._client = firestore.client()
+        return self._client.collection(self.collection_name)
+
+    def create(self, job: dict):
+        self._collection().document(job['id']).set(job)
+
+    def update(self, job_id: str, fields: dict):
+        from google.cloud import firestore as gcf
+        fields = dict(fields, version=gcf.Increment(1), updated=time.time())
+        self._collection().document(job_id).update(fields)
+
+    def get(self, job_id: str) -> dict:
+        snapshot = self._collection().document(job_id).get()
+        if not snapshot.exists:
+            raise JobNotFound(job_id)
+        return snapshot.to_dict()
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float) -> dict:
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job.get('version') != version or time.time() >= deadline:
+                return job
+            time.sleep(min(self.poll_interval, max(deadline - time.time(), 0)))
+
+
+###############################################################################
+# Runner
+###############################################################################
+class JobRunner:
+    """
+    Runs job functions on a bounded pool. job_fn(job_id, request, progress)
+    returns the result dict; progress(stage, data) records a finished stage.
+    `deadline` is the time budget job_fn enforces, recorded on the job.
+    """
+
+    def __init__(self, store, job_fn, max_workers=2, max_queued=20, deadline=None):
+        self.store = store
+        self.job_fn = job_fn
+        self.max_queued = max_queued
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jobs')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, request: dict) -> dict:
+        with self._lock:
+            if self._pending >= self.max_queued:
+                raise QueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+        job = new_job(request)
+        self.store.create(job)
+        self._executor.submit(self._run, job['id'], request)
+        return job
+
+    def _progress(self, job_id: str, stage: str, data: dict):
+        fields = {f"stages.{stage}": dict(data, finished=time.time())}
+        # Surface URLs at the top level as soon as they exist
+        for key, value in data.items():
+            if key.endswith('_url') or key.endswith('_urls'):
+                fields[f"result.{key}"] = value
+        self.store.update(job_id, fields)
+
+    def _run(self, job_id: str, request: dict):
+        try:
+            started = time.time()
+            fields = {"status": RUNNING, "started": started}
+            if self.deadline is not None:
+                fields["deadline"] = started + self.deadline
+            self.store.update(job_id, fields)
+            result = self.job_fn(job_id, request, lambda stage, data: self._progress(job_id, stage, data))
+            self.store.update(job_id, {"status": SUCCEEDED, "result": result, "finished": time.time()})
+        except Exception as e:
+            print(f"[jobs] Job {job_id} failed: {e}")
+            print(traceback.format_exc())
+            try:
+                self.store.update(job_id, {"status": FAILED, "error": str(e), "finished": time.time()})
+            except Exception:
+                print(f"[jobs] Could not record failure for {job_id}:\n{traceback.format_exc()}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._pending, "max_queued": self.max_queued}
+
+
+###############################################################################
+# Server-sent Events
+###############################################################################
+def job_events(store, job_id: str, heartbeat=15.0, max_duration=530.0):
+    """Yields SSE frames for every job update until it finishes (or max_duration)."""
+    deadline = time.time() + max_duration
+    version = None
+    while time.time() < deadline:
+        job = store.get(job_id) if version is None else store.wait_for_change(job_id, version, heartbeat)
+        if job.get('version') == version:
+            yield ": keep-alive\n\n"
+            continue
+        version = job.get('version')
+        event = 'done' if job['status'] in TERMINAL_STATES else 'progress'
+        yield f"event: {event}\ndata: {json.dumps(job, default=str)}\n\n"
+        if event == 'done':
+            return
@@ -0,0 +1,83 @@
+import os
+import shutil
+
+###############################################################################
+# Local Filesystem Stand-in for the Storage Bucket
+###############################################################################
+# Implements the small subset of google.cloud.storage Bucket/Blob that this
+# codebase uses, backed by a directory. Set LOCAL_STORAGE_DIR to use it instead
+# of Firebase Storage (local runs, benchmarks, emulation).
+
+
+class LocalBlob:
+    def __init__(self, bucket, name: str):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.content_encoding = None
+        self.cache_control = None
+        self.metadata = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.root, self.name)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.exists() else None
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def reload(self):
+        if not self.exists():
+            raise FileNotFoundError(self.name)
+
+    def upload_from_filename(self, filename: str, content_type=None, timeout=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path)
+        self.content_type = content_type or self.content_type
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        self.content_type = content_type or self.content_type
+
+    def download_as_bytes(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def download_to_filename(self, filename: str):
+        shutil.copyfile(self.path, filename)
+
+    def delete(self):
+        os.remove(self.path)
+
+
+class LocalBucket:
+    def __init__(self, root: str, name: str = 'local-bucket'):
+        self.root = root
+        self.name = name
+        os.makedirs(root, exist_ok=True)
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+    def get_blob(self, name: str):
+        """Like Bucket.get_blob: the blob if it exists, else None."""
+        blob = LocalBlob(self, name)
+        return blob if blob.exists() else None
+
+    def list_blobs(self, prefix: str = ''):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                name = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, '/')
+                if name.startswith(prefix):
+                    yield LocalBlob(self, name)
@@ -1,15 +1,40 @@
+import coldstart
 from firebase_functions import https_fn, options
-from firebase_admin import initialize_app, storage
-from gradio_client import Client, handle_file
 import time
 import json
-import requests
-import httpx
 import tempfile
 import os
+import contextlib
 import traceback
-from functools import wraps
-import subprocess
+import uuid
+from functools import partial
+import shlex
+import threading
+import multiprocessing
+import concurrent.futures
+import admission
+import blender_channel
+import blender_pool
+import conversion_cache
+import downloads
+import local_storage
+import pipeline
+import retries
+import gradio_pool
+import jobs
+import singleflight
+import tracing
+
+# Loaded on first use by the entry points that need them (coldstart.py):
+# process_3d never touches the mesh modules, convert_glb_http never Gradio
+gradio_client = coldstart.lazy_import('gradio_client')
+httpx = coldstart.lazy_import('httpx')
+glb_engine = coldstart.lazy_import('glb_engine')
+batch = coldstart.lazy_import('batch')
+decimate = coldstart.lazy_import('decimate')
+mesh_analysis = coldstart.lazy_import('mesh_analysis')
+mesh_formats = coldstart.lazy_import('mesh_formats')
+stl_writer = coldstart.lazy_import('stl_writer')
 
 ###############################################################################
 # Cloud Functions Settings
@@ -18,96 +43,76 @@ import subprocess
 options.set_global_options(
     region="us-central1",
     memory=4096,  # 4 GiB
-    timeout_sec=540  # 9 minutes
+    timeout_sec=540  # 9 minutes (FUNCTION_TIMEOUT)
 )
 
-# Initialize Firebase Admin
-app = initialize_app(options={
-    'storageBucket': 'taiyaki-test1.firebasestorage.app'
-})
+# Firebase Admin is initialized on first use (storage, Firestore jobs), not at import
+FIREBASE_OPTIONS = {'storageBucket': 'taiyaki-test1.firebasestorage.app'}
+
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+def get_firebase_app():
+    global _firebase_app
+    with _firebase_app_lock:
+        if _firebase_app is None:
+            with coldstart.phase('firebase_app'):
+                import firebase_admin
+                _firebase_app = firebase_admin.initialize_app(options=FIREBASE_OPTIONS)
+    return _firebase_app
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+BLENDER_PATH = '/usr/local/blender-3.6.0-linux-x64/blender'
 
 ###############################################################################
 # The "Original" Advanced Blender Script
 ###############################################################################
-# We use __GLB_PATH__ and __STL_PATH__ placeholders that we'll replace at runtime.
-# This script:
+# BLENDER_FUNCTIONS holds the conversion code; BLENDER_SCRIPT runs it once
+# (with __GLB_PATH__ and __STL_PATH__ placeholders that we'll replace at
+# runtime) and BLENDER_WORKER_SCRIPT runs it per job in a pooled worker.
+# The conversion:
 #  - Imports a GLB
 #  - Joins multiple meshes
 #  - Removes doubles, triangulates, recalculates normals
-#  - Validates geometry
-#  - Manually writes the STL in binary format (like your old code)
+#  - Validates geometry (mesh_analysis.py, whole-array numpy checks)
+#  - Writes the STL in binary format via stl_writer.py (__MODULE_DIR__ is
+#    replaced with this directory so Blender's Python can import it)
+#  - Reports each step through blender_channel.progress() (a JSON-lines pipe
+#    to the host when spawned; a no-op in pooled workers)
 
-BLENDER_SCRIPT = r'''
+BLENDER_FUNCTIONS = r'''
 import bpy
 import sys
 import os
-import struct
-import math
-from mathutils import Vector
+
+# Shared, Blender-independent STL writer and mesh checks (functions/)
+sys.path.insert(0, "__MODULE_DIR__")
+import numpy as np
+import stl_writer
+import mesh_analysis
+import blender_channel
 
 def validate_mesh(obj):
-    """Validate mesh data and print warnings."""
+    """Geometry checks via bulk foreach_get reads + mesh_analysis.py. Returns warning strings."""
     mesh = obj.data
-    issues = []
-    
-    # Check for zero-area faces
-    for face in mesh.polygons:
-        if face.area < 1e-7:  # threshold for near-zero area
-            issues.append("Warning: Face {} has near-zero area".format(face.index))
-    
-    # Check for non-manifold edges
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.select_all(action='DESELECT')
-    bpy.ops.mesh.select_non_manifold()
-    bpy.ops.object.mode_set(mode='OBJECT')
-    
-    non_manifold_verts = [v for v in mesh.vertices if v.select]
-    if non_manifold_verts:
-        issues.append("Warning: Found {} non-manifold vertices".format(len(non_manifold_verts)))
-    
-    return issues
+    mesh.calc_loop_triangles()
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get('vertices', tris)
+
+    report = mesh_analysis.analyze_mesh(co.reshape(-1, 3), tris.reshape(-1, 3))
+    print(f"Mesh analysis: watertight={report['watertight']}, components={report.get('components')}, "
+          f"volume={report.get('volume')} in {report['analysis_time']:.2f}s")
+    blender_channel.progress('validate', analysis=report)
+    return ["Warning: {}".format(issue) for issue in report['issues']]
 
 def write_stl(filepath, ob):
-    """Write STL data for the given object in binary format."""
-    mesh = ob.data
-    face_count = len(mesh.polygons)
-    print(f"Writing {face_count} faces to STL file at {filepath}")
-    
-    matrix = ob.matrix_world
-    
-    with open(filepath, 'wb') as fp:
-        # 80-byte header
-        header = b'Binary STL generated by Blender advanced script'
-        header = header + (80 - len(header)) * b'\0'
-        fp.write(header)
-        
-        # Number of faces (unsigned int)
-        fp.write(struct.pack('<I', face_count))
-        
-        vertex_count = 0
-        
-        for face in mesh.polygons:
-            # Transform normal to world space
-            normal = matrix.to_3x3() @ face.normal
-            normal.normalize()
-            if math.isnan(normal.x) or math.isnan(normal.y) or math.isnan(normal.z):
-                normal = Vector((0, 0, 1))
-            
-            # Write normal
-            fp.write(struct.pack('<3f', float(normal.x), float(normal.y), float(normal.z)))
-            
-            # Write vertices
-            for vert_idx in face.vertices:
-                vert = matrix @ mesh.vertices[vert_idx].co
-                fp.write(struct.pack('<3f', float(vert.x), float(vert.y), float(vert.z)))
-                vertex_count += 1
-            
-            # Attribute byte count
-            fp.write(struct.pack('<H', 0))
-    
-    file_size = os.path.getsize(filepath)
-    print(f"STL Export Stats:\n - File size: {file_size} bytes\n - Face count: {face_count}\n - Vertex count: {vertex_count}")
-    return file_size
+    """Write STL data for the given object in binary format (vectorized, chunked)."""
+    print(f"Writing {len(ob.data.polygons)} faces to STL file at {filepath}")
+    stats = stl_writer.write_blender_object(filepath, ob)
+    print(f"STL Export Stats:\n - File size: {stats['file_size']} bytes\n - Face count: {stats['face_count']}\n - Vertex count: {stats['vertex_count']}")
+    return stats['file_size']
 
 def prepare_mesh(obj):
     """Prepare mesh for export (remove doubles, triangulate, recalc normals)."""
@@ -119,14 +124,8 @@ def prepare_mesh(obj):
     bpy.ops.mesh.normals_make_consistent(inside=False)
     bpy.ops.object.mode_set(mode='OBJECT')
 
-def advanced_convert_glb_to_stl():
-    """
-    This function references __GLB_PATH__ and __STL_PATH__,
-    which we'll replace at runtime in Python.
-    """
-    input_path = "__GLB_PATH__"
-    output_path = "__STL_PATH__"
-    
+def advanced_convert_glb_to_stl(input_path, output_path):
+    """Import, join, prepare, validate and export one GLB. Returns the STL size."""
     print(f"\nConverting {input_path} to {output_path} with advanced script.")
     
     # Clear default
@@ -138,6 +137,7 @@ def advanced_convert_glb_to_stl():
     result = bpy.ops.import_scene.gltf(filepath=input_path)
     if result != {'FINISHED'}:
         raise Exception(f"GLB import failed with result: {result}")
+    blender_channel.progress('import', objects=len(bpy.context.scene.objects))
     
     # Debug: print imported objects
     print("\nScene objects after import:")
@@ -165,9 +165,12 @@ def advanced_convert_glb_to_stl():
         raise Exception("No active mesh object after joining or not a MESH type.")
     
     print(f"Active mesh: {mesh_obj.name} - {len(mesh_obj.data.vertices)} verts, {len(mesh_obj.data.polygons)} faces.")
+    blender_channel.progress('join', meshes=len(mesh_objects), vertices=len(mesh_obj.data.vertices),
+                             faces=len(mesh_obj.data.polygons))
     
     # Prepare geometry
     prepare_mesh(mesh_obj)
+    blender_channel.progress('prepare', faces=len(mesh_obj.data.polygons))
     
     # Validate
     issues = validate_mesh(mesh_obj)
@@ -181,62 +184,168 @@ def advanced_convert_glb_to_stl():
     file_size = write_stl(output_path, mesh_obj)
     if file_size == 0:
         raise Exception("STL file is empty.")
+    blender_channel.progress('export', file_size=file_size)
     print("Advanced conversion completed successfully!")
+    return file_size
+'''
+
+# One-shot script: __GLB_PATH__ and __STL_PATH__ are replaced at runtime.
+BLENDER_SCRIPT = BLENDER_FUNCTIONS + r'''
+# Actually run the function; the result (or error) goes back over the channel
+blender_channel.run_main(lambda: {"file_size": advanced_convert_glb_to_stl("__GLB_PATH__", "__STL_PATH__")})
+'''
+
+# Long-lived worker script for blender_pool.py: reads jobs from stdin and
+# resets to an empty scene before each one.
+BLENDER_WORKER_SCRIPT = BLENDER_FUNCTIONS + r'''
+import blender_pool
+
+def reset_scene():
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+
+def handle_job(input_path, output_path, options):
+    return {"file_size": advanced_convert_glb_to_stl(input_path, output_path)}
 
-# Actually run the function
-advanced_convert_glb_to_stl()
+blender_pool.serve_jobs(handle_job, reset=reset_scene)
 '''
 
 ###############################################################################
-# Exponential Retry Decorator
+# Deadlines and Retry Policies
 ###############################################################################
-def retry_operation(max_retries=3, initial_delay=5):
-    def decorator(operation):
-        @wraps(operation)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            delay = initial_delay
-            for attempt in range(max_retries):
-                try:
-                    print(f"Attempt {attempt + 1} of {max_retries} for {operation.__name__}")
-                    return operation(*args, **kwargs)
-                except (httpx.ReadTimeout, httpx.ConnectTimeout) as e:
-                    last_exception = e
-                    print(f"Timeout on attempt {attempt + 1}: {str(e)}")
-                    print(f"Error traceback: {traceback.format_exc()}")
-                except Exception as e:
-                    last_exception = e
-                    print(f"Error on attempt {attempt + 1}: {str(e)}")
-                    print(f"Error traceback: {traceback.format_exc()}")
-                
-                if attempt < max_retries - 1:
-                    sleep_time = delay * (2 ** attempt)
-                    print(f"Waiting {sleep_time} seconds before retry...")
-                    time.sleep(sleep_time)
-            print(f"All {max_retries} attempts failed for {operation.__name__}")
-            raise last_exception
-        return wrapper
-    return decorator
+# Every request runs under a deadline a little inside the function timeout
+# (retries.py). Retries use jittered backoff and stop when the deadline
+# wouldn't leave time for another attempt; errors that can't succeed on a
+# retry (4xx, oversized downloads, admission rejections) fail immediately.
+FUNCTION_TIMEOUT = 540
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', FUNCTION_TIMEOUT - 15))
+JOB_DEADLINE = float(os.environ.get('JOB_DEADLINE', 900))
+
+DOWNLOAD_RETRY = retries.RetryPolicy(
+    'download', max_attempts=int(os.environ.get('DOWNLOAD_MAX_ATTEMPTS', 3)), base_delay=1.0, max_delay=10.0,
+    giveup=(downloads.DownloadTooLarge, admission.AdmissionRejected),
+)
+# A Gradio stage can take minutes; retrying one only makes sense for transport errors
+GRADIO_RETRY = retries.RetryPolicy(
+    'gradio', max_attempts=int(os.environ.get('GRADIO_MAX_ATTEMPTS', 2)), base_delay=2.0, max_delay=10.0,
+    min_attempt_seconds=30.0,
+)
+UPLOAD_RETRY = retries.RetryPolicy(
+    'upload', max_attempts=int(os.environ.get('UPLOAD_MAX_ATTEMPTS', 3)), base_delay=0.5, max_delay=8.0,
+)
 
 ###############################################################################
 # Download Helper
 ###############################################################################
-@retry_operation(max_retries=3, initial_delay=5)
-def download_image(url: str, temp_path: str) -> None:
-    with httpx.Client(timeout=httpx.Timeout(connect=30.0, read=180.0, write=60.0, pool=60.0)) as client:
-        response = client.get(url)
-        response.raise_for_status()
-        with open(temp_path, 'wb') as f:
-            f.write(response.content)
+# Streams to disk through a pooled client, hashing as it goes; retries resume
+# with a Range request from where the previous attempt stopped (downloads.py).
+DOWNLOAD_MAX_BYTES = int(os.environ.get('DOWNLOAD_MAX_MB', 512)) * 1024 * 1024
+# file:// URLs read from this instance's disk, so they're for local runs only
+ALLOW_FILE_URLS = os.environ.get('ALLOW_FILE_URLS', '0') == '1'
+# Hedging: when an attempt is slower than the DOWNLOAD_HEDGE_QUANTILE of recent
+# downloads, a second one starts on its own file and the first to finish wins.
+DOWNLOAD_HEDGE = os.environ.get('DOWNLOAD_HEDGE', '0') == '1'
+_download_latency = retries.LatencyTracker(
+    quantile=float(os.environ.get('DOWNLOAD_HEDGE_QUANTILE', 0.95)),
+    default=float(os.environ.get('DOWNLOAD_HEDGE_AFTER', 10)),
+)
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+@retries.retry(DOWNLOAD_RETRY)
+def _download_attempt(download, hedge=None):
+    """One attempt; with `hedge` (a second Download) it may race both. Returns the winner."""
+    if hedge is None:
+        download.attempt()
+        return download
+
+    def attempt(index, cancel):
+        candidate = (download, hedge)[index]
+        candidate.attempt(cancel=cancel)
+        return candidate
+
+    # The loser stops at its next chunk and its partial file is removed then
+    return retries.hedged(attempt, _download_latency.threshold(), 'download',
+                          on_loser=lambda index: _remove_file((download, hedge)[index].path))
+
+def download_image(url: str, temp_path: str, max_bytes: int = DOWNLOAD_MAX_BYTES) -> dict:
+    """Downloads url to temp_path. Returns {path, size, sha256, attempts, resumed_bytes}."""
+    if url.startswith('file://'):
+        if not ALLOW_FILE_URLS:
+            raise ValueError("file:// URLs are disabled (set ALLOW_FILE_URLS=1 for local runs)")
+        with tracing.span('download') as span:
+            result = downloads.copy_file_url(url, temp_path, max_bytes=max_bytes)
+            span.set(bytes=result['size'], attempts=1, resumed_bytes=0)
+        admission.note_input_size(result['size'])
+        return result
+
+    # The request's memory reservation is re-sized from Content-Length before the body arrives
+    download = downloads.Download(url, temp_path, max_bytes=max_bytes, on_size=admission.note_input_size)
+    hedge = None
+    if DOWNLOAD_HEDGE:
+        download.path = temp_path + '.a'
+        hedge = downloads.Download(url, temp_path + '.b', max_bytes=max_bytes, on_size=admission.note_input_size)
+    start = time.monotonic()
+    try:
+        with tracing.span('download') as span:
+            winner = _download_attempt(download, hedge)
+            if winner.path != temp_path:
+                os.replace(winner.path, temp_path)
+                winner.path = temp_path
+            result = winner.result()
+            if hedge is not None:
+                result['attempts'] = download.attempts + hedge.attempts
+            span.set(bytes=result['size'], attempts=result['attempts'], resumed_bytes=result['resumed_bytes'])
+    finally:
+        if hedge is not None:
+            _remove_file(temp_path + '.a')
+            _remove_file(temp_path + '.b')
+    _download_latency.observe(time.monotonic() - start)
+    admission.note_input_size(result['size'])
+    print(f"[download_image] {url} -> {result['size']} bytes in {result['attempts']} attempt(s), "
+          f"{result['resumed_bytes']} bytes resumed")
+    return result
 
 ###############################################################################
 # Upload to Firebase
 ###############################################################################
-def upload_to_firebase(local_path, destination_path):
+# LOCAL_STORAGE_DIR swaps Firebase Storage for a directory-backed stand-in
+LOCAL_STORAGE_DIR = os.environ.get('LOCAL_STORAGE_DIR')
+_local_bucket = None
+_bucket = None
+_bucket_lock = threading.Lock()
+
+def get_bucket():
+    global _local_bucket, _bucket
+    if LOCAL_STORAGE_DIR:
+        if _local_bucket is None:
+            _local_bucket = local_storage.LocalBucket(LOCAL_STORAGE_DIR)
+        return _local_bucket
+    with _bucket_lock:
+        if _bucket is None:
+            with coldstart.phase('storage_bucket'):
+                get_firebase_app()
+                from firebase_admin import storage
+                _bucket = storage.bucket()
+    return _bucket
+
+@retries.retry(UPLOAD_RETRY)
+def _upload_blob(blob, local_path, content_type):
+    # Storage's own default is 60s per request; never past the request deadline
+    blob.upload_from_filename(local_path, content_type=content_type, timeout=retries.timeout(60))
+
+def upload_to_firebase(local_path, destination_path, content_type=None, content_encoding=None):
     try:
-        bucket = storage.bucket()
-        blob = bucket.blob(destination_path)
-        blob.upload_from_filename(local_path)
+        with tracing.span('upload', bytes=os.path.getsize(local_path)):
+            bucket = get_bucket()
+            blob = bucket.blob(destination_path)
+            if content_encoding:
+                # e.g. gzip: storage serves it decompressed to clients that don't accept gzip
+                blob.content_encoding = content_encoding
+            _upload_blob(blob, local_path, content_type)
         public_url = f"https://storage.googleapis.com/{bucket.name}/{destination_path}"
         return public_url
     except Exception as e:
@@ -244,66 +353,607 @@ def upload_to_firebase(local_path, destination_path):
         print(f"Error traceback: {traceback.format_exc()}")
         raise
 
+###############################################################################
+# Memory Admission Control
+###############################################################################
+# Requests reserve their estimated memory footprint (admission.py) before
+# downloading/converting/generating: scratch files in /tmp count against the
+# same 4 GiB as the process. Over budget -> queue up to ADMISSION_MAX_WAIT
+# seconds, then 429 with Retry-After.
+ADMISSION_ENABLED = os.environ.get('ADMISSION_CONTROL', '1') == '1'
+ADMISSION_MAX_WAIT = float(os.environ.get('ADMISSION_MAX_WAIT', 10))
+
+_admission = admission.MemoryAdmission(
+    # Leave room for the interpreter and imports; warm Blender pool workers
+    # (up to BLENDER_WORKER_MAX_RSS_MB each) are taken off while they live
+    capacity_bytes=int(os.environ.get('ADMISSION_MEMORY_MB', 3072)) * admission.MB,
+    max_wait=ADMISSION_MAX_WAIT,
+    external_usage=lambda: _blender_pool.rss_bytes() if _blender_pool is not None else 0,
+)
+
+def admit(stage: str, max_wait=admission.DEFAULT_WAIT):
+    """Context manager holding a memory reservation for `stage` (no-op when disabled)."""
+    if not ADMISSION_ENABLED:
+        return contextlib.nullcontext()
+    return _admission.reserve(stage, max_wait=max_wait)
+
+def admission_rejected_response(error, headers: dict):
+    print(f"[admission] Rejected: {error} (retry after {error.retry_after}s)")
+    tracing.count('admission_rejected_total')
+    return https_fn.Response(json.dumps({
+        "error": str(error),
+        "retryAfter": error.retry_after,
+        "admission": _admission.stats(),
+    }), headers=dict(headers, **{"Retry-After": str(error.retry_after)}), status=429)
+
 ###############################################################################
 # The "advanced" Blender call using .replace() approach
 ###############################################################################
-def convert_glb_to_stl_advanced(glb_path: str, stl_path: str):
+# Spawned conversions report progress over a pipe (blender_channel.py); one
+# that reports nothing new for BLENDER_STALL_TIMEOUT seconds is killed.
+# BLENDER_SCRIPT_COMMAND lets a stand-in script take Blender's place: it is
+# run with the GLB and STL paths appended and speaks the same channel.
+BLENDER_STALL_TIMEOUT = float(os.environ.get('BLENDER_STALL_TIMEOUT', 120))
+BLENDER_SPAWN_TIMEOUT = float(os.environ.get('BLENDER_JOB_TIMEOUT', 300))
+
+def blender_progress(tag: str, on_progress=None):
+    """Progress callback for Blender runs: logs and records each step, then calls on_progress(stage, data)."""
+    def report(stage, data, seconds):
+        summary = {k: v for k, v in data.items() if not isinstance(v, dict)}
+        print(f"[{tag}] {stage} done in {seconds:.2f}s {summary}")
+        tracing.record(f'blender_{stage}', seconds, **summary)
+        if on_progress is not None:
+            on_progress(stage, data)
+    return report
+
+@tracing.traced('blender_spawn')
+def convert_glb_to_stl_advanced(glb_path: str, stl_path: str, on_progress=None):
     """
     Runs Blender in headless mode, using the advanced script with
     mesh joining, removing doubles, triangulation, validations, etc.
     
     We do .replace("__GLB_PATH__", glb_path) and .replace("__STL_PATH__", stl_path)
     so we don't conflict with curly braces in the code above.
+
+    on_progress(stage, data) is called as Blender finishes each step.
     """
     print("\n[convert_glb_to_stl_advanced] Starting advanced conversion.")
-    print("Current working directory:", os.getcwd())
-    print("Directory contents:", os.listdir())
-    print("PATH environment:", os.environ.get('PATH'))
-    
-    blender_path = '/usr/local/blender-3.6.0-linux-x64/blender'
-    print(f"Using Blender at: {blender_path}")
 
-    # Make a copy of the script, replacing placeholders
-    script_for_blender = BLENDER_SCRIPT \
-        .replace("__GLB_PATH__", glb_path) \
-        .replace("__STL_PATH__", stl_path)
+    command = os.environ.get('BLENDER_SCRIPT_COMMAND')
+    if command:
+        command = shlex.split(command) + [glb_path, stl_path]
+    else:
+        print(f"Using Blender at: {BLENDER_PATH}")
+        # Make a copy of the script, replacing placeholders
+        script_for_blender = BLENDER_SCRIPT \
+            .replace("__MODULE_DIR__", MODULE_DIR) \
+            .replace("__GLB_PATH__", glb_path) \
+            .replace("__STL_PATH__", stl_path)
+        command = [BLENDER_PATH, '--background', '--python-expr', script_for_blender]
 
     try:
-        process = subprocess.run(
-            [
-                blender_path,
-                '--background',
-                '--python-expr',
-                script_for_blender
-            ],
-            capture_output=True,
-            text=True
-        )
-        print("Blender stdout:", process.stdout)
-        print("Blender stderr:", process.stderr)
-
-        if process.returncode != 0:
-            raise Exception(f"Blender advanced script failed:\n{process.stderr}")
-        
-        if not os.path.exists(stl_path):
-            raise Exception("STL file was not created.")
-        
-        file_size = os.path.getsize(stl_path)
-        if file_size == 0:
-            raise Exception("STL file is empty after advanced conversion.")
+        run = blender_channel.run_script(command, on_progress=blender_progress('convert_glb_to_stl_advanced',
+                                                                              on_progress),
+                                         stall_timeout=BLENDER_STALL_TIMEOUT,
+                                         timeout=retries.timeout(BLENDER_SPAWN_TIMEOUT))
+    except blender_channel.ScriptError as e:
+        if isinstance(e, blender_channel.ScriptStalled):
+            tracing.count('blender_stalls_total', stage=e.stage)
+        print(f"Error during advanced Blender conversion: {e}")
+        print(f"Blender output (last lines):\n{e.log_tail}")
+        if e.worker_traceback:
+            print(f"Blender traceback:\n{e.worker_traceback}")
+        raise Exception(f"Blender advanced script failed: {e}")
 
-        print(f"[convert_glb_to_stl_advanced] Conversion success, STL size: {file_size} bytes")
-        return file_size
-    
-    except Exception as e:
-        print("Error during advanced Blender conversion:", e)
+    if not os.path.exists(stl_path):
+        raise Exception("STL file was not created.")
+    file_size = os.path.getsize(stl_path)
+    if file_size == 0:
+        raise Exception("STL file is empty after advanced conversion.")
+
+    print(f"[convert_glb_to_stl_advanced] Conversion success, STL size: {file_size} bytes in {run['seconds']}s "
+          f"({run['log_lines']} log lines, {run['dropped_log_lines']} not kept)")
+    return file_size
+
+###############################################################################
+# Pooled Blender Conversion
+###############################################################################
+# 'pool'  -> warm Blender workers (blender_pool.py), started once per container
+# 'spawn' -> one Blender process per conversion (convert_glb_to_stl_advanced)
+BLENDER_MODE = os.environ.get('BLENDER_MODE', 'pool')
+
+_blender_pool = None
+_blender_pool_lock = threading.Lock()
+
+def get_blender_pool():
+    """Creates the per-container worker pool on first use."""
+    global _blender_pool
+    with _blender_pool_lock:
+        if _blender_pool is None:
+            # BLENDER_WORKER_COMMAND lets a stand-in worker speak the protocol instead of Blender
+            command = os.environ.get('BLENDER_WORKER_COMMAND')
+            if command:
+                command = shlex.split(command)
+            else:
+                worker_script = BLENDER_WORKER_SCRIPT.replace("__MODULE_DIR__", MODULE_DIR)
+                command = [BLENDER_PATH, '--background', '--python-expr', worker_script]
+
+            _blender_pool = blender_pool.BlenderWorkerPool(
+                command,
+                size=int(os.environ.get('BLENDER_POOL_SIZE', 1)),
+                job_timeout=float(os.environ.get('BLENDER_JOB_TIMEOUT', 300)),
+                max_jobs_per_worker=int(os.environ.get('BLENDER_WORKER_MAX_JOBS', 25)),
+                max_rss_mb=int(os.environ.get('BLENDER_WORKER_MAX_RSS_MB', 2048)),
+                startup_timeout=float(os.environ.get('BLENDER_WORKER_STARTUP_TIMEOUT', 120)),
+                crash_retries=int(os.environ.get('BLENDER_WORKER_CRASH_RETRIES', 1)),
+                stall_timeout=BLENDER_STALL_TIMEOUT,
+            )
+    return _blender_pool
+
+@tracing.traced('blender_pool')
+def convert_glb_to_stl_pooled(glb_path: str, stl_path: str, on_progress=None):
+    """Same conversion as convert_glb_to_stl_advanced, on a warm pooled worker."""
+    print("\n[convert_glb_to_stl_pooled] Submitting job to Blender worker pool.")
+    pool = get_blender_pool()
+    try:
+        # Waiting for a worker and the job itself both end at the request deadline
+        result = pool.run(glb_path, stl_path, timeout=retries.timeout(pool.job_timeout),
+                          on_progress=blender_progress('convert_glb_to_stl_pooled', on_progress))
+    except blender_pool.WorkerError as e:
+        if isinstance(e, blender_pool.WorkerStalled):
+            tracing.count('blender_stalls_total', stage=e.stage)
+        print(f"Error during pooled Blender conversion: {e}")
+        print(f"Blender output (last lines):\n{e.log_tail}")
+        if isinstance(e, blender_pool.JobFailed):
+            print(f"Blender worker traceback:\n{e.worker_traceback}")
+            raise Exception(f"Blender advanced script failed: {e}")
+        raise
+
+    if not os.path.exists(stl_path):
+        raise Exception("STL file was not created.")
+    file_size = os.path.getsize(stl_path)
+    if file_size == 0:
+        raise Exception("STL file is empty after advanced conversion.")
+
+    print(f"[convert_glb_to_stl_pooled] Conversion success, STL size: {file_size} bytes, "
+          f"worker result: {result}, pool: {pool.stats()}")
+    return file_size
+
+###############################################################################
+# Conversion Engine Selection
+###############################################################################
+# 'numpy'   -> in-process engine (glb_engine.py), falls back to Blender if the
+#              GLB uses something it doesn't support or the conversion fails
+# 'blender' -> always use the advanced Blender script (pooled or spawned, see BLENDER_MODE)
+CONVERSION_ENGINE = os.environ.get('CONVERSION_ENGINE', 'numpy')
+
+def convert_glb_to_stl(glb_path: str, stl_path: str):
+    """
+    Converts with the configured engine. Returns (file_size, engine_used, mesh)
+    where mesh is the welded (vertices, faces) from the numpy engine, or None
+    when Blender did the conversion.
+    """
+    with tracing.span('convert', input_bytes=os.path.getsize(glb_path)) as span:
+        if CONVERSION_ENGINE == 'numpy':
+            try:
+                with tracing.span('numpy_engine'):
+                    vertices, faces, stats = glb_engine.convert_glb(glb_path, stl_path)
+                print(f"[convert_glb_to_stl] numpy engine: {stats}")
+                span.set(engine='numpy', bytes=stats['file_size'], faces=stats['faces'])
+                return stats['file_size'], 'numpy', (vertices, faces)
+            except Exception as e:
+                print(f"[convert_glb_to_stl] numpy engine failed ({e}), falling back to Blender")
+                print(f"Error traceback: {traceback.format_exc()}")
+                tracing.count('engine_fallbacks_total', engine='numpy')
+
+        file_size = convert_with_blender(glb_path, stl_path)
+        span.set(engine='blender', bytes=file_size)
+        return file_size, 'blender', None
+
+def convert_with_blender(glb_path: str, stl_path: str):
+    if BLENDER_MODE == 'pool':
+        return convert_glb_to_stl_pooled(glb_path, stl_path)
+    return convert_glb_to_stl_advanced(glb_path, stl_path)
+
+def converted_mesh(stl_path: str, mesh=None):
+    """The welded mesh for further outputs: the engine's arrays, or re-read from the STL."""
+    if mesh is not None:
+        return mesh
+    with tracing.span('mesh_load'):
+        return glb_engine.weld_vertices(*stl_writer.read_binary_stl(stl_path))
+
+###############################################################################
+# Mesh Analysis
+###############################################################################
+# Watertightness, manifold edges, shells, volume, area and bounding box of
+# the converted (welded) mesh, returned as "analysis" (mesh_analysis.py).
+MESH_ANALYSIS = os.environ.get('MESH_ANALYSIS', '1') == '1'
+
+def analyze_converted_mesh(mesh) -> dict:
+    vertices, faces = mesh
+    with tracing.span('mesh_analysis', faces=len(faces)) as span:
+        report = mesh_analysis.analyze_mesh(vertices, faces)
+        span.set(watertight=report['watertight'])
+    print(f"[analyze_converted_mesh] watertight={report['watertight']}, printable={report['printable']}, "
+          f"issues={report['issues']}")
+    return report
+
+###############################################################################
+# Conversion Cache
+###############################################################################
+# Bump when the conversion output changes so old cache entries stop matching
+CONVERSION_PIPELINE_VERSION = 2
+CONVERSION_CACHE_ENABLED = os.environ.get('CONVERSION_CACHE', '1') == '1'
+
+_conversion_cache = conversion_cache.ConversionCache(
+    get_bucket,
+    local=conversion_cache.LocalLRUCache(max_entries=int(os.environ.get('CONVERSION_CACHE_LOCAL_ENTRIES', 1024))),
+)
+
+def conversion_options(formats=('stl',), lods=()):
+    """Everything besides the GLB bytes that affects the converted file(s)."""
+    return {
+        "pipeline_version": CONVERSION_PIPELINE_VERSION,
+        "weld_threshold": glb_engine.WELD_THRESHOLD,
+        "triangulation": "beauty",
+        "formats": list(formats),
+        "lods": list(lods),
+    }
+
+def output_blob_base(design_id: str, cache_key: str = None) -> str:
+    """Blob path stem for a conversion's outputs; content-addressed when the result is cached."""
+    if cache_key:
+        return conversion_cache.content_blob_base(cache_key)
+    return f"conversions/{design_id}/{design_id}"
+
+###############################################################################
+# Output Formats
+###############################################################################
+# Requested formats (mesh_formats.py) are written one after another from the
+# same mesh arrays; each upload runs in the background while the next format
+# is being written. Blobs go to {blob_base}{suffix} (output_blob_base()).
+def output_entry(name: str, blob_base: str, path: str, file_size: int, write_time: float, stl_size: int) -> dict:
+    """Describes one written format; upload_output() adds its url."""
+    spec = mesh_formats.FORMATS[name]
+    face_count = (stl_size - 84) // 50
+    return {
+        "blob_path": f"{blob_base}{spec['suffix']}",
+        "local_path": path,
+        "file_size": file_size,
+        "write_time": round(write_time, 4),
+        "bytes_per_triangle": round(file_size / max(face_count, 1), 2),
+        "size_vs_stl": round(file_size / stl_size, 4),
+        "content_encoding": spec['content_encoding'],
+    }
+
+def upload_output(name: str, output: dict):
+    spec = mesh_formats.FORMATS[name]
+    start = time.perf_counter()
+    url = upload_to_firebase(output['local_path'], output['blob_path'], content_type=spec['content_type'],
+                             content_encoding=spec['content_encoding'])
+    output.update(url=url, upload_time=round(time.perf_counter() - start, 4))
+
+def export_formats(mesh, stl_path: str, design_id: str, formats: list, temp_dir: str, blob_base: str) -> dict:
+    """
+    Writes and uploads each format. mesh may be None if only 'stl' is asked for.
+    Returns {format: {url, blob_path, local_path, file_size, write/upload times, size ratios}}.
+    """
+    stl_size = os.path.getsize(stl_path)
+    stages = pipeline.StagePipeline(pipeline.shared_executor('uploads', UPLOAD_WORKERS))
+    outputs = {}
+
+    try:
+        for name in formats:
+            spec = mesh_formats.FORMATS[name]
+            start = time.perf_counter()
+            if name == 'stl':
+                # Already written by the conversion
+                path, file_size = stl_path, stl_size
+            else:
+                path = os.path.join(temp_dir, f"{design_id}{spec['suffix']}")
+                with tracing.span(f'write_{name}') as span:
+                    file_size = spec['writer'](path, *mesh)
+                    span.set(bytes=file_size)
+            outputs[name] = output_entry(name, blob_base, path, file_size, time.perf_counter() - start, stl_size)
+            stages.submit(f'upload_{name}', upload_output, name, outputs[name])
+        stages.gather()
+    finally:
+        stages.wait_all()
+    return outputs
+
+###############################################################################
+# Level-of-detail Outputs
+###############################################################################
+# Optional simplified copies of the STL (decimate.py), uploaded next to it as
+# {blob_base}_lod{n}.stl. They're built from the
+# full-resolution welded mesh, whichever engine produced it.
+def parse_lods(value) -> list:
+    """Request 'lods' -> list of decimate() kwargs. Raises ValueError on bad input."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    if len(value) > decimate.MAX_LOD_LEVELS:
+        raise ValueError(f"At most {decimate.MAX_LOD_LEVELS} LODs per request")
+    return [decimate.parse_lod_spec(spec) for spec in value]
+
+def build_lods(mesh, design_id: str, lod_specs: list, temp_dir: str, blob_base: str) -> list:
+    """Decimates the converted mesh per spec and uploads each level. Returns per-level stats."""
+    vertices, faces = mesh
+
+    lods = []
+    for level, spec in enumerate(lod_specs):
+        with tracing.span('decimate', level=level, input_faces=len(faces)) as span:
+            lod_vertices, lod_faces, stats = decimate.decimate(vertices, faces, **spec)
+            span.set(faces=stats['faces'])
+        lod_path = os.path.join(temp_dir, f"{design_id}_lod{level}.stl")
+        file_size = stl_writer.write_binary_stl(lod_path, lod_vertices, lod_faces, header=glb_engine.STL_HEADER)
+        blob_path = f"{blob_base}_lod{level}.stl"
+        url = upload_to_firebase(lod_path, blob_path)
+        print(f"[build_lods] LOD {level}: {stats['input_faces']} -> {stats['faces']} faces "
+              f"in {stats['decimation_time']:.2f}s, relative error {stats['relative_error']:.2e}")
+        lods.append(dict(stats, level=level, url=url, blob_path=blob_path, file_size=file_size))
+    return lods
+
+###############################################################################
+# TRELLIS Stage Helpers
+###############################################################################
+TRELLIS_SPACE = "eleelenawa/TRELLIS"
+
+# Everything besides the input image that affects what TRELLIS generates
+GENERATION_PARAMS = {
+    "seed": 0,
+    "ss_guidance_strength": 7.5,
+    "ss_sampling_steps": 12,
+    "slat_guidance_strength": 3.0,
+    "slat_sampling_steps": 12,
+    "multiimage_algo": "stochastic",
+    "mesh_simplify": 0.95,
+    "texture_size": 1024,
+}
+
+# Preprocessing is short and doesn't use session state, so a slow one can be
+# repeated on a second pooled client (gradio_pool.hedged) after the
+# GRADIO_HEDGE_QUANTILE of recent preprocessing times; the loser is cancelled.
+GRADIO_HEDGE = os.environ.get('GRADIO_HEDGE', '0') == '1'
+GRADIO_CANCEL_POLL = 0.25
+_preprocess_latency = retries.LatencyTracker(
+    quantile=float(os.environ.get('GRADIO_HEDGE_QUANTILE', 0.95)),
+    default=float(os.environ.get('GRADIO_HEDGE_AFTER', 15)),
+)
+
+def call_gradio(client, cancel=None, **kwargs):
+    """
+    client.predict(), but giving up (and cancelling the job) at the request
+    deadline, or with gradio_pool.CallCancelled once `cancel` is set.
+    """
+    if retries.remaining() is None and cancel is None:
+        return client.predict(**kwargs)
+    job = client.submit(**kwargs)
+    try:
+        while True:
+            try:
+                return job.result(timeout=retries.timeout(GRADIO_CANCEL_POLL if cancel is not None else None))
+            except concurrent.futures.TimeoutError:
+                if cancel is not None and cancel.is_set():
+                    raise gradio_pool.CallCancelled(f"{kwargs.get('api_name')} cancelled")
+                retries.check_deadline(kwargs.get('api_name'))
+    except (gradio_pool.CallCancelled, retries.DeadlineExceeded):
+        job.cancel()
         raise
 
+@tracing.traced('gradio_preprocess')
+@retries.retry(GRADIO_RETRY)
+def run_preprocessing(client, image_path: str):
+    """Background removal / cropping. Returns the preprocessed image path."""
+    def call(client, cancel=None):
+        return call_gradio(client, cancel=cancel, image=gradio_client.handle_file(image_path),
+                           api_name="/preprocess_image")
+
+    start = time.monotonic()
+    if GRADIO_HEDGE:
+        result = get_gradio_pool().hedged(client, call, _preprocess_latency.threshold(), 'gradio_preprocess')
+    else:
+        result = call(client)
+    _preprocess_latency.observe(time.monotonic() - start)
+    return result
+
+@tracing.traced('gradio_image_to_3d')
+@retries.retry(GRADIO_RETRY)
+def run_3d_generation(client, image_path: str, params=GENERATION_PARAMS):
+    """Image -> 3D. Returns {'video': path, ...}; the session keeps the generated state."""
+    return call_gradio(
+        client,
+        image=gradio_client.handle_file(image_path),
+        multiimages=[],
+        seed=params["seed"],
+        ss_guidance_strength=params["ss_guidance_strength"],
+        ss_sampling_steps=params["ss_sampling_steps"],
+        slat_guidance_strength=params["slat_guidance_strength"],
+        slat_sampling_steps=params["slat_sampling_steps"],
+        multiimage_algo=params["multiimage_algo"],
+        api_name="/image_to_3d",
+    )
+
+@tracing.traced('gradio_extract_glb')
+@retries.retry(GRADIO_RETRY)
+def run_glb_extraction(client, params=GENERATION_PARAMS):
+    """Extracts GLB(s) from the session's last generation."""
+    return call_gradio(
+        client,
+        mesh_simplify=params["mesh_simplify"],
+        texture_size=params["texture_size"],
+        api_name="/extract_glb",
+    )
+
 ###############################################################################
-# 1) The process_3d Function
+# Warm Gradio Clients
+###############################################################################
+# Clients for the TRELLIS Space are created and given a session ahead of
+# time (gradio_pool.py), so a request borrows one that's ready to go.
+GRADIO_POOL_SIZE = int(os.environ.get('GRADIO_POOL_SIZE', 2))
+
+_gradio_pool = None
+_gradio_pool_lock = threading.Lock()
+
+def create_trellis_client():
+    return gradio_client.Client(TRELLIS_SPACE)
+
+def start_trellis_session(client):
+    client.predict(api_name="/start_session")
+
+def get_gradio_pool():
+    """Creates the per-instance client pool on first use and starts warming it."""
+    global _gradio_pool
+    with _gradio_pool_lock:
+        if _gradio_pool is None:
+            _gradio_pool = gradio_pool.GradioClientPool(
+                create_trellis_client,
+                start_session=start_trellis_session,
+                size=GRADIO_POOL_SIZE,
+                max_idle=float(os.environ.get('GRADIO_CLIENT_MAX_IDLE', 600)),
+                health_check_after=float(os.environ.get('GRADIO_HEALTH_CHECK_AFTER', 120)),
+                ready_timeout=float(os.environ.get('GRADIO_READY_TIMEOUT', 30)),
+            )
+            _gradio_pool.prewarm()
+    return _gradio_pool
+
+###############################################################################
+# 3D Generation Pipeline
+###############################################################################
+# Uploads don't block the next Gradio stage: they run on a shared executor
+# and the response is assembled once every upload has finished.
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+
+def progress_reporter(on_progress):
+    """Wraps an optional on_progress(stage, data) callback so it can't fail the pipeline."""
+    def report(stage, **data):
+        if on_progress is not None:
+            try:
+                on_progress(stage, data)
+            except Exception as e:
+                print(f"[process_3d] Progress callback failed for {stage}: {e}")
+    return report
+
+def run_3d_pipeline(client, stages, image_path: str, user_id: str, timestamp: int, temp_files: list, report):
+    """
+    Preprocess -> 3D generation -> GLB extraction on a downloaded image, with
+    each upload overlapping the following stage. Returns the URLs plus a timing report.
+
+    report(stage, **data) is called as each stage (or upload) finishes.
+    """
+    prefix = f"processed/{user_id}/{timestamp}"
+
+    def report_upload(stage, key):
+        def done(future):
+            if future.exception() is None:
+                report(stage, **{key: future.result()})
+        return done
+
+    try:
+        # 1) Preprocess, upload in the background
+        with stages.stage('preprocess'):
+            preprocessed_result = run_preprocessing(client, image_path)
+        preprocessed_path = preprocessed_result[0] if isinstance(preprocessed_result, (list, tuple)) else preprocessed_result
+        temp_files.append(preprocessed_path)
+        preprocessed_future = stages.submit('upload_preprocessed', upload_to_firebase,
+                                            preprocessed_path, f"{prefix}/preprocessed.png")
+        preprocessed_future.add_done_callback(report_upload('preprocess', 'preprocessed_url'))
+
+        # 2) 3D generation, upload in the background
+        with stages.stage('generate_3d'):
+            three_d_result = run_3d_generation(client, image_path)
+        video_path = three_d_result['video']
+        temp_files.append(video_path)
+        video_future = stages.submit('upload_video', upload_to_firebase, video_path, f"{prefix}/preview.mp4")
+        video_future.add_done_callback(report_upload('generate_3d', 'video_url'))
+
+        # 3) Extract GLB(s), upload them in parallel
+        with stages.stage('extract_glb'):
+            glb_result = run_glb_extraction(client)
+        if isinstance(glb_result, (list, tuple)):
+            glb_uploads = [(path, f"{prefix}/model_{idx}.glb") for idx, path in enumerate(glb_result)]
+        else:
+            glb_uploads = [(glb_result, f"{prefix}/model.glb")]
+        glb_futures = []
+        for idx, (path, destination) in enumerate(glb_uploads):
+            temp_files.append(path)
+            glb_futures.append(stages.submit(f'upload_glb_{idx}', upload_to_firebase, path, destination))
+
+        # 4) Everything must be uploaded before we answer
+        stages.gather()
+        glb_urls = [future.result() for future in glb_futures]
+        report('extract_glb', glb_urls=glb_urls)
+        timings = stages.report()
+        print(f"[process_3d] Stage report: {json.dumps(timings)}")
+        return {
+            "preprocessed_url": preprocessed_future.result(),
+            "video_url": video_future.result(),
+            "glb_urls": glb_urls,
+            "timestamp": timestamp,
+            "timings": timings,
+        }
+    finally:
+        # Don't let the caller delete temp files under a running upload
+        stages.wait_all()
+
 ###############################################################################
-from gradio_client import Client, handle_file
+# Deduplicated 3D Generation
+###############################################################################
+# Key = sha256 of the downloaded image + GENERATION_PARAMS + userId. Concurrent
+# identical requests share one TRELLIS run; finished results are served from
+# an index (in-memory LRU backed by processed/_index/ blobs) until they expire.
+# The user is part of the key because results live under processed/{userId}/:
+# another user uploading the same image must not get links into that folder.
+_generation_dedup = singleflight.Deduplicator(singleflight.ResultIndex(
+    ttl=float(os.environ.get('GENERATION_INDEX_TTL', 7 * 86400)),
+    max_entries=int(os.environ.get('GENERATION_INDEX_MAX_ENTRIES', 512)),
+    get_bucket=get_bucket,
+    prefix='processed/_index',
+))
+
+def generate_3d(image_url: str, user_id: str, temp_files: list, on_progress=None,
+                admission_wait=admission.DEFAULT_WAIT):
+    """
+    Downloads the image, then runs the generation pipeline for it, or reuses
+    an identical in-flight/finished run. The result's 'source' says which.
+    """
+    timestamp = int(time.time() * 1000)
+    stages = pipeline.StagePipeline(pipeline.shared_executor('uploads', UPLOAD_WORKERS))
+    report = progress_reporter(on_progress)
+
+    temp_path = os.path.join(tempfile.gettempdir(), f"temp_image_{timestamp}_{uuid.uuid4().hex[:8]}.png")
+    temp_files.append(temp_path)
+    print(f"[process_3d] Downloading image from {image_url} ...")
+    with stages.stage('download'):
+        download = download_image(image_url, temp_path)
+    report('download', sha256=download['sha256'])
 
+    def run():
+        # Only the run that actually generates holds memory; deduplicated followers just wait
+        with admit('generate', max_wait=admission_wait), get_gradio_pool().borrow() as client:
+            return run_3d_pipeline(client, stages, temp_path, user_id, timestamp, temp_files, report)
+
+    key = singleflight.request_key(download['sha256'], dict(GENERATION_PARAMS, userId=user_id))
+    result, source = _generation_dedup.run(key, run)
+    print(f"[process_3d] Generation {source} for key {key[:12]}... ({_generation_dedup.stats()})")
+    if source != 'fresh':
+        report(source, preprocessed_url=result['preprocessed_url'], video_url=result['video_url'],
+               glb_urls=result['glb_urls'])
+    return dict(result, source=source)
+
+def cleanup_temp_files(temp_files: list, label: str):
+    for temp_file in temp_files:
+        if temp_file and os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+                print(f"[{label}] Cleaned up: {temp_file}")
+            except:
+                pass
+
+###############################################################################
+# 1) The process_3d Function
+###############################################################################
 @https_fn.on_request()
 def process_3d(request: https_fn.Request) -> https_fn.Response:
     """
@@ -326,18 +976,6 @@ def process_3d(request: https_fn.Request) -> https_fn.Response:
     try:
         print(f"[process_3d] Starting at {time.time()}")
         
-        # Create Gradio client
-        client = Client("eleelenawa/TRELLIS")
-        print(f"{time.time() - start_time:.2f}s: Created Gradio client")
-
-        # Attempt to start Gradio session
-        try:
-            client.predict(api_name="/start_session")
-            time.sleep(2)
-            print(f"{time.time() - start_time:.2f}s: Started session")
-        except Exception as e:
-            print(f"[process_3d] Possibly ignoring Gradio error: {e}")
-
         # Request data
         request_json = request.get_json()
         print(f"Request data: {json.dumps(request_json, indent=2)}")
@@ -347,61 +985,31 @@ def process_3d(request: https_fn.Request) -> https_fn.Response:
         if not image_url:
             return https_fn.Response(json.dumps({"error": "No image URL"}), headers=headers, status=400)
 
-        timestamp = int(time.time() * 1000)
-        
-        # 1) Download
-        temp_path = os.path.join(tempfile.gettempdir(), f"temp_image_{timestamp}.png")
-        temp_files.append(temp_path)
-        print(f"{time.time() - start_time:.2f}s: Downloading image from {image_url} ...")
-        download_image(image_url, temp_path)
-        print(f"{time.time() - start_time:.2f}s: Download complete")
-
-        # 2) Preprocess
-        print(f"{time.time() - start_time:.2f}s: Preprocessing image...")
-        preprocessed_result = run_preprocessing(client, temp_path)
-        preprocessed_path = preprocessed_result[0] if isinstance(preprocessed_result, (list, tuple)) else preprocessed_result
-        temp_files.append(preprocessed_path)
-
-        preprocessed_url = upload_to_firebase(preprocessed_path, f"processed/{user_id}/{timestamp}/preprocessed.png")
-        print(f"{time.time() - start_time:.2f}s: Preprocessing complete -> {preprocessed_url}")
-
-        # 3) 3D generation
-        print(f"{time.time() - start_time:.2f}s: Starting 3D generation...")
-        three_d_result = run_3d_generation(client, temp_path)
-        video_path = three_d_result['video']
-        temp_files.append(video_path)
-
-        video_url = upload_to_firebase(video_path, f"processed/{user_id}/{timestamp}/preview.mp4")
-        print(f"{time.time() - start_time:.2f}s: 3D generation complete -> {video_url}")
-
-        # 4) Extract GLB
-        print(f"{time.time() - start_time:.2f}s: Extracting GLB...")
-        glb_result = run_glb_extraction(client)
-        
-        glb_urls = []
-        if isinstance(glb_result, (list, tuple)):
-            for idx, one_glb in enumerate(glb_result):
-                temp_files.append(one_glb)
-                glb_url = upload_to_firebase(one_glb, f"processed/{user_id}/{timestamp}/model_{idx}.glb")
-                glb_urls.append(glb_url)
-        else:
-            temp_files.append(glb_result)
-            glb_url = upload_to_firebase(glb_result, f"processed/{user_id}/{timestamp}/model.glb")
-            glb_urls = [glb_url]
-
-        print(f"{time.time() - start_time:.2f}s: GLB extraction complete -> {glb_urls}")
+        with retries.deadline(REQUEST_DEADLINE - (time.time() - start_time)), \
+                tracing.trace('process_3d') as request_trace:
+            result = generate_3d(image_url, user_id, temp_files)
+        print(f"[process_3d] Pipeline complete ({result['source']}) -> {result['glb_urls']}")
 
         total_time = time.time() - start_time
         return https_fn.Response(json.dumps({
             "success": True,
-            "preprocessed_url": preprocessed_url,
-            "video_url": video_url,
-            "glb_urls": glb_urls,
-            "timestamp": timestamp,
+            "preprocessed_url": result['preprocessed_url'],
+            "video_url": result['video_url'],
+            "glb_urls": result['glb_urls'],
+            "timestamp": result['timestamp'],
             "userId": user_id,
+            "source": result['source'],
+            "dedup": _generation_dedup.stats(),
+            "timings": result['timings'],
+            "trace": request_trace.summary(),
             "processing_time": total_time
         }), headers=headers, status=200)
 
+    except admission.AdmissionRejected as e:
+        return admission_rejected_response(e, headers)
+    except retries.DeadlineExceeded as e:
+        print(f"[process_3d] {e}")
+        return https_fn.Response(json.dumps({"error": str(e)}), headers=headers, status=504)
     except Exception as e:
         print(f"[process_3d] Exception: {e}")
         print(traceback.format_exc())
@@ -410,13 +1018,131 @@ def process_3d(request: https_fn.Request) -> https_fn.Response:
             "traceback": traceback.format_exc()
         }), headers=headers, status=500)
     finally:
-        for temp_file in temp_files:
-            if temp_file and os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                    print(f"[process_3d] Cleaned up: {temp_file}")
-                except:
-                    pass
+        cleanup_temp_files(temp_files, 'process_3d')
+
+###############################################################################
+# 1b) The process_3d_jobs Function (asynchronous job API)
+###############################################################################
+# POST /                   -> submit {image_url, userId}, returns 202 + jobId
+# GET  /<jobId>            -> job status with per-stage results so far
+# GET  /<jobId>/result     -> 200 with URLs when done, 202 while running
+# GET  /<jobId>/events     -> server-sent events until the job finishes
+#
+# Submit, status and events must share a job store, so the default is
+# Firestore (FIRESTORE_EMULATOR_HOST works for local runs). JOB_STORE=memory
+# is only for a single instance. Either way the instance that accepted the
+# job runs it after responding, so it needs CPU outside requests
+# (e.g. min instances + CPU always allocated).
+JOB_STORE = os.environ.get('JOB_STORE', 'firestore')
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 2))
+JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 20))
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+def run_3d_job(job_id: str, request: dict, progress):
+    """Job body: the same pipeline as process_3d, reporting each stage."""
+    temp_files = []
+    try:
+        with retries.deadline(JOB_DEADLINE), tracing.trace('process_3d_job') as job_trace:
+            # Accepted jobs wait for memory instead of being rejected
+            result = generate_3d(request['image_url'], request['userId'], temp_files, on_progress=progress,
+                                 admission_wait=None)
+        return dict(result, trace=job_trace.summary())
+    finally:
+        cleanup_temp_files(temp_files, f'job {job_id}')
+
+def get_job_runner():
+    global _job_runner
+    with _job_runner_lock:
+        if _job_runner is None:
+            if JOB_STORE == 'firestore':
+                get_firebase_app()
+                store = jobs.FirestoreJobStore()
+            else:
+                store = jobs.InMemoryJobStore()
+            _job_runner = jobs.JobRunner(store, run_3d_job, max_workers=JOB_CONCURRENCY,
+                                         max_queued=JOB_MAX_QUEUED, deadline=JOB_DEADLINE)
+    return _job_runner
+
+@https_fn.on_request()
+def process_3d_jobs(request: https_fn.Request) -> https_fn.Response:
+    if request.method == 'OPTIONS':
+        headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST",
+            "Access-Control-Allow-Headers": "Content-Type",
+        }
+        return https_fn.Response('', status=204, headers=headers)
+
+    headers = {"Access-Control-Allow-Origin": "*", "Content-Type": "application/json"}
+    parts = [p for p in request.path.split('/') if p]
+
+    try:
+        # Inside the try: a job store that can't be reached is a 500 with a JSON body too
+        runner = get_job_runner()
+        if request.method == 'POST' and not parts:
+            request_json = request.get_json(silent=True) or {}
+            image_url = request_json.get('image_url')
+            user_id = request_json.get('userId', 'default')
+            if not image_url:
+                return https_fn.Response(json.dumps({"error": "No image URL"}), headers=headers, status=400)
+            try:
+                job = runner.submit({"image_url": image_url, "userId": user_id})
+            except jobs.QueueFull as e:
+                return https_fn.Response(json.dumps({"error": str(e)}),
+                                         headers=dict(headers, **{"Retry-After": "30"}), status=429)
+            print(f"[process_3d_jobs] Submitted job {job['id']} for {image_url}")
+            return https_fn.Response(json.dumps({
+                "jobId": job['id'],
+                "status": job['status'],
+                "statusPath": f"/{job['id']}",
+                "resultPath": f"/{job['id']}/result",
+                "eventsPath": f"/{job['id']}/events",
+                # Once running, a job finishes within this (its document has the exact "deadline")
+                "deadlineSeconds": JOB_DEADLINE,
+            }), headers=headers, status=202)
+
+        if request.method != 'GET' or not parts or len(parts) > 2:
+            return https_fn.Response(json.dumps({"error": "Not found"}), headers=headers, status=404)
+
+        job_id = parts[0]
+        view = parts[1] if len(parts) > 1 else 'status'
+        job = runner.store.get(job_id)
+
+        if view == 'status':
+            return https_fn.Response(json.dumps(job, default=str), headers=headers, status=200)
+
+        if view == 'result':
+            if job['status'] == jobs.SUCCEEDED:
+                return https_fn.Response(json.dumps(dict(job['result'], success=True, jobId=job_id)),
+                                         headers=headers, status=200)
+            if job['status'] == jobs.FAILED:
+                return https_fn.Response(json.dumps({"error": job['error'], "jobId": job_id}),
+                                         headers=headers, status=500)
+            return https_fn.Response(json.dumps({"status": job['status'], "jobId": job_id,
+                                                 "deadline": job.get('deadline')}),
+                                     headers=dict(headers, **{"Retry-After": "5"}), status=202)
+
+        if view == 'events':
+            sse_headers = {
+                "Access-Control-Allow-Origin": "*",
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+            }
+            return https_fn.Response(jobs.job_events(runner.store, job_id), headers=sse_headers, status=200)
+
+        return https_fn.Response(json.dumps({"error": "Not found"}), headers=headers, status=404)
+
+    except jobs.JobNotFound:
+        return https_fn.Response(json.dumps({"error": "Unknown job"}), headers=headers, status=404)
+    except Exception as e:
+        print(f"[process_3d_jobs] Exception: {e}")
+        print(traceback.format_exc())
+        return https_fn.Response(json.dumps({
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), headers=headers, status=500)
 
 ###############################################################################
 # 2) The "convert_glb_http" Function (using advanced script)
@@ -424,8 +1150,20 @@ def process_3d(request: https_fn.Request) -> https_fn.Response:
 @https_fn.on_request()
 def convert_glb_http(request: https_fn.Request) -> https_fn.Response:
     """
-    Converts a GLB to STL using the advanced script (mesh joining,
-    remove doubles, triangulation, etc.) by substituting __GLB_PATH__ / __STL_PATH__.
+    Converts a GLB to STL (mesh joining, remove doubles, triangulation, etc.)
+    using the in-process numpy engine, or the advanced Blender script when
+    CONVERSION_ENGINE=blender or the numpy engine can't handle the file.
+
+    Optional "formats": any of stl (default), stl_gzip, 3mf, glb_quantized;
+    each is uploaded to conversions/{designId}/ and reported under "outputs"
+    with its size and write/upload time.
+
+    Optional "lods": list of simplified versions to build alongside it, each
+    a face ratio (0.1), a face count (5000) or {"targetFaces", "ratio",
+    "maxError"} (maxError as a fraction of the bounding-box diagonal).
+
+    "analysis" reports watertightness, non-manifold/boundary edges, shells,
+    volume, surface area and bounding box of the converted mesh.
     """
     if request.method == 'OPTIONS':
         headers = {
@@ -450,37 +1188,98 @@ def convert_glb_http(request: https_fn.Request) -> https_fn.Response:
         design_id = request_json.get('designId')
         if not glb_url or not design_id:
             return https_fn.Response(json.dumps({"error": "Missing glbUrl or designId"}), headers=headers, status=400)
+        try:
+            lod_specs = parse_lods(request_json.get('lods'))
+        except (TypeError, ValueError) as e:
+            return https_fn.Response(json.dumps({"error": f"Invalid lods: {e}"}), headers=headers, status=400)
+        try:
+            formats = mesh_formats.parse_formats(request_json.get('formats'))
+        except ValueError as e:
+            return https_fn.Response(json.dumps({"error": f"Invalid formats: {e}"}), headers=headers, status=400)
 
         print(f"[convert_glb_http] Starting advanced GLB→STL conversion for {glb_url}, ID: {design_id}")
 
-        with tempfile.TemporaryDirectory() as temp_dir:
+        with retries.deadline(REQUEST_DEADLINE - (time.time() - start_time)), \
+                tracing.trace('convert_glb_http') as request_trace, admit('convert'), \
+                tempfile.TemporaryDirectory() as temp_dir:
             glb_path = os.path.join(temp_dir, f"{design_id}.glb")
             stl_path = os.path.join(temp_dir, f"{design_id}.stl")
             temp_files.extend([glb_path, stl_path])
 
             # 1) Download the GLB
-            print(f"{time.time() - start_time:.2f}s: Downloading GLB...")
-            download_image(glb_url, glb_path)
-            print(f"{time.time() - start_time:.2f}s: GLB downloaded -> {os.path.getsize(glb_path)} bytes")
+            download = download_image(glb_url, glb_path)
+
+            # 2) Cache lookup on GLB content + conversion options
+            cache_key = None
+            cache_tier = 'disabled'
+            if CONVERSION_CACHE_ENABLED:
+                with tracing.span('cache_lookup') as span:
+                    glb_hash = download['sha256']
+                    cache_key = conversion_cache.cache_key(glb_hash, conversion_options(formats, lod_specs))
+                    cached, cache_tier = _conversion_cache.lookup(cache_key)
+                    span.set(tier=cache_tier)
+                tracing.count('conversion_cache_lookups_total', tier=cache_tier)
+                if cached:
+                    total_time = time.time() - start_time
+                    return https_fn.Response(json.dumps({
+                        "success": True,
+                        "stlUrl": cached.get('outputs', {}).get('stl', {}).get('url'),
+                        "designId": design_id,
+                        "engine": cached.get('engine'),
+                        "outputs": cached.get('outputs', {}),
+                        "lods": cached.get('lods', []),
+                        "analysis": cached.get('analysis'),
+                        "cache": cache_tier,
+                        "cacheStats": _conversion_cache.stats(),
+                        "trace": request_trace.summary(),
+                        "processing_time": total_time
+                    }), headers=headers, status=200)
+
+            # 3) Convert (numpy engine, Blender fallback)
+            file_size, engine, mesh = convert_glb_to_stl(glb_path, stl_path)
+            if MESH_ANALYSIS or formats != ['stl'] or lod_specs:
+                mesh = converted_mesh(stl_path, mesh)
+            analysis = analyze_converted_mesh(mesh) if MESH_ANALYSIS else None
 
-            # 2) Convert with advanced script
-            print(f"{time.time() - start_time:.2f}s: Running advanced conversion...")
-            file_size = convert_glb_to_stl_advanced(glb_path, stl_path)
-            print(f"{time.time() - start_time:.2f}s: Conversion done, STL size = {file_size} bytes")
+            # 4) Write + upload the requested formats
+            blob_base = output_blob_base(design_id, cache_key)
+            outputs = export_formats(mesh, stl_path, design_id, formats, temp_dir, blob_base)
+            for output in outputs.values():
+                output.pop('local_path')
+            stl_url = outputs.get('stl', {}).get('url')
+            print(f"[convert_glb_http] {engine} conversion uploaded -> "
+                  f"{', '.join(output['url'] for output in outputs.values())}")
 
-            # 3) Upload STL
-            print(f"{time.time() - start_time:.2f}s: Uploading STL to Firebase...")
-            stl_url = upload_to_firebase(stl_path, f"conversions/{design_id}/{design_id}.stl")
-            print(f"{time.time() - start_time:.2f}s: Upload complete -> {stl_url}")
+            # 5) Optional simplified LODs
+            lods = build_lods(mesh, design_id, lod_specs, temp_dir, blob_base) if lod_specs else []
+
+            if cache_key:
+                primary = outputs[formats[0]]
+                _conversion_cache.store(cache_key, primary['blob_path'], primary['url'],
+                                        blob_size=primary['file_size'], engine=engine, file_size=file_size, outputs=outputs, lods=lods,
+                                        analysis=analysis)
 
             total_time = time.time() - start_time
             return https_fn.Response(json.dumps({
                 "success": True,
                 "stlUrl": stl_url,
                 "designId": design_id,
+                "engine": engine,
+                "outputs": outputs,
+                "lods": lods,
+                "analysis": analysis,
+                "decimation_time": sum(lod['decimation_time'] for lod in lods),
+                "cache": cache_tier,
+                "cacheStats": _conversion_cache.stats(),
+                "trace": request_trace.summary(),
                 "processing_time": total_time
             }), headers=headers, status=200)
 
+    except admission.AdmissionRejected as e:
+        return admission_rejected_response(e, headers)
+    except retries.DeadlineExceeded as e:
+        print(f"[convert_glb_http] {e}")
+        return https_fn.Response(json.dumps({"error": str(e)}), headers=headers, status=504)
     except Exception as e:
         err_time = time.time() - start_time
         print(f"[convert_glb_http] ERROR at {err_time:.2f}s: {e}")
@@ -496,4 +1295,257 @@ def convert_glb_http(request: https_fn.Request) -> https_fn.Response:
                     os.remove(temp_file)
                     print(f"[convert_glb_http] Cleaned up: {temp_file}")
                 except:
-                    pass
\ No newline at end of file
+                    pass
+
+###############################################################################
+# 3) The "convert_glb_batch" Function
+###############################################################################
+# Many designs per request (batch.py). Conversions run on a per-container
+# process pool sized to the cores, created on first use and kept across
+# requests, so worker startup and imports are paid once rather than per
+# design. An item the numpy engine can't convert (or whose worker died) falls
+# back to Blender, like convert_glb_to_stl. Each item's downloads, cache
+# lookup and uploads are the same as convert_glb_http's; LODs aren't offered
+# here.
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 50))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 8))
+# Items queue for memory longer than single requests; the batch is already accepted
+BATCH_ADMISSION_WAIT = float(os.environ.get('BATCH_ADMISSION_WAIT', 300))
+BATCH_CONVERT_WORKERS = int(os.environ.get('BATCH_CONVERT_WORKERS', 0)) or os.cpu_count() or 1
+# forkserver: workers don't inherit this process's threads and locks (httpx, pools)
+BATCH_START_METHOD = os.environ.get('BATCH_START_METHOD', 'forkserver')
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def get_batch_pool():
+    """Creates the converter process pool on first use."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=BATCH_CONVERT_WORKERS,
+                mp_context=multiprocessing.get_context(BATCH_START_METHOD),
+            )
+    return _batch_pool
+
+def batch_admission_wait():
+    """BATCH_ADMISSION_WAIT, but never past the request deadline (0 once it has passed)."""
+    left = retries.remaining()
+    if left is None:
+        return BATCH_ADMISSION_WAIT
+    return max(0.0, min(BATCH_ADMISSION_WAIT, left))
+
+def reset_batch_pool(pool):
+    """Drops a broken pool (a worker was killed, e.g. out of memory); the next item starts a new one."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False)
+
+def validate_batch_items(items):
+    """Returns an error message, or None if the items are usable."""
+    if not isinstance(items, list) or not items:
+        return "items must be a non-empty list of {glbUrl, designId}"
+    if len(items) > BATCH_MAX_ITEMS:
+        return f"At most {BATCH_MAX_ITEMS} items per batch"
+    seen = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('glbUrl') or not item.get('designId'):
+            return f"Item {index} is missing glbUrl or designId"
+        if item['designId'] in seen:
+            return f"Duplicate designId {item['designId']!r}"
+        seen.add(item['designId'])
+    return None
+
+def download_batch_item(item: dict, work_dir: str) -> dict:
+    return download_image(item['glbUrl'], os.path.join(work_dir, f"{item['designId']}.glb"))
+
+def lookup_batch_item(item: dict, downloaded: dict, formats: list):
+    """Cache lookup; the key is kept on `downloaded` so the upload step can store the result."""
+    downloaded['cache'] = 'disabled'
+    if not CONVERSION_CACHE_ENABLED:
+        return None
+    with tracing.span('cache_lookup') as span:
+        downloaded['cache_key'] = conversion_cache.cache_key(downloaded['sha256'], conversion_options(formats))
+        cached, downloaded['cache'] = _conversion_cache.lookup(downloaded['cache_key'])
+        span.set(tier=downloaded['cache'])
+    tracing.count('conversion_cache_lookups_total', tier=downloaded['cache'])
+    if not cached:
+        return None
+    return {
+        "stlUrl": cached.get('outputs', {}).get('stl', {}).get('url'),
+        "engine": cached.get('engine'),
+        "outputs": cached.get('outputs', {}),
+        "analysis": cached.get('analysis'),
+        "cache": downloaded['cache'],
+    }
+
+def convert_batch_item(item: dict, downloaded: dict, work_dir: str, formats: list) -> dict:
+    design_id = item['designId']
+    glb_path = downloaded['path']
+    with tracing.span('batch_convert', input_bytes=downloaded['size']) as span:
+        if CONVERSION_ENGINE == 'numpy':
+            pool = get_batch_pool()
+            try:
+                converted = pool.submit(batch.convert_item, glb_path, work_dir, design_id, formats,
+                                        MESH_ANALYSIS).result()
+                print(f"[convert_glb_batch] {design_id}: numpy engine in worker {converted['worker_pid']}: "
+                      f"{converted['stats']}")
+                span.set(engine='numpy', bytes=converted['stats']['file_size'], faces=converted['stats']['faces'])
+                return converted
+            except Exception as e:
+                if isinstance(e, concurrent.futures.BrokenExecutor):
+                    reset_batch_pool(pool)
+                print(f"[convert_glb_batch] {design_id}: numpy engine failed ({e}), falling back to Blender")
+                print(f"Error traceback: {traceback.format_exc()}")
+                tracing.count('engine_fallbacks_total', engine='numpy')
+
+        start = time.perf_counter()
+        stl_path = os.path.join(work_dir, f"{design_id}.stl")
+        file_size = convert_with_blender(glb_path, stl_path)
+        vertices, faces = converted_mesh(stl_path) if MESH_ANALYSIS or formats != ['stl'] else (None, None)
+        files = batch.write_formats(vertices, faces, stl_path, work_dir, design_id, formats)
+        span.set(engine='blender', bytes=file_size)
+        return {
+            "engine": "blender",
+            "stats": {"file_size": file_size},
+            "stl_path": stl_path,
+            "files": files,
+            "analysis": mesh_analysis.analyze_mesh(vertices, faces) if MESH_ANALYSIS else None,
+            "convert_time": round(time.perf_counter() - start, 4),
+        }
+
+def upload_batch_item(item: dict, downloaded: dict, converted: dict, formats: list) -> dict:
+    """Uploads every format concurrently and stores the result in the conversion cache."""
+    design_id = item['designId']
+    stl_size = os.path.getsize(converted['stl_path'])
+    stages = pipeline.StagePipeline(pipeline.shared_executor('uploads', UPLOAD_WORKERS))
+    blob_base = output_blob_base(design_id, downloaded.get('cache_key'))
+    outputs = {}
+    try:
+        for name in formats:
+            written = converted['files'][name]
+            outputs[name] = output_entry(name, blob_base, written['path'], written['file_size'],
+                                         written['write_time'], stl_size)
+            stages.submit(f'upload_{name}', upload_output, name, outputs[name])
+        stages.gather()
+    finally:
+        stages.wait_all()
+    for output in outputs.values():
+        output.pop('local_path')
+
+    if downloaded.get('cache_key'):
+        primary = outputs[formats[0]]
+        _conversion_cache.store(downloaded['cache_key'], primary['blob_path'], primary['url'],
+                                blob_size=primary['file_size'], engine=converted['engine'], file_size=converted['stats']['file_size'],
+                                outputs=outputs, lods=[],
+                                analysis=converted['analysis'])
+    return {
+        "stlUrl": outputs.get('stl', {}).get('url'),
+        "engine": converted['engine'],
+        "outputs": outputs,
+        "analysis": converted['analysis'],
+        "convert_time": converted['convert_time'],
+        "cache": downloaded.get('cache', 'disabled'),
+    }
+
+@https_fn.on_request()
+def convert_glb_batch(request: https_fn.Request) -> https_fn.Response:
+    """
+    Converts many GLBs in one call: {"items": [{"glbUrl", "designId"}, ...]}
+    plus optional "formats" (as convert_glb_http). Downloads and uploads run
+    concurrently; conversions share the converter process pool.
+
+    Returns per-item results in input order (each with success, and error +
+    failed stage when it failed) and "batch" with designs_per_minute.
+    """
+    if request.method == 'OPTIONS':
+        headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "POST",
+            "Access-Control-Allow-Headers": "Content-Type",
+        }
+        return https_fn.Response('', status=204, headers=headers)
+
+    headers = {
+        "Access-Control-Allow-Origin": "*",
+        "Content-Type": "application/json"
+    }
+    start_time = time.time()
+
+    try:
+        request_json = request.get_json() or {}
+        items = request_json.get('items')
+        error = validate_batch_items(items)
+        if error:
+            return https_fn.Response(json.dumps({"error": error}), headers=headers, status=400)
+        try:
+            formats = mesh_formats.parse_formats(request_json.get('formats'))
+        except ValueError as e:
+            return https_fn.Response(json.dumps({"error": f"Invalid formats: {e}"}), headers=headers, status=400)
+
+        print(f"[convert_glb_batch] Starting batch of {len(items)} designs, formats {formats}, "
+              f"{BATCH_CONVERT_WORKERS} converter worker(s)")
+
+        with retries.deadline(REQUEST_DEADLINE - (time.time() - start_time)), \
+                tempfile.TemporaryDirectory() as temp_dir, tracing.trace('convert_glb_batch') as request_trace:
+            runner = batch.BatchRunner(
+                download=download_batch_item,
+                lookup=partial(lookup_batch_item, formats=formats),
+                convert=partial(convert_batch_item, formats=formats),
+                upload=partial(upload_batch_item, formats=formats),
+                admit=lambda item: admit('convert', max_wait=batch_admission_wait()),
+                concurrency=BATCH_CONCURRENCY,
+                convert_slots=BATCH_CONVERT_WORKERS,
+            )
+            report = runner.run(items, temp_dir)
+            trace_summary = request_trace.summary()
+
+        for result in report['results']:
+            tracing.count('batch_items_total', outcome='ok' if result['success'] else 'error')
+        summary = report['batch']
+        print(f"[convert_glb_batch] {summary['succeeded']}/{summary['items']} converted in "
+              f"{summary['wall_time']:.2f}s ({summary['designs_per_minute']} designs/minute)")
+
+        return https_fn.Response(json.dumps({
+            "success": summary['failed'] == 0,
+            "results": report['results'],
+            "batch": summary,
+            "cacheStats": _conversion_cache.stats(),
+            "trace": trace_summary,
+            "processing_time": time.time() - start_time
+        }), headers=headers, status=200)
+
+    except Exception as e:
+        err_time = time.time() - start_time
+        print(f"[convert_glb_batch] ERROR at {err_time:.2f}s: {e}")
+        print(traceback.format_exc())
+        return https_fn.Response(json.dumps({
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }), headers=headers, status=500)
+
+###############################################################################
+# 4) The "metrics_http" Function
+###############################################################################
+# Per-instance stage metrics (tracing.py) plus cache/dedup/pool gauges.
+# GET ?format=prometheus -> Prometheus text exposition, otherwise JSON.
+tracing.registry.add_collector('conversion_cache', lambda: _conversion_cache.stats())
+tracing.registry.add_collector('generation_dedup', lambda: _generation_dedup.stats())
+tracing.registry.add_collector('gradio_pool', lambda: _gradio_pool.stats() if _gradio_pool else {})
+tracing.registry.add_collector('blender_pool', lambda: _blender_pool.stats() if _blender_pool else {})
+tracing.registry.add_collector('jobs', lambda: _job_runner.stats() if _job_runner else {})
+tracing.registry.add_collector('coldstart', coldstart.gauges)
+tracing.registry.add_collector('admission', _admission.stats)
+
+@https_fn.on_request()
+def metrics_http(request: https_fn.Request) -> https_fn.Response:
+    if request.args.get('format') == 'prometheus':
+        return https_fn.Response(tracing.registry.export_prometheus(), status=200,
+                                 headers={"Content-Type": "text/plain; version=0.0.4"})
+    headers = {"Access-Control-Allow-Origin": "*", "Content-Type": "application/json"}
+    return https_fn.Response(json.dumps(tracing.registry.export_json()), headers=headers, status=200)
+
+coldstart.mark_ready()
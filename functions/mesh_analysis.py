@@ -0,0 +1,164 @@
+import os
+import time
+
+import numpy as np
+
+###############################################################################
+# Mesh Analysis
+###############################################################################
+# Whole-array geometry checks on an indexed triangle mesh, for the
+# manufacturing flow and the converter's validation step:
+#  - degenerate faces: repeated corners or (near) zero area
+#  - edges: every face edge becomes a sorted (lo, hi) key packed into one
+#    int64; after one sort, run lengths count how many faces share it
+#    (1 = boundary, 2 = manifold, 3+ = non-manifold). A directed edge seen
+#    twice means two neighbouring faces disagree on orientation.
+#  - connected components: vertex labels are hooked across edges and
+#    flattened by pointer jumping until nothing changes
+#  - watertight: no boundary or non-manifold edges
+#  - signed volume, surface area and bounding box, summed in chunks of faces
+# Cost is a few sorts and linear passes over the faces; no per-face Python.
+#
+# This module only needs numpy, so Blender's bundled Python can import it too.
+
+CHUNK_FACES = int(os.environ.get('ANALYSIS_CHUNK_FACES', 1 << 20))
+# Faces with area below (tolerance * bbox diagonal)^2 count as degenerate
+DEGENERATE_TOLERANCE = float(os.environ.get('ANALYSIS_DEGENERATE_TOLERANCE', 1e-6))
+
+
+def _edge_uses(faces: np.ndarray, vertex_count: int):
+    """
+    For every distinct edge, how many faces use it and how many of those
+    pairs run in the same direction. One sort: the direction rides along as
+    the key's lowest bit.
+    """
+    starts = faces.reshape(-1)
+    ends = faces[:, [1, 2, 0]].reshape(-1)
+    n = np.int64(vertex_count)
+    keys = (np.minimum(starts, ends) * n + np.maximum(starts, ends)) * 2 + (starts > ends)
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    keys.sort()
+    # Runs of identical directed keys, then runs of the same undirected edge
+    run_starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    directed_uses = np.diff(np.append(run_starts, len(keys)))
+    edge_keys = keys[run_starts] >> 1
+    edge_starts = np.flatnonzero(np.concatenate(([True], edge_keys[1:] != edge_keys[:-1])))
+    uses = np.add.reduceat(directed_uses, edge_starts)
+    return uses, directed_uses
+
+
+def _component_labels(faces: np.ndarray, vertex_count: int) -> np.ndarray:
+    """Smallest vertex index in each vertex's connected component."""
+    labels = np.arange(vertex_count, dtype=np.int64)
+    a = np.concatenate([faces[:, 0], faces[:, 1]])
+    b = np.concatenate([faces[:, 1], faces[:, 2]])
+    while True:
+        la, lb = labels[a], labels[b]
+        differ = la != lb
+        if not differ.any():
+            return labels
+        # Hook the larger root under the smaller one, then flatten
+        np.minimum.at(labels, np.maximum(la, lb)[differ], np.minimum(la, lb)[differ])
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def _area_volume(vertices: np.ndarray, faces: np.ndarray, center: np.ndarray):
+    """Per-face areas and total signed volume, in chunks to bound memory."""
+    areas = np.empty(len(faces), dtype=np.float64)
+    volume = 0.0
+    for start in range(0, len(faces), CHUNK_FACES):
+        chunk = faces[start:start + CHUNK_FACES]
+        a = vertices[chunk[:, 0]].astype(np.float64) - center
+        e1 = vertices[chunk[:, 1]] - center - a
+        e2 = vertices[chunk[:, 2]] - center - a
+        normal = np.empty_like(a)
+        normal[:, 0] = e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1]
+        normal[:, 1] = e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]
+        normal[:, 2] = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        areas[start:start + len(chunk)] = 0.5 * np.sqrt(np.einsum('ij,ij->i', normal, normal))
+        # a . (b x c) == a . ((b - a) x (c - a))
+        volume += float(np.einsum('ij,ij->', a, normal)) / 6.0
+    return areas, volume
+
+
+def _g(value: float) -> float:
+    return float(f"{value:.6g}")
+
+
+def analyze_mesh(vertices: np.ndarray, faces: np.ndarray) -> dict:
+    """Geometry report for an indexed triangle mesh (JSON-serializable)."""
+    start = time.perf_counter()
+    vertices = np.asarray(vertices)
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    face_count = len(faces)
+    if face_count == 0:
+        return {"faces": 0, "vertices": 0, "watertight": False, "printable": False,
+                "issues": ["mesh has no faces"], "analysis_time": round(time.perf_counter() - start, 4)}
+
+    used = np.zeros(len(vertices), dtype=bool)
+    used[faces.reshape(-1)] = True
+    used_vertices = vertices[used]
+    low, high = used_vertices.min(axis=0).astype(np.float64), used_vertices.max(axis=0).astype(np.float64)
+    diagonal = float(np.linalg.norm(high - low))
+
+    # Degenerate faces
+    areas, signed_volume = _area_volume(vertices, faces, (low + high) / 2)
+    collapsed = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 2] == faces[:, 0])
+    degenerate = collapsed | (areas <= (DEGENERATE_TOLERANCE * diagonal) ** 2)
+
+    # Edge manifoldness and orientation (collapsed faces have no real edges)
+    uses, directed_uses = _edge_uses(faces[~collapsed], len(vertices))
+    boundary_edges = int(np.count_nonzero(uses == 1))
+    non_manifold_edges = int(np.count_nonzero(uses > 2))
+    inconsistent_edges = int(np.count_nonzero(directed_uses > 1))
+
+    # Connected components (by shared vertices)
+    labels = _component_labels(faces, len(vertices))
+    _, component_faces = np.unique(labels[faces[:, 0]], return_counts=True)
+
+    watertight = boundary_edges == 0 and non_manifold_edges == 0
+    consistent = inconsistent_edges == 0
+    issues = []
+    if int(degenerate.sum()):
+        issues.append(f"{int(degenerate.sum())} degenerate faces")
+    if boundary_edges:
+        issues.append(f"{boundary_edges} boundary edges (open surface)")
+    if non_manifold_edges:
+        issues.append(f"{non_manifold_edges} non-manifold edges")
+    if inconsistent_edges:
+        issues.append(f"{inconsistent_edges} edges with inconsistent face orientation")
+    if watertight and signed_volume < 0:
+        issues.append("normals point inwards (negative volume)")
+    if len(component_faces) > 1:
+        issues.append(f"{len(component_faces)} separate shells")
+
+    return {
+        "vertices": int(used.sum()),
+        "faces": face_count,
+        "degenerate_faces": int(degenerate.sum()),
+        "edges": int(len(uses)),
+        "boundary_edges": boundary_edges,
+        "non_manifold_edges": non_manifold_edges,
+        "inconsistent_edges": inconsistent_edges,
+        "components": int(len(component_faces)),
+        "largest_component_faces": int(component_faces.max()),
+        "watertight": watertight,
+        "consistently_oriented": consistent,
+        # Only a true enclosed volume when watertight
+        "volume": _g(abs(signed_volume)),
+        "signed_volume": _g(signed_volume),
+        "surface_area": _g(float(areas.sum())),
+        "bbox": {
+            "min": [_g(v) for v in low],
+            "max": [_g(v) for v in high],
+            "size": [_g(v) for v in high - low],
+        },
+        "printable": watertight and consistent and signed_volume > 0,
+        "issues": issues,
+        "analysis_time": round(time.perf_counter() - start, 4),
+    }
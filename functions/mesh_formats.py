@@ -0,0 +1,189 @@
+import gzip
+import json
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+import glb_engine
+import stl_writer
+
+###############################################################################
+# Compact Output Formats
+###############################################################################
+# Every writer takes the same welded, indexed mesh (Z-up, like the STL) and
+# streams it to disk in chunks:
+#  - 'stl'           binary STL (50 bytes/triangle, vertices duplicated)
+#  - 'stl_gzip'      the same bytes gzip-compressed; uploaded with
+#                    Content-Encoding: gzip so storage/browsers decompress it
+#                    transparently and it still arrives as a plain STL
+#  - '3mf'           indexed 3MF package (zip, deflated XML)
+#  - 'glb_quantized' preview GLB with 16-bit positions (KHR_mesh_quantization)
+#                    and 16/32-bit indices; loads directly in three.js
+# Each FORMATS entry gives the blob suffix, content type/encoding and writer.
+# Writers return the number of bytes on disk.
+
+CHUNK_ROWS = int(os.environ.get('FORMAT_CHUNK_ROWS', 65536))
+DEFLATE_LEVEL = int(os.environ.get('FORMAT_DEFLATE_LEVEL', 6))
+GZIP_LEVEL = int(os.environ.get('FORMAT_GZIP_LEVEL', 6))
+
+# The GLB preview goes back to glTF's Y-up
+Z_UP_TO_Y_UP = glb_engine.Y_UP_TO_Z_UP[:3, :3].T
+
+
+def write_stl(path: str, vertices: np.ndarray, faces: np.ndarray) -> int:
+    return stl_writer.write_binary_stl(path, vertices, faces, header=glb_engine.STL_HEADER)
+
+
+def write_gzip_stl(path: str, vertices: np.ndarray, faces: np.ndarray) -> int:
+    with open(path, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as fp:
+        stl_writer.write_binary_stl_stream(fp, vertices, faces, header=glb_engine.STL_HEADER)
+    return os.path.getsize(path)
+
+
+###############################################################################
+# 3MF
+###############################################################################
+CONTENT_TYPES_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+ <Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+ <Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+'''
+
+RELS_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+ <Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+'''
+
+MODEL_HEAD = b'''<?xml version="1.0" encoding="UTF-8"?>
+<model unit="millimeter" xml:lang="en-US" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">
+ <resources>
+  <object id="1" type="model">
+   <mesh>
+    <vertices>
+'''
+MODEL_MIDDLE = b'''    </vertices>
+    <triangles>
+'''
+MODEL_TAIL = b'''    </triangles>
+   </mesh>
+  </object>
+ </resources>
+ <build>
+  <item objectid="1"/>
+ </build>
+</model>
+'''
+VERTEX_XML = b'     <vertex x="%.7g" y="%.7g" z="%.7g"/>\n'
+TRIANGLE_XML = b'     <triangle v1="%d" v2="%d" v3="%d"/>\n'
+
+
+def _write_rows(fp, template: bytes, rows: np.ndarray):
+    """Formats rows in chunks with one %-operation each (no per-row Python loop)."""
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        fp.write((template * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def write_3mf(path: str, vertices: np.ndarray, faces: np.ndarray) -> int:
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=DEFLATE_LEVEL) as package:
+        package.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        package.writestr('_rels/.rels', RELS_XML)
+        with package.open('3D/3dmodel.model', 'w', force_zip64=True) as fp:
+            fp.write(MODEL_HEAD)
+            _write_rows(fp, VERTEX_XML, np.asarray(vertices, dtype=np.float64))
+            fp.write(MODEL_MIDDLE)
+            _write_rows(fp, TRIANGLE_XML, np.asarray(faces, dtype=np.int64))
+            fp.write(MODEL_TAIL)
+    return os.path.getsize(path)
+
+
+###############################################################################
+# Quantized GLB Preview
+###############################################################################
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+QUANTIZED_MAX = 65535
+
+
+def write_quantized_glb(path: str, vertices: np.ndarray, faces: np.ndarray) -> int:
+    """
+    Positions are stored as uint16 grid coordinates; the node's translation
+    and scale map them back to model units (error <= extent / 131070).
+    """
+    positions = np.asarray(vertices, dtype=np.float64) @ Z_UP_TO_Y_UP.T
+    low = positions.min(axis=0)
+    extent = positions.max(axis=0) - low
+    extent[extent == 0] = 1.0
+    scale = extent / QUANTIZED_MAX
+
+    # Quantized VEC3 elements must be 4-byte aligned: pad each to 8 bytes
+    quantized = np.zeros((len(positions), 4), dtype='<u2')
+    quantized[:, :3] = np.rint((positions - low) / scale)
+    position_bytes = quantized.tobytes()
+
+    small = len(positions) <= QUANTIZED_MAX
+    index_bytes = np.asarray(faces, dtype='<u2' if small else '<u4').tobytes()
+    index_bytes += b'\0' * (-len(index_bytes) % 4)
+
+    binary = position_bytes + index_bytes
+    gltf = {
+        "asset": {"version": "2.0", "generator": "mesh_formats.py"},
+        "extensionsUsed": ["KHR_mesh_quantization"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": low.tolist(), "scale": scale.tolist()}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(position_bytes), "byteStride": 8, "target": 34962},
+            {"buffer": 0, "byteOffset": len(position_bytes), "byteLength": len(index_bytes), "target": 34963},
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": UNSIGNED_SHORT, "count": len(positions), "type": "VEC3",
+             "min": quantized[:, :3].min(axis=0).tolist(), "max": quantized[:, :3].max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": UNSIGNED_SHORT if small else UNSIGNED_INT,
+             "count": int(np.size(faces)), "type": "SCALAR"},
+        ],
+    }
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+
+    with open(path, 'wb') as fp:
+        fp.write(struct.pack('<III', glb_engine.GLB_MAGIC, 2, 28 + len(json_chunk) + len(binary)))
+        fp.write(struct.pack('<II', len(json_chunk), glb_engine.CHUNK_JSON))
+        fp.write(json_chunk)
+        fp.write(struct.pack('<II', len(binary), glb_engine.CHUNK_BIN))
+        fp.write(binary)
+    return os.path.getsize(path)
+
+
+FORMATS = {
+    'stl': {"suffix": ".stl", "content_type": "model/stl", "content_encoding": None, "writer": write_stl},
+    'stl_gzip': {"suffix": "_gz.stl", "content_type": "model/stl", "content_encoding": "gzip",
+                 "writer": write_gzip_stl},
+    '3mf': {"suffix": ".3mf", "content_type": "model/3mf", "content_encoding": None, "writer": write_3mf},
+    'glb_quantized': {"suffix": "_preview.glb", "content_type": "model/gltf-binary", "content_encoding": None,
+                      "writer": write_quantized_glb},
+}
+
+
+def parse_formats(value) -> list:
+    """Request 'formats' -> ordered, de-duplicated list of FORMATS keys. Raises ValueError."""
+    if value is None:
+        return ['stl']
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value:
+        raise ValueError("formats must be a non-empty list")
+    formats = []
+    for name in value:
+        if name not in FORMATS:
+            raise ValueError(f"Unknown format {name!r} (supported: {', '.join(FORMATS)})")
+        if name not in formats:
+            formats.append(name)
+    return formats
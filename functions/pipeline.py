@@ -0,0 +1,137 @@
+import contextvars
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+###############################################################################
+# Concurrent Stage Pipeline
+###############################################################################
+# Foreground stages (the remote Gradio calls) run on the request thread via
+# `with pipeline.stage(name):`. Side work that the next stage doesn't depend
+# on (uploads) goes to a shared executor via pipeline.submit(), so it overlaps
+# with the following stages. pipeline.gather() waits for all of it and
+# re-raises the first failure.
+#
+# report() gives per-stage wall times plus how much time the overlap saved
+# compared with running every stage back to back.
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """Process-wide executor, created on first use and reused across requests."""
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        return _executors[name]
+
+
+class StagePipeline:
+    def __init__(self, executor: ThreadPoolExecutor, clock=time.perf_counter):
+        self.executor = executor
+        self.clock = clock
+        self.start_time = clock()
+        self._lock = threading.Lock()
+        self._spans = []  # (name, kind, start, end, ok)
+        self._futures = []  # (name, future)
+        self._failure = None
+
+    def _record(self, name, kind, start, end, ok):
+        with self._lock:
+            self._spans.append((name, kind, start - self.start_time, end - self.start_time, ok))
+
+    def _fail(self, error: BaseException):
+        """Keeps the first failure and cancels background tasks that haven't started."""
+        with self._lock:
+            if self._failure is None:
+                self._failure = error
+            futures = [future for _, future in self._futures]
+        for future in futures:
+            future.cancel()
+
+    def _raise_if_failed(self):
+        with self._lock:
+            failure = self._failure
+        if failure is not None:
+            raise failure
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a blocking stage on the calling thread."""
+        self._raise_if_failed()
+        start = self.clock()
+        ok = False
+        try:
+            yield
+            ok = True
+        except Exception as e:
+            self._fail(e)
+            raise
+        finally:
+            self._record(name, 'stage', start, self.clock(), ok)
+
+    def submit(self, name: str, fn, *args, **kwargs):
+        """Runs fn in the background and returns its Future."""
+        self._raise_if_failed()
+
+        def run():
+            start = self.clock()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            except Exception as e:
+                print(f"[pipeline] Background task {name} failed:\n{traceback.format_exc()}")
+                self._fail(e)
+                raise
+            finally:
+                self._record(name, 'background', start, self.clock(), ok)
+
+        # Run in the submitter's context so request traces follow the task
+        future = self.executor.submit(contextvars.copy_context().run, run)
+        with self._lock:
+            self._futures.append((name, future))
+        return future
+
+    def gather(self, timeout=None):
+        """Waits for every background task; raises the first failure (in submit order)."""
+        with self._lock:
+            futures = [future for _, future in self._futures]
+        done, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            raise TimeoutError(f"{len(not_done)} background task(s) still running after {timeout}s")
+        for future in futures:
+            error = None if future.cancelled() else future.exception()
+            if error is not None:
+                raise error
+        # A foreground stage failed (and cancelled the rest)
+        self._raise_if_failed()
+        return [future.result() for future in futures]
+
+    def wait_all(self):
+        """Waits for background tasks without raising (for cleanup paths)."""
+        with self._lock:
+            futures = [future for _, future in self._futures]
+        wait(futures)
+
+    def report(self) -> dict:
+        with self._lock:
+            spans = list(self._spans)
+            cancelled = [name for name, future in self._futures if future.cancelled()]
+        wall_time = self.clock() - self.start_time
+        serial_time = sum(end - start for _, _, start, end, _ in spans)
+        return {
+            "wall_time": round(wall_time, 3),
+            "serial_time": round(serial_time, 3),
+            "overlap_saved": round(max(serial_time - wall_time, 0.0), 3),
+            "stages": [
+                {"name": name, "kind": kind, "start": round(start, 3),
+                 "duration": round(end - start, 3), "ok": ok}
+                for name, kind, start, end, ok in sorted(spans, key=lambda s: s[2])
+            ],
+            "cancelled": cancelled,
+        }
@@ -0,0 +1,284 @@
+import collections
+import contextvars
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import wraps
+
+import tracing
+
+###############################################################################
+# Deadlines, Retry Policies and Hedged Attempts
+###############################################################################
+# A request gets a deadline when it starts (deadline(seconds)); it follows the
+# request in a contextvar, into pipeline/batch worker threads too, so
+# downloads, Gradio calls and uploads can ask how long they have left
+# (remaining()/timeout()) instead of using fixed timeouts.
+#
+# RetryPolicy.call() retries only errors that can succeed on a second try
+# (is_retryable(): timeouts, connection errors, 408/425/429/5xx). Backoff is
+# "full jitter": a random delay up to base * 2^attempt, capped at max_delay.
+# It gives up early when the deadline wouldn't leave min_attempt_seconds for
+# another attempt after the delay.
+#
+# hedged() starts a backup attempt when the first one is slower than a
+# latency threshold (LatencyTracker: a recent-latency percentile); the first
+# success wins and the other attempt is cancelled.
+#
+# Metrics (tracing registry, labelled by operation):
+#   retry_attempts_total, retry_failed_attempts_total, retry_giveups_total,
+#   retry_deadline_giveups_total, retry_exhausted_total, retry_recovered_total,
+#   retry_wasted_total            retries made by calls that failed anyway
+#   retry_operation_seconds       whole-call latency incl. retries (p50/p90/p99)
+#   hedge_started_total, hedge_won_total
+
+# HTTP statuses worth retrying; any other 4xx will fail the same way again
+RETRYABLE_STATUS = frozenset({408, 425, 429})
+# Exception class names treated as permanent without importing their packages
+# (gradio_client: the Space itself raised, or the token was refused)
+PERMANENT_ERROR_NAMES = frozenset({'AppError', 'AuthenticationError'})
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out. Never retried."""
+
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Sets a deadline `seconds` from now for the block (an outer, earlier deadline still wins)."""
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(at, outer))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def timeout(default: float = None):
+    """A timeout for the next blocking call: the time left, at most `default`."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if default is None else min(default, left)
+
+
+def check_deadline(what: str = 'request'):
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded during {what}")
+
+
+###############################################################################
+# Error Classification
+###############################################################################
+def status_code(error):
+    """HTTP status carried by an httpx/requests/google-api-core error, if any."""
+    response = getattr(error, 'response', None)
+    code = getattr(response, 'status_code', None)
+    if code is None:
+        code = getattr(error, 'code', None)
+    return code if isinstance(code, int) and 100 <= code < 600 else None
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if type(error).__name__ in PERMANENT_ERROR_NAMES:
+        return False
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS or code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    httpx = sys.modules.get('httpx')
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    # Bugs and bad input fail the same way every time
+    if isinstance(error, (ValueError, TypeError, KeyError, AttributeError, NotImplementedError,
+                          FileNotFoundError, PermissionError)):
+        return False
+    return True
+
+
+###############################################################################
+# Retry Policy
+###############################################################################
+class RetryPolicy:
+    def __init__(self, name: str, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 min_attempt_seconds: float = 1.0, giveup=(), classify=is_retryable,
+                 rng=random.random, sleep=time.sleep, clock=time.monotonic):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_attempt_seconds = min_attempt_seconds
+        self.giveup = tuple(giveup)
+        self.classify = classify
+        self.rng = rng
+        self.sleep = sleep
+        self.clock = clock
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)]."""
+        return self.rng() * min(self.max_delay, self.base_delay * (2 ** attempt))
+
+    def retryable(self, error) -> bool:
+        return not isinstance(error, self.giveup) and self.classify(error)
+
+    def call(self, fn, *args, **kwargs):
+        name = self.name
+        start = self.clock()
+        retries = 0
+        outcome = 'error'
+        try:
+            for attempt in range(self.max_attempts):
+                tracing.count('retry_attempts_total', operation=name)
+                try:
+                    result = fn(*args, **kwargs)
+                    outcome = 'ok'
+                    if retries:
+                        tracing.count('retry_recovered_total', operation=name)
+                    return result
+                except Exception as e:
+                    if not self.retryable(e):
+                        print(f"[retries] Not retrying {name}: {type(e).__name__}: {e}")
+                        tracing.count('retry_giveups_total', operation=name)
+                        raise
+                    tracing.count('retry_failed_attempts_total', operation=name)
+                    print(f"[retries] {name} attempt {attempt + 1} of {self.max_attempts} failed: "
+                          f"{type(e).__name__}: {e}")
+                    if attempt == self.max_attempts - 1:
+                        print(f"[retries] All {self.max_attempts} attempts failed for {name}")
+                        tracing.count('retry_exhausted_total', operation=name)
+                        raise
+                    delay = self.backoff(attempt)
+                    left = remaining()
+                    if left is not None and left - delay < self.min_attempt_seconds:
+                        print(f"[retries] Giving up on {name}: {max(left, 0):.1f}s left before the deadline")
+                        tracing.count('retry_deadline_giveups_total', operation=name)
+                        raise
+                    print(f"[retries] Retrying {name} in {delay:.2f}s")
+                    self.sleep(delay)
+                    retries += 1
+        finally:
+            if outcome != 'ok' and retries:
+                tracing.count('retry_wasted_total', retries, operation=name)
+            tracing.observe('retry_operation_seconds', self.clock() - start, operation=name, outcome=outcome)
+
+
+def retry(policy: RetryPolicy):
+    """Decorator form of policy.call()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return policy.call(fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+###############################################################################
+# Hedged Attempts
+###############################################################################
+class LatencyTracker:
+    """Recent latencies of one operation; threshold() is the hedge delay."""
+
+    def __init__(self, quantile: float = 0.95, window: int = 200, min_samples: int = 20,
+                 default: float = 10.0, floor: float = 0.5, ceiling: float = 120.0):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.default = default
+        self.floor = floor
+        self.ceiling = ceiling
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def threshold(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return self.default
+        value = samples[min(int(len(samples) * self.quantile), len(samples) - 1)]
+        return min(max(value, self.floor), self.ceiling)
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='hedge')
+    return _hedge_executor
+
+
+def hedged(attempt, hedge_after: float, name: str, on_loser=None):
+    """
+    Runs attempt(index, cancel) and, if it hasn't finished after hedge_after
+    seconds, a second attempt(1, cancel) alongside it. Returns the first
+    successful result; the other attempt's cancel event is set and
+    on_loser(index) runs once it has stopped. Raises the last error if
+    both fail, DeadlineExceeded if the deadline passes first.
+    """
+    executor = _get_hedge_executor()
+    cancels = []
+    futures = []
+
+    def launch():
+        cancel = threading.Event()
+        cancels.append(cancel)
+        futures.append(executor.submit(contextvars.copy_context().run, attempt, len(futures), cancel))
+
+    def stop_others(winner):
+        for index, future in enumerate(futures):
+            if future is not winner:
+                cancels[index].set()
+                if on_loser is not None:
+                    future.add_done_callback(lambda _, index=index: on_loser(index))
+
+    launch()
+    left = remaining()
+    first_wait = hedge_after if left is None else max(min(hedge_after, left), 0)
+    done, _ = wait(futures, timeout=first_wait)
+    if not done and (left is None or left > hedge_after + 1.0):
+        print(f"[retries] {name} slower than {hedge_after:.2f}s, starting a hedged attempt")
+        tracing.count('hedge_started_total', operation=name)
+        launch()
+
+    pending = set(futures)
+    error = None
+    while pending:
+        left = remaining()
+        done, pending = wait(pending, timeout=None if left is None else max(left, 0),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            stop_others(None)
+            raise DeadlineExceeded(f"Deadline exceeded during {name}")
+        for future in sorted(done, key=futures.index):
+            if future.exception() is None:
+                if futures.index(future) > 0:
+                    tracing.count('hedge_won_total', operation=name)
+                stop_others(future)
+                return future.result()
+            error = future.exception()
+    raise error
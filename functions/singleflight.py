@@ -0,0 +1,169 @@
+import hashlib
+import json
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+###############################################################################
+# Single-flight Dedup and Result Index
+###############################################################################
+# Identical requests (same input content + parameters) should cost one run:
+#  - SingleFlight: concurrent callers with the same key wait on the leader's
+#    run and share its result (or its exception)
+#  - ResultIndex: completed results are kept for `ttl` seconds in an LRU of
+#    `max_entries`, optionally backed by JSON index blobs in the bucket so
+#    other instances can reuse them too
+#  - Deduplicator ties both together and counts cached/coalesced/fresh runs
+# Failures are never cached.
+
+
+def request_key(content_hash: str, params: dict) -> str:
+    payload = json.dumps({"content": content_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn):
+        """Returns (result, shared). shared is True when another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class ResultIndex:
+    def __init__(self, ttl=86400.0, max_entries=512, get_bucket=None, prefix=None, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.get_bucket = get_bucket
+        self.prefix = prefix
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+
+    def _fresh(self, stored_at) -> bool:
+        return not self.ttl or self.clock() - stored_at <= self.ttl
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                if self._fresh(item[0]):
+                    self._entries.move_to_end(key)
+                    return item[1]
+                del self._entries[key]
+
+        if self.get_bucket is None:
+            return None
+        try:
+            blob = self.get_bucket().blob(f"{self.prefix}/{key}.json")
+            if not blob.exists():
+                return None
+            entry = json.loads(blob.download_as_bytes())
+            if not self._fresh(entry['stored_at']):
+                return None
+            self._remember(key, entry['stored_at'], entry['value'])
+            return entry['value']
+        except Exception as e:
+            print(f"[singleflight] Index lookup failed for {key}: {e}")
+            return None
+
+    def _remember(self, key, stored_at, value):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, value):
+        stored_at = self.clock()
+        self._remember(key, stored_at, value)
+        if self.get_bucket is None:
+            return
+        try:
+            blob = self.get_bucket().blob(f"{self.prefix}/{key}.json")
+            blob.upload_from_string(json.dumps({"stored_at": stored_at, "value": value}),
+                                    content_type='application/json')
+        except Exception as e:
+            print(f"[singleflight] Index store failed for {key}: {e}")
+            print(f"Error traceback: {traceback.format_exc()}")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Deduplicator:
+    def __init__(self, index: ResultIndex, flight: SingleFlight = None):
+        self.index = index
+        self.flight = flight or SingleFlight()
+        self._lock = threading.Lock()
+        self.counters = {"cached": 0, "coalesced": 0, "fresh": 0, "failed": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def run(self, key: str, fn):
+        """Returns (result, source) with source in 'cached', 'coalesced', 'fresh'."""
+        cached = self.index.get(key)
+        if cached is not None:
+            self._count("cached")
+            return cached, 'cached'
+
+        def leader():
+            result = fn()
+            self.index.put(key, result)
+            return result
+
+        try:
+            result, shared = self.flight.do(key, leader)
+        except Exception:
+            self._count("failed")
+            raise
+        source = 'coalesced' if shared else 'fresh'
+        self._count(source)
+        return result, source
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["in_flight"] = self.flight.in_flight()
+        stats["indexed"] = len(self.index)
+        return stats
@@ -0,0 +1,111 @@
+import importlib
+import json
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+# The functions source is a flat set of modules, imported the way main.py does;
+# the benchmark corpus generator doubles as a GLB writer for tests.
+# main.py itself is imported through the `main` fixture, with the Firebase
+# Functions SDK and gradio_client replaced by the stubs below
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (FUNCTIONS_DIR, os.path.join(FUNCTIONS_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import glb_corpus  # noqa: E402
+
+
+def cube_mesh(size=1.0):
+    """Closed cube from 0 to size: 8 vertices, 12 triangles wound counter-clockwise from outside."""
+    vertices = np.array([[x, y, z] for x in (0, size) for y in (0, size) for z in (0, size)], dtype=np.float64)
+    faces = np.array([
+        [0, 1, 3], [0, 3, 2],  # x = 0
+        [4, 6, 7], [4, 7, 5],  # x = size
+        [0, 4, 5], [0, 5, 1],  # y = 0
+        [2, 3, 7], [2, 7, 6],  # y = size
+        [0, 2, 6], [0, 6, 4],  # z = 0
+        [1, 5, 7], [1, 7, 3],  # z = size
+    ], dtype=np.int64)
+    return vertices, faces
+
+
+def sphere_mesh(subdivisions=3, radius=1.0):
+    """Icosphere: closed, manifold, outward-wound; 20 * 4**subdivisions triangles."""
+    t = (1 + 5 ** 0.5) / 2
+    vertices = np.array([[-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0], [0, -1, t], [0, 1, t],
+                         [0, -1, -t], [0, 1, -t], [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]], dtype=np.float64)
+    faces = np.array([[0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11], [1, 5, 9], [5, 11, 4],
+                      [11, 10, 2], [10, 7, 6], [7, 1, 8], [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8],
+                      [3, 8, 9], [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]], dtype=np.int64)
+    for _ in range(subdivisions):
+        # One new vertex per edge, shared by both faces on it
+        edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+        unique_edges, edge_ids = np.unique(edges, axis=0, return_inverse=True)
+        midpoints = len(vertices) + edge_ids.reshape(-1, 3)
+        vertices = np.vstack([vertices, vertices[unique_edges].mean(axis=1)])
+        a, b, c = faces.T
+        ab, bc, ca = midpoints.T
+        faces = np.concatenate([np.stack(f, axis=1) for f in ([a, ab, ca], [b, bc, ab], [c, ca, bc], [ab, bc, ca])])
+    vertices *= radius / np.linalg.norm(vertices, axis=1, keepdims=True)
+    return vertices, faces
+
+
+@pytest.fixture
+def write_glb(tmp_path):
+    """write_glb(meshes, nodes=None, roots=None, name='model.glb') -> path of a GLB written by glb_corpus."""
+    def write(meshes, nodes=None, roots=None, name='model.glb'):
+        meshes = [(np.asarray(v, dtype=np.float32), np.asarray(f, dtype=np.uint32)) for v, f in meshes]
+        nodes = nodes or [{"mesh": i} for i in range(len(meshes))]
+        path = str(tmp_path / name)
+        glb_corpus.write_glb(path, meshes, nodes, roots if roots is not None else list(range(len(nodes))))
+        return path
+
+    return write
+
+
+class FakeResponse:
+    """https_fn.Response as the endpoints use it."""
+
+    def __init__(self, response=None, status=200, headers=None, mimetype=None, content_type=None):
+        self.response = response
+        self.status_code = status
+        self.headers = headers or {}
+        self.mimetype = mimetype
+
+    def get_json(self):
+        return json.loads(self.response)
+
+
+def firebase_functions_stub():
+    module = types.ModuleType('firebase_functions')
+    module.https_fn = types.SimpleNamespace(
+        on_request=lambda **kwargs: (lambda fn: fn), Request=object, Response=FakeResponse)
+    module.options = types.SimpleNamespace(set_global_options=lambda **kwargs: None)
+    return module
+
+
+def gradio_client_stub():
+    module = types.ModuleType('gradio_client')
+
+    def no_client(*args, **kwargs):
+        raise RuntimeError('tests pass their own Gradio client')
+
+    module.Client = no_client
+    module.handle_file = lambda path: path
+    return module
+
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    """main.py imported fresh against stubbed SDKs, storing into a LocalBucket under tmp_path."""
+    monkeypatch.setitem(sys.modules, 'firebase_functions', firebase_functions_stub())
+    monkeypatch.setitem(sys.modules, 'gradio_client', gradio_client_stub())
+    monkeypatch.setenv('LOCAL_STORAGE_DIR', str(tmp_path / 'bucket'))
+    monkeypatch.delitem(sys.modules, 'main', raising=False)
+    module = importlib.import_module('main')
+    yield module
+    sys.modules.pop('main', None)
@@ -0,0 +1,44 @@
+"""
+Stand-in for the pooled Blender worker (main.py's BLENDER_WORKER_SCRIPT run
+with `blender --background --python-expr`): speaks blender_pool.py's
+JSON-lines job protocol through serve_jobs, and reports progress through
+blender_channel, without Blender. Copies input to output; options make it
+misbehave:
+  noise    print N log lines first
+  chatty   keep printing for N seconds (output but no progress)
+  hang     sleep without output
+  crash    exit mid-job
+  fail     raise inside the handler
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blender_channel
+import blender_pool
+
+
+def handle(input_path, output_path, options):
+    for n in range(options.get('noise', 0)):
+        print(f"noise line {n}")
+    blender_channel.progress('import', objects=1)
+    if options.get('chatty'):
+        end = time.monotonic() + options['chatty']
+        while time.monotonic() < end:
+            print("still working", flush=True)
+            time.sleep(0.05)
+    if options.get('hang'):
+        time.sleep(options['hang'])
+    if options.get('crash'):
+        os._exit(3)
+    if options.get('fail'):
+        raise ValueError("bad glb")
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        dst.write(src.read())
+    blender_channel.progress('export', bytes=os.path.getsize(output_path))
+    return {"file_size": os.path.getsize(output_path), "pid": os.getpid()}
+
+
+if __name__ == '__main__':
+    blender_pool.serve_jobs(handle)
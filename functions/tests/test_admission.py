@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+
+import admission
+
+MB = admission.MB
+# 'job' costs exactly its input size, so tests can reason in whole megabytes
+FOOTPRINTS = {'job': (0, 1.0)}
+
+
+def controller(capacity_mb=100, max_wait=5.0, **kwargs):
+    return admission.MemoryAdmission(capacity_mb * MB, max_wait=max_wait, footprints=FOOTPRINTS,
+                                     usage_probe=None, **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+def test_estimate_uses_default_input_size():
+    gate = controller()
+    assert gate.estimate('job', 10 * MB) == 10 * MB
+    assert gate.estimate('job') == admission.DEFAULT_INPUT_BYTES
+
+
+def test_reserve_and_release():
+    gate = controller()
+    with gate.reserve('job', 60 * MB) as reservation:
+        assert reservation.bytes == 60 * MB
+        assert admission.current() is reservation
+        assert gate.available() == 40 * MB
+    assert admission.current() is None
+    assert gate.reserved == 0
+    assert gate.stats()['admitted'] == 1
+
+
+def test_idle_budget_admits_oversized_request():
+    gate = controller(capacity_mb=10)
+    with gate.reserve('job', 50 * MB):
+        assert gate.reserved == 50 * MB
+    assert gate.counters['oversized'] == 1
+
+
+def test_rejects_after_max_wait():
+    gate = controller(max_wait=0.05)
+    with gate.reserve('job', 80 * MB):
+        with pytest.raises(admission.AdmissionRejected) as raised:
+            with gate.reserve('job', 40 * MB):
+                pass
+    assert raised.value.needed == 40 * MB
+    assert raised.value.available == 20 * MB
+    assert raised.value.retry_after >= 1
+    assert gate.counters['rejected'] == 1
+
+
+def test_waiters_are_served_first_come_first_served():
+    gate = controller(max_wait=None)
+    order = []
+
+    def worker(name, size_mb):
+        with gate.reserve('job', size_mb * MB):
+            order.append(name)
+
+    blocker = gate.reserve('job', 100 * MB)
+    blocker.__enter__()
+    threads = []
+    # The big request queues first; the small ones behind it must not overtake it
+    for name, size_mb in (('big', 90), ('small-1', 5), ('small-2', 5)):
+        thread = threading.Thread(target=worker, args=(name, size_mb))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: len(gate._waiting) == len(threads))
+    blocker.__exit__(None, None, None)
+    for thread in threads:
+        thread.join(5.0)
+    assert order == ['big', 'small-1', 'small-2']
+
+
+def test_shrinking_reservation_frees_bytes():
+    gate = controller()
+    with gate.reserve('job', 60 * MB) as reservation:
+        reservation.update_input(20 * MB)
+        assert reservation.bytes == 20 * MB
+        assert gate.reserved == 20 * MB
+    assert gate.counters['resized'] == 1
+
+
+def test_concurrent_growers_both_get_their_bytes():
+    # Each holds 40 MB and grows to 60 MB: holding the old bytes while waiting
+    # would leave both waiting on each other until max_wait
+    gate = controller(max_wait=2.0)
+    grown = threading.Barrier(2)
+    errors = []
+
+    def worker():
+        try:
+            with gate.reserve('job', 40 * MB) as reservation:
+                grown.wait(5.0)
+                reservation.update_input(60 * MB)
+                assert reservation.bytes == 60 * MB
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10.0)
+    assert errors == []
+    assert gate.reserved == 0
+    assert gate.counters['resized'] == 2
+
+
+def test_growing_past_budget_is_rejected():
+    gate = controller(max_wait=0.05)
+    with gate.reserve('job', 50 * MB):
+        with pytest.raises(admission.AdmissionRejected):
+            with gate.reserve('job', 10 * MB) as reservation:
+                reservation.update_input(70 * MB)
+        assert gate.reserved == 50 * MB
+
+
+def test_note_input_size_resizes_current_reservation():
+    gate = controller()
+    admission.note_input_size(10 * MB)  # no-op outside a reservation
+    with gate.reserve('job') as reservation:
+        admission.note_input_size(30 * MB)
+        assert reservation.bytes == 30 * MB
+
+
+def test_external_usage_is_taken_off_the_budget():
+    external = [70 * MB]
+    gate = controller(max_wait=None, external_usage=lambda: external[0])
+    admitted = threading.Event()
+
+    def worker():
+        with gate.reserve('job', 40 * MB):
+            admitted.set()
+
+    with gate.reserve('job', 10 * MB):
+        assert gate.available() == 20 * MB
+        assert gate.stats()['external_bytes'] == 70 * MB
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not admitted.wait(0.2)
+        # Nothing notifies waiters when external memory drops; they poll for it
+        external[0] = 10 * MB
+        assert admitted.wait(admission.EXTERNAL_POLL_SECONDS + 2.0)
+    thread.join(5.0)
+
+
+def test_failing_external_usage_counts_as_zero():
+    def broken():
+        raise OSError('no /proc')
+
+    gate = controller(external_usage=broken)
+    assert gate.available() == 100 * MB
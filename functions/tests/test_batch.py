@@ -0,0 +1,207 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import admission
+import batch
+import retries
+from conftest import cube_mesh
+
+
+class Stages:
+    """Fake stage functions; an item fails at the stage named in its 'failAt'."""
+
+    def __init__(self, convert_delay=0.0):
+        self.convert_delay = convert_delay
+        self.lock = threading.Lock()
+        self.converting = 0
+        self.max_converting = 0
+        self.converted = []
+
+    def _check(self, item, stage):
+        if item.get('failAt') == stage:
+            raise RuntimeError(f"{stage} broke for {item['designId']}")
+
+    def download(self, item, work_dir):
+        self._check(item, 'download')
+        path = os.path.join(work_dir, f"{item['designId']}.glb")
+        with open(path, 'wb') as fp:
+            fp.write(b'glb')
+        return {"path": path}
+
+    def lookup(self, item, downloaded):
+        return {"stlUrl": f"https://cache/{item['designId']}.stl", "cache": "memory"} if item.get('cached') else None
+
+    def convert(self, item, downloaded, work_dir):
+        with self.lock:
+            self.converting += 1
+            self.max_converting = max(self.max_converting, self.converting)
+        try:
+            time.sleep(self.convert_delay)
+            self._check(item, 'convert')
+            with self.lock:
+                self.converted.append(item['designId'])
+            return {"stl_path": downloaded['path'] + '.stl'}
+        finally:
+            with self.lock:
+                self.converting -= 1
+
+    def upload(self, item, downloaded, converted):
+        self._check(item, 'upload')
+        return {"stlUrl": f"https://bucket/{item['designId']}.stl", "cache": "miss"}
+
+    def runner(self, **kwargs):
+        return batch.BatchRunner(download=self.download, lookup=self.lookup, convert=self.convert,
+                                 upload=self.upload, **kwargs)
+
+
+def test_items_fail_independently(tmp_path):
+    items = [{"designId": "ok1"}, {"designId": "d", "failAt": "download"}, {"designId": "c", "failAt": "convert"},
+             {"designId": "ok2"}, {"designId": "u", "failAt": "upload"}]
+    report = Stages().runner(concurrency=4).run(items, str(tmp_path))
+
+    results = {result['designId']: result for result in report['results']}
+    for design_id, stage in (('d', 'download'), ('c', 'convert'), ('u', 'upload')):
+        failed = results[design_id]
+        assert failed['success'] is False
+        assert failed['stage'] == stage
+        assert failed['error'] == f"{stage} broke for {design_id}"
+        assert 'item_time' in failed
+    for design_id in ('ok1', 'ok2'):
+        assert results[design_id]['success'] is True
+        assert results[design_id]['stlUrl'] == f"https://bucket/{design_id}.stl"
+        assert set(results[design_id]['timings']) == {'admission', 'download', 'convert', 'upload'}
+    # Timings up to the failed stage only
+    assert set(results['c']['timings']) == {'admission', 'download'}
+
+    summary = report['batch']
+    assert (summary['items'], summary['succeeded'], summary['failed'], summary['cached']) == (5, 2, 3, 0)
+    # Item directories don't outlive their items
+    assert os.listdir(tmp_path) == []
+
+
+def test_results_keep_input_order(tmp_path):
+    stages = Stages()
+    original_download = stages.download
+
+    def download(item, work_dir):
+        # Earlier items finish last
+        time.sleep(0.01 * (10 - int(item['designId'])))
+        return original_download(item, work_dir)
+
+    stages.download = download
+    items = [{"designId": str(i)} for i in range(10)]
+    report = stages.runner(concurrency=10).run(items, str(tmp_path))
+    assert [result['designId'] for result in report['results']] == [str(i) for i in range(10)]
+    assert all(result['success'] for result in report['results'])
+
+
+def test_cached_items_skip_conversion(tmp_path):
+    stages = Stages()
+    items = [{"designId": "hit", "cached": True}, {"designId": "miss"}]
+    report = stages.runner().run(items, str(tmp_path))
+    hit, miss = report['results']
+    assert hit['success'] and hit['stlUrl'] == "https://cache/hit.stl"
+    assert 'convert' not in hit['timings']
+    assert miss['stlUrl'] == "https://bucket/miss.stl"
+    assert stages.converted == ['miss']
+    assert report['batch']['cached'] == 1
+
+
+def test_conversions_are_bounded_by_the_slots(tmp_path):
+    stages = Stages(convert_delay=0.05)
+    items = [{"designId": str(i)} for i in range(8)]
+    report = stages.runner(concurrency=8, convert_slots=2).run(items, str(tmp_path))
+    assert report['batch']['succeeded'] == 8
+    assert stages.max_converting == 2
+    assert report['batch']['convert_slots'] == 2
+
+
+def test_admission_failure_is_recorded_on_the_item(tmp_path):
+    def admit(item):
+        if item['designId'] == 'big':
+            raise admission.AdmissionRejected("Not enough memory for convert", 5, 100, 0)
+        return contextlib.nullcontext()
+
+    report = Stages().runner(admit=admit).run([{"designId": "big"}, {"designId": "small"}], str(tmp_path))
+    big, small = report['results']
+    assert (big['success'], big['stage']) == (False, 'admission')
+    assert small['success'] is True
+
+
+def test_convert_item_writes_every_format(write_glb, tmp_path):
+    glb_path = write_glb([cube_mesh(10.0)])
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    converted = batch.convert_item(glb_path, str(out_dir), 'cube', ['stl', '3mf', 'stl_gzip'])
+    assert converted['engine'] == 'numpy'
+    assert converted['stats']['faces'] == 12
+    assert set(converted['files']) == {'stl', '3mf', 'stl_gzip'}
+    for written in converted['files'].values():
+        assert os.path.getsize(written['path']) == written['file_size']
+    assert converted['analysis']['watertight']
+    assert converted['analysis']['volume'] == pytest.approx(1000.0)
+
+
+###############################################################################
+# convert_glb_batch endpoint
+###############################################################################
+class FakeRequest:
+    method = 'POST'
+
+    def __init__(self, body):
+        self.body = body
+
+    def get_json(self, silent=False):
+        return self.body
+
+
+@pytest.fixture
+def batch_main(main, monkeypatch):
+    stages = Stages()
+    monkeypatch.setattr(main, 'download_batch_item', stages.download)
+    monkeypatch.setattr(main, 'lookup_batch_item', lambda item, downloaded, formats: None)
+    monkeypatch.setattr(main, 'convert_batch_item', lambda item, downloaded, work_dir, formats:
+                        stages.convert(item, downloaded, work_dir))
+    monkeypatch.setattr(main, 'upload_batch_item', lambda item, downloaded, converted, formats:
+                        stages.upload(item, downloaded, converted))
+    return main
+
+
+def test_endpoint_reports_per_item_results(batch_main):
+    items = [{"glbUrl": "https://x/a.glb", "designId": "a"},
+             {"glbUrl": "https://x/b.glb", "designId": "b", "failAt": "convert"}]
+    response = batch_main.convert_glb_batch(FakeRequest({"items": items}))
+    body = json.loads(response.response)
+    assert body['success'] is False
+    assert [result['designId'] for result in body['results']] == ['a', 'b']
+    assert body['results'][0]['success'] is True
+    assert (body['results'][1]['stage'], body['results'][1]['error']) == ('convert', 'convert broke for b')
+    assert (body['batch']['succeeded'], body['batch']['failed']) == (1, 1)
+
+
+def test_admission_wait_stops_at_the_request_deadline(batch_main, monkeypatch):
+    assert batch_main.batch_admission_wait() == batch_main.BATCH_ADMISSION_WAIT
+    with retries.deadline(2.0):
+        assert batch_main.batch_admission_wait() <= 2.0
+    with retries.deadline(-1.0):
+        assert batch_main.batch_admission_wait() == 0.0
+
+    # Memory stays taken: items queue only until the request's deadline, not for BATCH_ADMISSION_WAIT
+    controller = admission.MemoryAdmission(capacity_bytes=admission.MB, usage_probe=lambda: None)
+    monkeypatch.setattr(batch_main, '_admission', controller)
+    monkeypatch.setattr(batch_main, 'ADMISSION_ENABLED', True)
+    monkeypatch.setattr(batch_main, 'REQUEST_DEADLINE', 0.5)
+    items = [{"glbUrl": f"https://x/{i}.glb", "designId": str(i)} for i in range(3)]
+    with controller.reserve('convert', max_wait=None):
+        start = time.monotonic()
+        response = batch_main.convert_glb_batch(FakeRequest({"items": items}))
+        elapsed = time.monotonic() - start
+    assert elapsed < 5.0
+    body = json.loads(response.response)
+    assert [result['stage'] for result in body['results']] == ['admission'] * 3
+    assert body['batch']['failed'] == 3
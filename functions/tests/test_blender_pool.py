@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import blender_pool
+
+WORKER = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_blender_worker.py')]
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / 'in.glb'
+    source.write_bytes(b'glTF' + bytes(1000))
+    return str(source), str(tmp_path / 'out.stl')
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        kwargs.setdefault('job_timeout', 10.0)
+        kwargs.setdefault('startup_timeout', 10.0)
+        pool = blender_pool.BlenderWorkerPool(WORKER, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_runs_jobs_on_a_warm_worker(make_pool, files):
+    pool = make_pool()
+    first = pool.run(*files)
+    second = pool.run(*files)
+    assert first['file_size'] == 1004
+    assert first['pid'] == second['pid']
+    assert os.path.getsize(files[1]) == 1004
+    assert pool.stats()['workers_started'] == 1
+    assert pool.stats()['idle'] == 1
+    assert pool.rss_bytes() > 0
+
+
+def test_progress_events_reach_callback(make_pool, files):
+    pool = make_pool()
+    events = []
+    pool.run(*files, options={'noise': 50}, on_progress=lambda stage, data, seconds: events.append((stage, data)))
+    assert events == [('import', {'objects': 1}), ('export', {'bytes': 1004})]
+
+
+def test_job_failure_keeps_worker(make_pool, files):
+    pool = make_pool()
+    with pytest.raises(blender_pool.JobFailed) as raised:
+        pool.run(*files, options={'fail': True, 'noise': 3})
+    assert 'bad glb' in str(raised.value)
+    assert 'ValueError' in raised.value.worker_traceback
+    assert 'noise line 2' in raised.value.log_tail
+    assert raised.value.stage == 'import'
+    pid = pool.run(*files)['pid']
+    assert pool.stats()['failures'] == 1
+    assert pool.stats()['workers_started'] == 1
+    assert pid is not None
+
+
+def test_crash_is_retried_on_a_fresh_worker(make_pool, files):
+    pool = make_pool(crash_retries=1)
+    before = pool.run(*files)['pid']
+    with pytest.raises(blender_pool.WorkerCrashed) as raised:
+        pool.run(*files, options={'crash': True, 'noise': 2})
+    assert raised.value.stage == 'import'
+    assert 'noise line 1' in raised.value.log_tail
+    stats = pool.stats()
+    # The job crashed the warm worker, was retried on a new one and crashed that too
+    assert stats['crashes'] == 2
+    assert stats['workers_started'] == 2
+    assert stats['workers'] == 0
+    assert pool.run(*files)['pid'] != before
+
+
+def test_timeout_kills_the_worker(make_pool, files):
+    pool = make_pool()
+    pid = pool.run(*files)['pid']
+    start = time.monotonic()
+    with pytest.raises(blender_pool.WorkerTimeout) as raised:
+        pool.run(*files, options={'hang': 30}, timeout=1.0)
+    assert time.monotonic() - start < 5.0
+    assert not isinstance(raised.value, blender_pool.WorkerStalled)
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['workers'] == 0
+    assert pool.run(*files)['pid'] != pid
+
+
+def test_silent_worker_stalls_but_chatty_one_does_not(make_pool, files):
+    pool = make_pool(stall_timeout=0.5)
+    with pytest.raises(blender_pool.WorkerStalled) as raised:
+        pool.run(*files, options={'hang': 30})
+    assert raised.value.stage == 'import'
+    assert pool.stats()['stalls'] == 1
+    # Log output counts as liveness even without progress events
+    assert pool.run(*files, options={'chatty': 1.5})['file_size'] == 1004
+
+
+def test_worker_recycled_after_max_jobs(make_pool, files):
+    pool = make_pool(max_jobs_per_worker=2)
+    pids = [pool.run(*files)['pid'] for _ in range(4)]
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3]
+    assert pids[0] != pids[2]
+    assert pool.stats()['workers_recycled'] == 2
+
+
+def test_busy_pool_raises_pool_busy_within_timeout(make_pool, files):
+    pool = make_pool(size=1)
+    started = threading.Event()
+    holder = threading.Thread(
+        target=pool.run, args=files,
+        kwargs={'options': {'hang': 2}, 'on_progress': lambda *_: started.set()})
+    holder.start()
+    assert started.wait(10.0)
+    start = time.monotonic()
+    with pytest.raises(blender_pool.PoolBusy):
+        pool.run(*files, timeout=0.3)
+    assert time.monotonic() - start < 2.0
+    assert pool.stats()['busy'] == 1
+    holder.join(10.0)
+
+
+def test_startup_failure(make_pool, files):
+    pool = make_pool()
+    pool.command = [sys.executable, '-c', 'import sys; sys.exit(2)']
+    with pytest.raises(blender_pool.WorkerStartupError):
+        pool.run(*files)
+    # The slot was given back
+    pool.command = list(WORKER)
+    assert pool.run(*files)['file_size'] == 1004
+
+
+def test_shut_down_pool_refuses_jobs(make_pool, files):
+    pool = make_pool()
+    pool.run(*files)
+    pool.shutdown()
+    assert pool.stats()['workers'] == 0
+    with pytest.raises(blender_pool.WorkerError):
+        pool.run(*files)
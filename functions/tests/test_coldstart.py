@@ -0,0 +1,79 @@
+import os
+import sys
+import textwrap
+
+import pytest
+
+import coldstart
+from conftest import FUNCTIONS_DIR
+
+# main.py is imported in a fresh interpreter (conftest has already imported
+# numpy here), with the SDKs that aren't installed replaced by stub packages
+STUBS = {
+    'firebase_functions/__init__.py': '',
+    'firebase_functions/https_fn.py': '''
+        Request = object
+        Response = object
+
+        def on_request(**kwargs):
+            return lambda fn: fn
+    ''',
+    'firebase_functions/options.py': '''
+        def set_global_options(**kwargs):
+            pass
+    ''',
+    'gradio_client/__init__.py': '''
+        class Client:
+            def __init__(self, *args, **kwargs):
+                raise RuntimeError("gradio_client stub")
+
+        def handle_file(path):
+            return path
+    ''',
+}
+
+EAGER_CHECKED = tuple(coldstart.DEFERRED_MODULES) + ('httpx',)
+
+
+@pytest.fixture
+def stub_env(tmp_path):
+    for name, source in STUBS.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(textwrap.dedent(source))
+    return dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), FUNCTIONS_DIR]),
+                LOCAL_STORAGE_DIR=str(tmp_path / 'bucket'))
+
+
+def test_main_defers_heavy_imports(stub_env):
+    profile = coldstart.import_profile('main', cwd=FUNCTIONS_DIR, env=stub_env)
+    assert profile['ok'], profile['error']
+    assert coldstart.check_budget(profile, deferred=EAGER_CHECKED) == []
+    loaded = {module['name'] for module in profile['modules']}
+    assert 'coldstart' in loaded
+    for name in EAGER_CHECKED + ('glb_engine', 'mesh_formats'):
+        assert name not in loaded
+
+
+def test_eager_import_is_reported(stub_env, tmp_path):
+    (tmp_path / 'eager_main.py').write_text("import numpy\nimport gradio_client\n")
+    profile = coldstart.import_profile('eager_main', cwd=FUNCTIONS_DIR, env=stub_env)
+    violations = coldstart.check_budget(profile, deferred=EAGER_CHECKED)
+    assert any(v.startswith('numpy is imported at load time') for v in violations)
+    assert any(v.startswith('gradio_client is imported at load time') for v in violations)
+
+
+def test_failed_import_is_a_violation(tmp_path):
+    env = dict(os.environ, PYTHONPATH=str(tmp_path))
+    (tmp_path / 'broken_main.py').write_text("raise ImportError('no SDK')\n")
+    profile = coldstart.import_profile('broken_main', cwd=str(tmp_path), env=env, python=sys.executable)
+    assert not profile['ok']
+    [violation] = coldstart.check_budget(profile)
+    assert 'no SDK' in violation
+
+
+def test_lazy_module_imports_on_first_use():
+    module = coldstart.lazy_import('json')
+    assert 'not loaded' in repr(module)
+    assert module.dumps([1]) == '[1]'
+    assert "'json' (loaded)" in repr(module)
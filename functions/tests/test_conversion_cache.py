@@ -0,0 +1,123 @@
+import hashlib
+import json
+
+import pytest
+
+import conversion_cache
+import local_storage
+
+OPTIONS = {"pipeline_version": 2, "weld_threshold": 0.0001, "triangulation": "beauty",
+           "formats": ["stl"], "lods": []}
+STL = b'solid' + bytes(995)
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    return local_storage.LocalBucket(str(tmp_path / 'bucket'))
+
+
+@pytest.fixture
+def cache(bucket):
+    return conversion_cache.ConversionCache(lambda: bucket, local=conversion_cache.LocalLRUCache(max_entries=2))
+
+
+def upload(bucket, key, data=STL):
+    """Uploads an STL under the key's content-addressed path, as convert_glb_http does."""
+    path = conversion_cache.content_blob_base(key) + '.stl'
+    bucket.blob(path).upload_from_string(data)
+    return path
+
+
+def store(cache, bucket, key, data=STL):
+    path = upload(bucket, key, data)
+    cache.store(key, path, f'https://example.test/{path}', blob_size=len(data), engine='numpy', file_size=len(data))
+    return path
+
+
+def test_file_sha256(tmp_path, monkeypatch):
+    # Several chunks, the last one short
+    monkeypatch.setattr(conversion_cache, 'HASH_CHUNK_SIZE', 1500)
+    path = tmp_path / 'model.glb'
+    path.write_bytes(b'glTF' * 1000)
+    assert conversion_cache.file_sha256(str(path)) == hashlib.sha256(b'glTF' * 1000).hexdigest()
+
+
+def test_key_is_stable_and_follows_content_and_options():
+    key = conversion_cache.cache_key('a' * 64, OPTIONS)
+    assert key == conversion_cache.cache_key('a' * 64, dict(reversed(list(OPTIONS.items()))))
+    assert key != conversion_cache.cache_key('b' * 64, OPTIONS)
+    # Anything that changes the output changes the key: options, formats, engine/pipeline version
+    assert key != conversion_cache.cache_key('a' * 64, dict(OPTIONS, weld_threshold=0.001))
+    assert key != conversion_cache.cache_key('a' * 64, dict(OPTIONS, formats=['stl', 'stl_gzip']))
+    assert key != conversion_cache.cache_key('a' * 64, dict(OPTIONS, pipeline_version=3))
+
+
+def test_miss_then_hit(cache, bucket):
+    key = conversion_cache.cache_key('a' * 64, OPTIONS)
+    assert cache.lookup(key) == (None, 'miss')
+
+    path = store(cache, bucket, key)
+    assert path.startswith(conversion_cache.CAS_PREFIX + '/' + key + '/')
+    entry, tier = cache.lookup(key)
+    assert tier == 'local'
+    assert entry['blob_path'] == path
+    assert entry['engine'] == 'numpy'
+
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits_local'], stats['stores']) == (1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_storage_hit_fills_local_tier(bucket):
+    key = conversion_cache.cache_key('a' * 64, OPTIONS)
+    store(conversion_cache.ConversionCache(lambda: bucket), bucket, key)
+
+    # A fresh instance only has the storage index
+    cache = conversion_cache.ConversionCache(lambda: bucket, local=conversion_cache.LocalLRUCache(max_entries=2))
+    assert cache.lookup(key)[1] == 'storage'
+    assert cache.lookup(key)[1] == 'local'
+
+
+def test_local_tier_is_bounded_lru():
+    local = conversion_cache.LocalLRUCache(max_entries=2)
+    local.put('a', {"n": 1})
+    local.put('b', {"n": 2})
+    local.get('a')
+    local.put('c', {"n": 3})
+    assert len(local) == 2
+    assert local.get('b') is None
+    assert local.get('a') == {"n": 1}
+
+
+@pytest.mark.parametrize('damage', ['missing', 'partial', 'corrupt_index', 'index_without_path'])
+def test_damaged_entry_is_a_miss(bucket, damage):
+    key = conversion_cache.cache_key('a' * 64, OPTIONS)
+    path = store(conversion_cache.ConversionCache(lambda: bucket), bucket, key)
+    index = bucket.blob(f'{conversion_cache.INDEX_PREFIX}/{key}.json')
+    if damage == 'missing':
+        bucket.blob(path).delete()
+    elif damage == 'partial':
+        bucket.blob(path).upload_from_string(STL[:500])
+    elif damage == 'corrupt_index':
+        index.upload_from_string(index.download_as_bytes()[:20])
+    else:
+        index.upload_from_string(json.dumps({"url": "https://example.test/x"}))
+
+    cache = conversion_cache.ConversionCache(lambda: bucket)
+    assert cache.lookup(key) == (None, 'miss')
+    stats = cache.stats()
+    assert (stats['misses'], stats['invalid'], stats['errors']) == (1, 1, 0)
+
+    # Converting again replaces the entry
+    store(cache, bucket, key)
+    assert cache.lookup(key)[1] == 'storage'
+
+
+def test_storage_errors_are_counted_not_raised():
+    def broken_bucket():
+        raise ConnectionError('storage down')
+
+    cache = conversion_cache.ConversionCache(broken_bucket)
+    assert cache.lookup('k') == (None, 'miss')
+    cache.store('k', 'path', 'url')
+    assert cache.stats()['errors'] == 2
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import decimate
+import mesh_analysis
+from conftest import sphere_mesh
+
+
+@pytest.fixture(scope='module')
+def sphere():
+    return sphere_mesh(4)  # 5120 faces
+
+
+def grid_mesh(n=40):
+    """Open n x n square of the unit plane with a gentle bump: boundary edges everywhere on its rim."""
+    x, y = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1))
+    vertices = np.stack([x.ravel(), y.ravel(), 0.05 * np.sin(np.pi * x.ravel()) * np.sin(np.pi * y.ravel())], axis=1)
+    i = (np.arange(n)[:, None] * (n + 1) + np.arange(n)).ravel()
+    faces = np.concatenate([np.stack([i, i + 1, i + n + 2], axis=1), np.stack([i, i + n + 2, i + n + 1], axis=1)])
+    return vertices, faces
+
+
+@pytest.mark.parametrize('spec', [0.5, 0.25, 0.1, 0.02, 1000, {"targetFaces": 300}, {"ratio": 0.3}])
+def test_lod_hits_its_face_target(sphere, spec):
+    vertices, faces = sphere
+    kwargs = decimate.parse_lod_spec(spec)
+    target = kwargs.get('target_faces') or int(len(faces) * kwargs['target_ratio'])
+    lod_vertices, lod_faces, stats = decimate.decimate(vertices, faces, **kwargs)
+    assert stats['target_faces'] == target
+    # Collapses remove two faces at a time
+    assert target - 2 <= len(lod_faces) <= target
+    assert stats['faces'] == len(lod_faces)
+    assert stats['vertices'] == len(lod_vertices)
+    assert stats['input_faces'] == 5120
+
+
+@pytest.mark.parametrize('ratio', [0.5, 0.1, 0.02])
+def test_manifold_input_stays_manifold(sphere, ratio):
+    vertices, faces = sphere
+    lod_vertices, lod_faces, _ = decimate.decimate(vertices, faces, target_ratio=ratio)
+    report = mesh_analysis.analyze_mesh(lod_vertices, lod_faces)
+    assert report['watertight']
+    assert report['consistently_oriented']
+    assert report['non_manifold_edges'] == 0
+    assert report['degenerate_faces'] == 0
+    assert report['components'] == 1
+    assert report['printable']
+    # Euler characteristic of a sphere
+    assert report['vertices'] - report['edges'] + report['faces'] == 2
+
+
+def test_volume_and_error_stay_small(sphere):
+    vertices, faces = sphere
+    volume = mesh_analysis.analyze_mesh(vertices, faces)['volume']
+    lod_vertices, lod_faces, stats = decimate.decimate(vertices, faces, target_ratio=0.1)
+    assert mesh_analysis.analyze_mesh(lod_vertices, lod_faces)['volume'] == pytest.approx(volume, rel=0.02)
+    assert stats['relative_error'] < 0.01
+    assert 0.98 < stats['area_ratio'] <= 1.0
+
+
+@pytest.mark.parametrize('max_error', [0.001, 0.01])
+def test_max_error_is_respected(sphere, max_error):
+    vertices, faces = sphere
+    _, lod_faces, stats = decimate.decimate(vertices, faces, max_relative_error=max_error)
+    assert stats['relative_error'] <= max_error
+    assert len(lod_faces) < len(faces)
+
+
+def test_open_border_does_not_erode():
+    vertices, faces = grid_mesh()
+    before = mesh_analysis.analyze_mesh(vertices, faces)
+    lod_vertices, lod_faces, _ = decimate.decimate(vertices, faces, target_ratio=0.2)
+    after = mesh_analysis.analyze_mesh(lod_vertices, lod_faces)
+    assert after['non_manifold_edges'] == 0
+    assert after['consistently_oriented']
+    assert after['boundary_edges'] > 0
+    np.testing.assert_allclose(after['bbox']['min'], before['bbox']['min'], atol=1e-3)
+    np.testing.assert_allclose(after['bbox']['max'], before['bbox']['max'], atol=1e-3)
+    assert after['surface_area'] == pytest.approx(before['surface_area'], rel=0.01)
+
+
+@pytest.mark.parametrize('spec', [True, 'half', 0, -3, 2, {"ratio": 1.5}, {"maxError": 0}, {}])
+def test_invalid_lod_specs(spec):
+    with pytest.raises(ValueError):
+        decimate.parse_lod_spec(spec)
+
+
+def test_parse_lod_spec():
+    assert decimate.parse_lod_spec(0.25) == {"target_ratio": 0.25}
+    assert decimate.parse_lod_spec(5000) == {"target_faces": 5000}
+    assert decimate.parse_lod_spec({"ratio": 0.5, "maxError": 0.01}) == {
+        "target_ratio": 0.5, "max_relative_error": 0.01}
@@ -0,0 +1,168 @@
+import hashlib
+import http.server
+import re
+import threading
+
+import httpx
+import pytest
+
+import downloads
+import retries
+
+BODY = bytes(range(256)) * 4096  # 1 MiB
+CHANGED_BODY = BODY[::-1]
+
+
+class FlakyHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves BODY with Range/If-Range support. The server's `plan` decides each
+    response in turn: 'ok', 'drop' (close after half the body), 'changed'
+    (serve CHANGED_BODY from now on) or an error status. With never_validate
+    no ETag is sent.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            step = server.plan.pop(0) if server.plan else 'ok'
+            if step == 'changed':
+                server.body, server.etag = CHANGED_BODY, '"v2"'
+            server.requests.append(dict(self.headers))
+        if isinstance(step, int):
+            self.send_response(step)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body, etag = server.body, server.etag
+        start = 0
+        match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match and self.headers.get('If-Range', etag) == etag:
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        if not server.never_validate:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        if step == 'drop':
+            self.wfile.write(body[start:start + (len(body) - start) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+
+class FlakyServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-body are part of the tests
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = FlakyServer(('127.0.0.1', 0), FlakyHandler)
+    httpd.lock = threading.Lock()
+    httpd.plan = []
+    httpd.requests = []
+    httpd.body, httpd.etag = BODY, '"v1"'
+    httpd.never_validate = False
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client():
+    with httpx.Client(timeout=10.0, headers={"Accept-Encoding": "identity"}) as client:
+        yield client
+
+
+def fetch(server, client, path, attempts=5, **kwargs):
+    url = f'http://127.0.0.1:{server.server_address[1]}/model.glb'
+    download = downloads.Download(url, str(path), client=client, **kwargs)
+    # Same giveup as main.py's DOWNLOAD_RETRY
+    policy = retries.RetryPolicy('download', max_attempts=attempts, giveup=(downloads.DownloadTooLarge,),
+                                 sleep=lambda _: None)
+    policy.call(download.attempt)
+    return download
+
+
+def test_plain_download(server, client, tmp_path):
+    download = fetch(server, client, tmp_path / 'out.glb')
+    result = download.result()
+    assert result['size'] == len(BODY)
+    assert result['sha256'] == hashlib.sha256(BODY).hexdigest()
+    assert result['attempts'] == 1
+    assert (tmp_path / 'out.glb').read_bytes() == BODY
+
+
+def test_dropped_connection_resumes_with_range(server, client, tmp_path):
+    server.plan = ['drop', 'drop']
+    download = fetch(server, client, tmp_path / 'out.glb')
+    result = download.result()
+    assert result['attempts'] == 3
+    assert result['resumed_bytes'] == len(BODY) // 2 + len(BODY) * 3 // 4
+    assert result['sha256'] == hashlib.sha256(BODY).hexdigest()
+    assert (tmp_path / 'out.glb').read_bytes() == BODY
+    assert server.requests[1]['Range'] == f'bytes={len(BODY) // 2}-'
+    assert server.requests[1]['If-Range'] == '"v1"'
+
+
+def test_changed_file_is_fetched_whole_not_spliced(server, client, tmp_path):
+    server.plan = ['drop', 'changed']
+    download = fetch(server, client, tmp_path / 'out.glb')
+    result = download.result()
+    assert result['resumed_bytes'] == 0
+    assert result['sha256'] == hashlib.sha256(CHANGED_BODY).hexdigest()
+    assert (tmp_path / 'out.glb').read_bytes() == CHANGED_BODY
+    assert download.validator == '"v2"'
+
+
+def test_no_validator_restarts_from_zero(server, client, tmp_path):
+    server.never_validate = True
+    server.plan = ['drop']
+    download = fetch(server, client, tmp_path / 'out.glb')
+    assert 'Range' not in server.requests[1]
+    assert download.result()['resumed_bytes'] == 0
+    assert (tmp_path / 'out.glb').read_bytes() == BODY
+
+
+def test_weak_etag_is_not_used_for_if_range():
+    assert downloads._validator({'ETag': 'W/"v1"', 'Last-Modified': 'Tue, 01 Sep 2026 00:00:00 GMT'}) == \
+        'Tue, 01 Sep 2026 00:00:00 GMT'
+    assert downloads._validator({'ETag': '"v1"'}) == '"v1"'
+    assert downloads._validator({}) is None
+
+
+def test_server_errors_are_retried_and_not_found_is_not(server, client, tmp_path):
+    server.plan = [503, 503]
+    assert fetch(server, client, tmp_path / 'out.glb').result()['attempts'] == 3
+
+    server.plan = [404]
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch(server, client, tmp_path / 'missing.glb')
+    assert len(server.requests) == 4
+
+
+def test_max_bytes_aborts_before_body(server, client, tmp_path):
+    with pytest.raises(downloads.DownloadTooLarge):
+        fetch(server, client, tmp_path / 'out.glb', max_bytes=len(BODY) - 1)
+    assert len(server.requests) == 1
+
+
+def test_cancelled_attempt_stops(server, client, tmp_path):
+    url = f'http://127.0.0.1:{server.server_address[1]}/model.glb'
+    download = downloads.Download(url, str(tmp_path / 'out.glb'), client=client)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(downloads.DownloadCancelled):
+        download.attempt(cancel)
@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+
+import glb_engine
+import stl_writer
+from conftest import cube_mesh
+
+T = glb_engine.WELD_THRESHOLD
+
+
+def remove_doubles(vertices, faces, threshold=T):
+    """Reference remove_doubles: walk by (x + y + z, index); each unmerged vertex absorbs later ones in reach."""
+    order = np.lexsort((np.arange(len(vertices)), vertices.sum(axis=1)))
+    target = np.full(len(vertices), -1)
+    for n, i in enumerate(order):
+        if target[i] >= 0:
+            continue
+        for j in order[n + 1:]:
+            if target[j] < 0 and np.sum((vertices[i] - vertices[j]) ** 2) <= threshold * threshold:
+                target[j] = i
+    kept = target < 0
+    new_index = np.cumsum(kept) - 1
+    welded = new_index[np.where(kept, np.arange(len(vertices)), target)[faces]]
+    welded = welded[(welded[:, 0] != welded[:, 1]) & (welded[:, 1] != welded[:, 2]) & (welded[:, 0] != welded[:, 2])]
+    return vertices[kept], welded
+
+
+def weld_count(*points):
+    vertices = np.array(points, dtype=np.float64)
+    return len(glb_engine.weld_vertices(vertices, np.array([[0, 1, 2]]))[0])
+
+
+def test_weld_merges_close_vertices_across_cell_boundaries():
+    # 0.14 threshold apart, straddling a cell boundary on x and a half-cell boundary on y
+    a = np.array([T * 0.99999, T * 1.4999, T * 0.3])
+    assert weld_count(a, a + [T * 0.1, T * 0.1, 0.0], [1.0, 1.0, 1.0]) == 2
+    a = np.array([T * 7.0, T * 0.5, T * 0.5])
+    assert weld_count(a - [T * 0.45, 0, 0], a + [T * 0.45, 0, 0], [1.0, 1.0, 1.0]) == 2
+
+
+def test_weld_keeps_vertices_further_apart_than_threshold():
+    # Opposite corners of one rounding cell, 1.7 thresholds apart
+    assert weld_count([T * 9.51] * 3, [T * 10.49] * 3, [1.0, 1.0, 1.0]) == 3
+    assert weld_count([0, 0, 0], [1.01 * T, 0, 0], [1.0, 1.0, 1.0]) == 3
+
+
+def test_weld_is_not_transitive():
+    # Like remove_doubles: the first vertex absorbs the second, and the third is out of its reach
+    vertices = np.array([[0, 0, 0], [0.8 * T, 0, 0], [1.6 * T, 0, 0], [1.0, 1.0, 1.0]])
+    welded, _ = glb_engine.weld_vertices(vertices, np.array([[0, 1, 3], [1, 2, 3]]))
+    np.testing.assert_array_equal(welded, vertices[[0, 2, 3]])
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_weld_matches_reference_remove_doubles(seed):
+    rng = np.random.default_rng(seed)
+    vertices = rng.random((300, 3)) * 4 * T
+    if seed % 2:
+        # Snapped to a quarter-threshold lattice: exact duplicates and ties in walk order
+        vertices = np.round(vertices / (T / 4)) * (T / 4)
+    faces = rng.integers(0, len(vertices), (200, 3))
+    welded, welded_faces = glb_engine.weld_vertices(vertices, faces)
+    expected, expected_faces = remove_doubles(vertices, faces)
+    np.testing.assert_array_equal(welded, expected)
+    np.testing.assert_array_equal(welded_faces, expected_faces)
+
+
+def test_weld_restores_unwelded_cube():
+    vertices, faces = cube_mesh()
+    unwelded = vertices[faces].reshape(-1, 3) + np.random.default_rng(0).normal(0, T / 10, (36, 3))
+    welded, welded_faces = glb_engine.weld_vertices(unwelded, np.arange(36).reshape(-1, 3))
+    assert len(welded) == 8
+    assert len(welded_faces) == 12
+
+
+def test_weld_drops_faces_that_collapse():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [T / 2, 0, 0], [0, 0, 1]], dtype=np.float64)
+    faces = np.array([
+        [0, 1, 2],  # kept
+        [0, 3, 4],  # 3 welds onto 0: collapses
+        [0, 0, 2],  # already degenerate
+        [1, 2, 4],  # kept
+    ])
+    welded, welded_faces = glb_engine.weld_vertices(vertices, faces)
+    assert len(welded) == 4
+    np.testing.assert_array_equal(welded_faces, [[0, 1, 2], [1, 2, 3]])
+
+
+def test_read_accessor_with_zero_count():
+    gltf = {"accessors": [{"componentType": 5126, "type": "VEC3", "count": 0, "bufferView": 0}],
+            "bufferViews": [{"buffer": 0, "byteLength": 0}], "buffers": [{"byteLength": 0}]}
+    assert glb_engine.read_accessor(gltf, memoryview(b''), 0).shape == (0, 3)
+
+
+def outward_normals(vertices, faces):
+    """What Blender's normals_make_consistent(inside=False) leaves on a convex mesh."""
+    centroids = vertices[faces].mean(axis=1)
+    normals = np.cross(vertices[faces[:, 1]] - vertices[faces[:, 0]], vertices[faces[:, 2]] - vertices[faces[:, 0]])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    flip = np.einsum('ij,ij->i', normals, centroids - vertices.mean(axis=0)) < 0
+    normals[flip] *= -1
+    return normals
+
+
+class FakeCollection:
+    def __init__(self, **arrays):
+        self.arrays = arrays
+
+    def __len__(self):
+        return len(next(iter(self.arrays.values())))
+
+    def foreach_get(self, name, out):
+        out[:] = np.asarray(self.arrays[name], dtype=out.dtype).reshape(-1)
+
+
+class FakeBlenderObject:
+    """Just enough of a bpy mesh object for stl_writer.write_blender_object."""
+
+    def __init__(self, vertices, faces, normals):
+        self.matrix_world = np.eye(4)
+        self.data = self
+        self.vertices = FakeCollection(co=vertices)
+        self.loop_triangles = FakeCollection(vertices=faces, normal=normals)
+
+    def calc_loop_triangles(self):
+        pass
+
+
+def stl_records(path):
+    with open(path, 'rb') as fp:
+        fp.seek(84)
+        records = np.fromfile(fp, dtype=stl_writer.STL_RECORD)
+    # Order-independent: sort faces by centroid
+    order = np.lexsort(np.round(records['vertices'].mean(axis=1), 5).T[::-1])
+    return records[order]
+
+
+@pytest.mark.parametrize('variant', ['plain', 'inverted', 'mirrored', 'unwelded'])
+def test_normals_match_blender_path(variant, write_glb, tmp_path):
+    vertices, faces = cube_mesh(2.0)
+    nodes = None
+    if variant == 'inverted':
+        faces = faces[:, ::-1]
+    elif variant == 'mirrored':
+        nodes = [{"mesh": 0, "scale": [-1.0, 1.0, 1.0]}]
+    elif variant == 'unwelded':
+        vertices, faces = vertices[faces].reshape(-1, 3), np.arange(36).reshape(-1, 3)
+    glb = write_glb([(vertices, faces)], nodes)
+
+    engine_stl = str(tmp_path / 'engine.stl')
+    stats = glb_engine.convert_glb_to_stl(glb, engine_stl)
+    assert stats['faces'] == 12
+    assert stats['vertices'] == 8
+
+    # The Blender path writes the welded mesh with Blender's outward normals
+    mesh_vertices, mesh_faces = glb_engine.load_glb_mesh(glb)
+    mesh_vertices, mesh_faces = glb_engine.weld_vertices(mesh_vertices, mesh_faces)
+    blender_stl = str(tmp_path / 'blender.stl')
+    stl_writer.write_blender_object(blender_stl, FakeBlenderObject(
+        mesh_vertices, mesh_faces, outward_normals(mesh_vertices, mesh_faces)))
+
+    engine, blender = stl_records(engine_stl), stl_records(blender_stl)
+    np.testing.assert_allclose(engine['normal'], blender['normal'], atol=1e-6)
+    # Winding agrees with the normal (right-hand rule), as Blender's does
+    tris = engine['vertices'].astype(np.float64)
+    winding = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    assert (np.einsum('ij,ij->i', winding, engine['normal']) > 0).all()
@@ -0,0 +1,224 @@
+import concurrent.futures
+import itertools
+import threading
+import time
+
+import pytest
+
+import gradio_pool
+
+
+class FakeJob:
+    def __init__(self, value, delay):
+        self.value = value
+        self.cancelled = False
+        self._done = threading.Event()
+        timer = threading.Timer(delay, self._done.set)
+        timer.daemon = True
+        timer.start()
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise concurrent.futures.TimeoutError()
+        return self.value
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeClient:
+    """A gradio Client for the TRELLIS Space: sessions can fail to start, jobs take `delay`."""
+    ids = itertools.count()
+
+    def __init__(self, session_failures=0, delay=0.0):
+        self.id = next(self.ids)
+        self.session_failures = session_failures
+        self.delay = delay
+        self.sessions = 0
+        self.jobs = []
+
+    def start_session(self):
+        if self.session_failures:
+            self.session_failures -= 1
+            raise ConnectionError('space is starting')
+        self.sessions += 1
+
+    def submit(self, api_name, **kwargs):
+        self.jobs.append(FakeJob(f'{api_name} on {self.id}', self.delay))
+        return self.jobs[-1]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def make_pool():
+    def make(size=2, clients=None, **kwargs):
+        created = []
+
+        def factory():
+            client = clients.pop(0) if clients else FakeClient()
+            created.append(client)
+            return client
+
+        pool = gradio_pool.GradioClientPool(factory, start_session=FakeClient.start_session, size=size, **kwargs)
+        pool.created = created
+        return pool
+
+    return make
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+def test_borrowed_clients_are_reused(make_pool):
+    pool = make_pool(size=1)
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        pass
+    assert first is second
+    assert first.sessions == 1
+    stats = pool.stats()
+    assert (stats['created'], stats['borrowed'], stats['warm_hits'], stats['cold_creates']) == (1, 2, 1, 1)
+
+
+def test_prewarm_fills_the_pool_and_borrow_waits_for_it(make_pool):
+    pool = make_pool(size=2)
+    pool.prewarm()
+    with pool.borrow():
+        wait_for(lambda: pool.stats()['idle'] == 1)
+    assert pool.stats()['cold_creates'] == 0
+    assert pool.stats()['idle'] == 2
+
+
+def test_client_is_discarded_after_an_error(make_pool):
+    pool = make_pool(size=1)
+    with pytest.raises(ValueError):
+        with pool.borrow() as broken:
+            raise ValueError('/image_to_3d failed')
+    # Replaced in the background, never handed out again
+    wait_for(lambda: pool.stats()['idle'] == 1)
+    with pool.borrow() as client:
+        assert client is not broken
+    assert pool.stats()['discarded_errors'] == 1
+    assert len(pool.created) == 2
+
+
+def test_pool_never_keeps_more_than_size_clients(make_pool):
+    pool = make_pool(size=2)
+    entries = [pool.acquire() for _ in range(3)]
+    # The third was a cold create while the pool was exhausted; it isn't kept
+    assert len({id(entry.client) for entry in entries}) == 3
+    for entry in entries:
+        pool.release(entry)
+    stats = pool.stats()
+    assert (stats['idle'], stats['in_use'], stats['created']) == (2, 0, 3)
+
+
+def test_session_readiness_is_polled_with_backoff(make_pool):
+    clock = FakeClock()
+    pool = make_pool(size=1, clients=[FakeClient(session_failures=3)], clock=clock, sleep=clock.sleep,
+                     ready_poll=0.25, ready_timeout=30.0)
+    with pool.borrow() as client:
+        assert client.sessions == 1
+    # 0.25 + 0.5 + 1.0 of backoff instead of a fixed sleep
+    assert clock.now == pytest.approx(1001.75)
+
+
+def test_client_whose_session_never_starts_is_not_handed_out(make_pool):
+    clock = FakeClock()
+    pool = make_pool(size=1, clients=[FakeClient(session_failures=100)], clock=clock, sleep=clock.sleep,
+                     ready_timeout=5.0)
+    with pytest.raises(gradio_pool.SessionNotReady):
+        pool.acquire()
+    assert pool.stats()['not_ready'] == 1
+    assert pool.stats()['in_use'] == 0
+
+
+def test_idle_clients_expire_and_are_health_checked(make_pool):
+    clock = FakeClock()
+    checks = []
+    pool = make_pool(size=1, clock=clock, sleep=clock.sleep, max_idle=600.0, health_check_after=120.0)
+    pool.health_check = checks.append
+    with pool.borrow() as first:
+        pass
+    clock.now += 200
+    with pool.borrow() as client:
+        assert client is first
+    assert checks == [first]
+    clock.now += 700
+    with pool.borrow() as client:
+        assert client is not first
+    assert pool.stats()['discarded_idle'] == 1
+
+
+###############################################################################
+# Hedged calls
+###############################################################################
+def call(client, cancel):
+    """Like main.call_gradio with a cancel event."""
+    job = client.submit(api_name='/preprocess_image')
+    while True:
+        try:
+            return job.result(timeout=0.02)
+        except concurrent.futures.TimeoutError:
+            if cancel.is_set():
+                job.cancel()
+                raise gradio_pool.CallCancelled('cancelled')
+
+
+def test_slow_call_is_hedged_on_an_idle_client_and_then_cancelled(make_pool):
+    slow, fast = FakeClient(delay=5.0), FakeClient(delay=0.05)
+    pool = make_pool(size=2, clients=[slow, fast])
+    start = time.monotonic()
+    entry = pool.acquire()
+    wait_for(lambda: pool.stats()['idle'] == 1)
+
+    result = pool.hedged(entry.client, call, 0.2, 'test_preprocess')
+    assert result == f'/preprocess_image on {fast.id}'
+    assert 0.2 <= time.monotonic() - start < 2.0
+    # The slow attempt is cancelled and its client stays usable; the spare goes back to the pool
+    wait_for(lambda: slow.jobs[0].cancelled)
+    assert not fast.jobs[0].cancelled
+    pool.release(entry)
+    stats = pool.stats()
+    assert (stats['hedges'], stats['idle'], stats['discarded_errors']) == (1, 2, 0)
+
+
+def test_fast_call_is_not_hedged(make_pool):
+    client = FakeClient(delay=0.01)
+    pool = make_pool(size=2)
+    pool.prewarm()
+    wait_for(lambda: pool.stats()['idle'] == 2)
+    assert pool.hedged(client, call, 0.5, 'test_preprocess') == f'/preprocess_image on {client.id}'
+    assert pool.stats()['hedges'] == 0
+
+
+def test_hedge_without_an_idle_client_waits_for_the_first_call(make_pool):
+    client = FakeClient(delay=0.3)
+    pool = make_pool(size=1)
+    assert pool.hedged(client, call, 0.05, 'test_preprocess') == f'/preprocess_image on {client.id}'
+    stats = pool.stats()
+    assert (stats['hedges'], stats['hedges_skipped'], stats['created']) == (0, 1, 0)
+
+
+def test_call_gradio_cancels_the_job(main):
+    client = FakeClient(delay=5.0)
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    with pytest.raises(gradio_pool.CallCancelled):
+        main.call_gradio(client, cancel=cancel, api_name='/preprocess_image')
+    assert client.jobs[0].cancelled
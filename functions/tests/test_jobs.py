@@ -0,0 +1,272 @@
+import json
+import threading
+import time
+import types
+
+import pytest
+
+import jobs
+import retries
+
+
+def wait_for_status(store, job_id, statuses, timeout=5.0):
+    end = time.monotonic() + timeout
+    while True:
+        job = store.get(job_id)
+        if job['status'] in statuses:
+            return job
+        assert time.monotonic() < end, f"job stuck in {job['status']}"
+        time.sleep(0.01)
+
+
+class Steps:
+    """job_fn that reports two stages, each released by the test."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.started = threading.Event()
+        self.release = [threading.Event(), threading.Event()]
+
+    def __call__(self, job_id, request, progress):
+        self.started.set()
+        self.release[0].wait(5.0)
+        progress('preprocess', {"preprocessed_url": "https://x/pre.png"})
+        self.release[1].wait(5.0)
+        if self.error is not None:
+            raise self.error
+        return {"glb_urls": ["https://x/model.glb"], "image": request['image_url']}
+
+    def finish(self):
+        for event in self.release:
+            event.set()
+
+
+@pytest.fixture
+def store():
+    return jobs.InMemoryJobStore()
+
+
+def test_job_goes_from_queued_to_running_to_succeeded(store):
+    steps = Steps()
+    runner = jobs.JobRunner(store, steps, max_workers=1, deadline=900)
+    job = runner.submit({"image_url": "https://x/in.png"})
+    assert job['status'] == jobs.QUEUED
+
+    assert steps.started.wait(5.0)
+    running = store.get(job['id'])
+    assert running['status'] == jobs.RUNNING
+    assert running['deadline'] == pytest.approx(running['started'] + 900)
+
+    steps.release[0].set()
+    job_after_stage = wait_for_status(store, job['id'], [jobs.RUNNING])
+    steps.release[1].set()
+    done = wait_for_status(store, job['id'], jobs.TERMINAL_STATES)
+    assert done['status'] == jobs.SUCCEEDED
+    assert done['result'] == {"glb_urls": ["https://x/model.glb"], "image": "https://x/in.png"}
+    assert 'preprocess' in done['stages']
+    assert done['version'] > job_after_stage['version']
+    assert runner.stats()['pending'] == 0
+
+
+def test_stage_urls_show_up_before_the_job_finishes(store):
+    steps = Steps()
+    runner = jobs.JobRunner(store, steps, max_workers=1)
+    job_id = runner.submit({"image_url": "https://x/in.png"})['id']
+    steps.release[0].set()
+    end = time.monotonic() + 5.0
+    while store.get(job_id)['result'] is None:
+        assert time.monotonic() < end
+        time.sleep(0.01)
+    job = store.get(job_id)
+    assert job['status'] == jobs.RUNNING
+    assert job['result'] == {"preprocessed_url": "https://x/pre.png"}
+    assert 'deadline' not in job
+    steps.finish()
+    wait_for_status(store, job_id, jobs.TERMINAL_STATES)
+
+
+def test_failed_job_records_the_error(store):
+    steps = Steps(error=ValueError('bad image'))
+    steps.finish()
+    runner = jobs.JobRunner(store, steps, max_workers=1)
+    job = wait_for_status(store, runner.submit({"image_url": "u"})['id'], jobs.TERMINAL_STATES)
+    assert job['status'] == jobs.FAILED
+    assert job['error'] == 'bad image'
+    assert 'preprocess' in job['stages']
+
+
+def test_queue_is_bounded(store):
+    steps = Steps()
+    runner = jobs.JobRunner(store, steps, max_workers=1, max_queued=2)
+    runner.submit({"image_url": "1"})
+    runner.submit({"image_url": "2"})
+    with pytest.raises(jobs.QueueFull):
+        runner.submit({"image_url": "3"})
+    steps.finish()
+
+
+def test_unknown_job(store):
+    with pytest.raises(jobs.JobNotFound):
+        store.get('nope')
+    with pytest.raises(jobs.JobNotFound):
+        store.update('nope', {"status": jobs.RUNNING})
+
+
+def test_jobs_expire_after_ttl():
+    store = jobs.InMemoryJobStore(ttl=0.05)
+    job = jobs.new_job({})
+    store.create(job)
+    time.sleep(0.1)
+    store.create(jobs.new_job({}))
+    with pytest.raises(jobs.JobNotFound):
+        store.get(job['id'])
+
+
+def parse_events(frames):
+    events = []
+    for frame in frames:
+        if frame.startswith(':'):
+            events.append(('keep-alive', None))
+            continue
+        lines = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_event_stream_follows_the_job_in_order(store):
+    steps = Steps()
+    runner = jobs.JobRunner(store, steps, max_workers=1)
+    job_id = runner.submit({"image_url": "u"})['id']
+    frames = []
+    reader = threading.Thread(target=lambda: frames.extend(jobs.job_events(store, job_id, heartbeat=0.05)))
+    reader.start()
+    time.sleep(0.2)
+    steps.release[0].set()
+    time.sleep(0.2)
+    steps.release[1].set()
+    reader.join(5.0)
+    assert not reader.is_alive()
+
+    events = parse_events(frames)
+    assert ('keep-alive', None) in events
+    updates = [(name, job) for name, job in events if name != 'keep-alive']
+    # Every update once, oldest first, ending with a single 'done'
+    versions = [job['version'] for _, job in updates]
+    assert versions == sorted(set(versions))
+    assert [name for name, _ in updates][-1] == 'done'
+    assert all(name == 'progress' for name, _ in updates[:-1])
+    assert updates[-1][1]['status'] == jobs.SUCCEEDED
+    statuses = [job['status'] for _, job in updates]
+    assert statuses.index(jobs.RUNNING) < statuses.index(jobs.SUCCEEDED)
+    assert any('preprocess' in job['stages'] and job['status'] == jobs.RUNNING for _, job in updates)
+
+
+def test_event_stream_stops_at_max_duration(store):
+    job = jobs.new_job({})
+    store.create(job)
+    frames = list(jobs.job_events(store, job['id'], heartbeat=0.05, max_duration=0.2))
+    assert parse_events(frames)[0][0] == 'progress'
+    assert set(name for name, _ in parse_events(frames)[1:]) == {'keep-alive'}
+
+
+###############################################################################
+# process_3d_jobs endpoint (in-memory store)
+###############################################################################
+class FakeRequest:
+    def __init__(self, method='GET', path='/', body=None):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.args = {}
+
+    def get_json(self, silent=False):
+        return self.body
+
+
+@pytest.fixture
+def endpoint(main, monkeypatch):
+    monkeypatch.setattr(main, 'JOB_STORE', 'memory')
+    gate = threading.Event()
+
+    def generate_3d(image_url, user_id, temp_files, on_progress=None, admission_wait=None):
+        on_progress('preprocess', {"preprocessed_url": "https://x/pre.png"})
+        # Waits like a Gradio call would: until released or the job deadline
+        while not gate.wait(0.01):
+            retries.check_deadline('generate_3d')
+        if image_url.endswith('bad.png'):
+            raise ValueError('bad image')
+        return {"glb_urls": ["https://x/model.glb"], "video_url": "https://x/v.mp4",
+                "preprocessed_url": "https://x/pre.png", "timestamp": 1, "source": "fresh"}
+
+    monkeypatch.setattr(main, 'generate_3d', generate_3d)
+
+    def call(method='GET', path='/', body=None):
+        response = main.process_3d_jobs(FakeRequest(method, path, body))
+        if isinstance(response.response, str):
+            return response.status_code, json.loads(response.response), response.headers
+        return response.status_code, response.response, response.headers
+
+    return types.SimpleNamespace(call=call, gate=gate, main=main)
+
+
+def test_endpoint_submit_poll_and_result(endpoint):
+    status, body, _ = endpoint.call('POST', '/', {"image_url": "https://x/in.png", "userId": "alice"})
+    assert status == 202
+    assert body['deadlineSeconds'] == endpoint.main.JOB_DEADLINE
+    job_id = body['jobId']
+
+    store = endpoint.main.get_job_runner().store
+    wait_for_status(store, job_id, [jobs.RUNNING])
+    status, body, headers = endpoint.call(path=f'/{job_id}/result')
+    assert status == 202
+    assert headers['Retry-After'] == '5'
+    assert body['deadline'] == pytest.approx(time.time() + endpoint.main.JOB_DEADLINE, abs=5)
+
+    status, body, _ = endpoint.call(path=f'/{job_id}')
+    assert (status, body['status'], body['request']['userId']) == (200, jobs.RUNNING, 'alice')
+
+    endpoint.gate.set()
+    wait_for_status(store, job_id, jobs.TERMINAL_STATES)
+    status, body, _ = endpoint.call(path=f'/{job_id}/result')
+    assert status == 200
+    assert body['success'] is True
+    assert body['glb_urls'] == ["https://x/model.glb"]
+    assert 'trace' in body
+
+
+def test_endpoint_failed_job(endpoint):
+    endpoint.gate.set()
+    _, body, _ = endpoint.call('POST', '/', {"image_url": "https://x/bad.png"})
+    wait_for_status(endpoint.main.get_job_runner().store, body['jobId'], jobs.TERMINAL_STATES)
+    status, body, _ = endpoint.call(path=f"/{body['jobId']}/result")
+    assert (status, body['error']) == (500, 'bad image')
+
+
+def test_endpoint_job_fails_at_its_deadline(endpoint, monkeypatch):
+    monkeypatch.setattr(endpoint.main, 'JOB_DEADLINE', 0.3)
+    _, body, _ = endpoint.call('POST', '/', {"image_url": "https://x/in.png"})
+    start = time.monotonic()
+    job = wait_for_status(endpoint.main.get_job_runner().store, body['jobId'], jobs.TERMINAL_STATES)
+    assert time.monotonic() - start < 3.0
+    assert job['status'] == jobs.FAILED
+    assert 'Deadline exceeded' in job['error']
+    assert job['deadline'] == pytest.approx(job['started'] + 0.3)
+
+
+def test_endpoint_unknown_job_and_bad_requests(endpoint):
+    assert endpoint.call(path='/0123abcd')[0:2] == (404, {"error": "Unknown job"})
+    assert endpoint.call(path='/0123abcd/result')[0] == 404
+    assert endpoint.call(path='/0123abcd/events')[0] == 404
+    assert endpoint.call('POST', '/', {})[0] == 400
+    assert endpoint.call('DELETE', '/0123abcd')[0] == 404
+
+
+def test_endpoint_events(endpoint):
+    endpoint.gate.set()
+    _, body, _ = endpoint.call('POST', '/', {"image_url": "https://x/in.png"})
+    status, frames, headers = endpoint.call(path=f"/{body['jobId']}/events")
+    assert status == 200
+    assert headers['Content-Type'] == 'text/event-stream'
+    events = [(name, job) for name, job in parse_events(frames) if name != 'keep-alive']
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['status'] == jobs.SUCCEEDED
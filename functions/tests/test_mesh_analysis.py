@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import mesh_analysis
+from conftest import cube_mesh, sphere_mesh
+
+
+def test_unit_cube():
+    report = mesh_analysis.analyze_mesh(*cube_mesh(1.0))
+    assert report['watertight']
+    assert report['consistently_oriented']
+    assert report['printable']
+    assert report['issues'] == []
+    assert report['volume'] == pytest.approx(1.0)
+    assert report['signed_volume'] == pytest.approx(1.0)
+    assert report['surface_area'] == pytest.approx(6.0)
+    assert report['bbox'] == {"min": [0.0, 0.0, 0.0], "max": [1.0, 1.0, 1.0], "size": [1.0, 1.0, 1.0]}
+    assert (report['vertices'], report['faces'], report['edges']) == (8, 12, 18)
+    assert (report['boundary_edges'], report['non_manifold_edges'], report['degenerate_faces']) == (0, 0, 0)
+    assert report['components'] == 1
+
+
+def test_volume_does_not_depend_on_position():
+    vertices, faces = cube_mesh(2.0)
+    report = mesh_analysis.analyze_mesh(vertices + [1000.0, -50.0, 3.0], faces)
+    assert report['volume'] == pytest.approx(8.0)
+    assert report['bbox']['min'] == [1000.0, -50.0, 3.0]
+
+
+def test_sphere_volume_and_area():
+    report = mesh_analysis.analyze_mesh(*sphere_mesh(4))
+    assert report['watertight']
+    assert report['volume'] == pytest.approx(4 / 3 * np.pi, rel=0.01)
+    assert report['surface_area'] == pytest.approx(4 * np.pi, rel=0.01)
+
+
+def test_inverted_cube_has_negative_volume():
+    vertices, faces = cube_mesh()
+    report = mesh_analysis.analyze_mesh(vertices, faces[:, ::-1])
+    assert report['watertight']
+    assert report['signed_volume'] == pytest.approx(-1.0)
+    assert report['volume'] == pytest.approx(1.0)
+    assert not report['printable']
+    assert "normals point inwards (negative volume)" in report['issues']
+
+
+def test_open_cube():
+    vertices, faces = cube_mesh()
+    report = mesh_analysis.analyze_mesh(vertices, faces[2:])
+    assert not report['watertight']
+    assert report['boundary_edges'] == 4
+    assert not report['printable']
+
+
+def test_flipped_face_is_inconsistent():
+    vertices, faces = cube_mesh()
+    faces = faces.copy()
+    faces[0] = faces[0, ::-1]
+    report = mesh_analysis.analyze_mesh(vertices, faces)
+    assert report['watertight']
+    assert report['inconsistent_edges'] == 3
+    assert not report['consistently_oriented']
+
+
+def test_shells_degenerate_faces_and_non_manifold_edges():
+    vertices, faces = cube_mesh()
+    two = np.vstack([vertices, vertices + 3.0]), np.vstack([faces, faces + 8])
+    report = mesh_analysis.analyze_mesh(*two)
+    assert report['components'] == 2
+    assert report['largest_component_faces'] == 12
+    assert report['volume'] == pytest.approx(2.0)
+
+    # A repeated corner, and a zero-area sliver along an edge
+    extra = np.array([[0, 0, 1], [0, 4, 4]])
+    sliver = np.vstack([vertices, [[0.0, 0.5, 0.0]]])
+    report = mesh_analysis.analyze_mesh(sliver, np.vstack([faces, extra, [[0, 8, 2]]]))
+    assert report['degenerate_faces'] == 3
+
+    # A third face on the cube's edge 0-1
+    fin = np.vstack([vertices, [[-1.0, 0.0, 0.5]]])
+    report = mesh_analysis.analyze_mesh(fin, np.vstack([faces, [[0, 1, 8]]]))
+    assert report['non_manifold_edges'] == 1
+    assert not report['watertight']
+
+
+def test_chunked_sums_match(monkeypatch):
+    vertices, faces = sphere_mesh(3)
+    whole = mesh_analysis.analyze_mesh(vertices, faces)
+    monkeypatch.setattr(mesh_analysis, 'CHUNK_FACES', 100)
+    chunked = mesh_analysis.analyze_mesh(vertices, faces)
+    assert chunked['volume'] == whole['volume']
+    assert chunked['surface_area'] == whole['surface_area']
+
+
+def test_empty_mesh():
+    report = mesh_analysis.analyze_mesh(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64))
+    assert report['faces'] == 0
+    assert not report['watertight']
+    assert report['issues'] == ["mesh has no faces"]
@@ -0,0 +1,157 @@
+import gzip
+import json
+import struct
+import xml.etree.ElementTree as ET
+import zipfile
+
+import numpy as np
+import pytest
+
+import glb_engine
+import mesh_formats
+import stl_writer
+from conftest import sphere_mesh
+
+CORE = '{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}'
+
+
+@pytest.fixture(scope='module')
+def mesh():
+    vertices, faces = sphere_mesh(3)
+    # Off-centre and non-uniform, so every axis quantizes differently
+    return vertices * [40.0, 12.5, 3.0] + [100.0, -20.0, 7.25], faces
+
+
+def read_stl(path):
+    with open(path, 'rb') as fp:
+        header = fp.read(80)
+        count, = struct.unpack('<I', fp.read(4))
+        records = np.fromfile(fp, dtype=stl_writer.STL_RECORD)
+    assert len(records) == count
+    return header, records
+
+
+def test_stl_round_trip(mesh, tmp_path):
+    vertices, faces = mesh
+    path = str(tmp_path / 'model.stl')
+    size = mesh_formats.write_stl(path, vertices, faces)
+    assert size == 84 + 50 * len(faces)
+    header, records = read_stl(path)
+    assert header.startswith(glb_engine.STL_HEADER[:20])
+    np.testing.assert_allclose(records['vertices'], vertices[faces].astype(np.float32), rtol=0, atol=1e-5)
+
+
+def test_gzip_stl_decompresses_to_the_plain_stl(mesh, tmp_path, monkeypatch):
+    vertices, faces = mesh
+    monkeypatch.setattr(mesh_formats, 'CHUNK_ROWS', 100)
+    plain, packed = str(tmp_path / 'model.stl'), str(tmp_path / 'model_gz.stl')
+    mesh_formats.write_stl(plain, vertices, faces)
+    size = mesh_formats.write_gzip_stl(packed, vertices, faces)
+    with open(plain, 'rb') as fp:
+        expected = fp.read()
+    with open(packed, 'rb') as fp:
+        compressed = fp.read()
+    assert len(compressed) == size < len(expected)
+    assert gzip.decompress(compressed) == expected
+    # mtime=0: the same mesh always gives the same bytes (stable cache entries)
+    mesh_formats.write_gzip_stl(packed, vertices, faces)
+    with open(packed, 'rb') as fp:
+        assert fp.read() == compressed
+
+
+def test_3mf_package_and_model(mesh, tmp_path, monkeypatch):
+    vertices, faces = mesh
+    monkeypatch.setattr(mesh_formats, 'CHUNK_ROWS', 100)  # several chunks per section
+    path = str(tmp_path / 'model.3mf')
+    size = mesh_formats.write_3mf(path, vertices, faces)
+
+    with zipfile.ZipFile(path) as package:
+        assert package.testzip() is None
+        assert set(package.namelist()) == {'[Content_Types].xml', '_rels/.rels', '3D/3dmodel.model'}
+        assert package.getinfo('3D/3dmodel.model').compress_type == zipfile.ZIP_DEFLATED
+        types = ET.fromstring(package.read('[Content_Types].xml'))
+        rels = ET.fromstring(package.read('_rels/.rels'))
+        model = ET.fromstring(package.read('3D/3dmodel.model'))
+    assert size > 0
+
+    extensions = {d.get('Extension'): d.get('ContentType') for d in types}
+    assert extensions['model'] == 'application/vnd.ms-package.3dmanufacturing-3dmodel+xml'
+    assert [r.get('Target') for r in rels] == ['/3D/3dmodel.model']
+
+    assert model.get('unit') == 'millimeter'
+    xml_vertices = np.array([[float(v.get(axis)) for axis in 'xyz'] for v in model.iter(f'{CORE}vertex')])
+    xml_faces = np.array([[int(t.get(k)) for k in ('v1', 'v2', 'v3')] for t in model.iter(f'{CORE}triangle')])
+    # %.7g: seven significant digits
+    np.testing.assert_allclose(xml_vertices, vertices, rtol=1e-6)
+    np.testing.assert_array_equal(xml_faces, faces)
+    assert [item.get('objectid') for item in model.iter(f'{CORE}item')] == ['1']
+
+
+def quantization_bound(vertices):
+    """Per-axis bound from write_quantized_glb's docstring, in the model's Z-up axes."""
+    extent = np.ptp(vertices, axis=0)
+    return extent / (2 * mesh_formats.QUANTIZED_MAX) * (1 + 1e-5) + 1e-9
+
+
+def test_quantized_glb_stays_within_its_error_bound(mesh, tmp_path):
+    vertices, faces = mesh
+    path = str(tmp_path / 'preview.glb')
+    mesh_formats.write_quantized_glb(path, vertices, faces)
+
+    loaded_vertices, loaded_faces = glb_engine.load_glb_mesh(path)
+    np.testing.assert_array_equal(loaded_faces, faces)
+    error = np.abs(loaded_vertices - vertices).max(axis=0)
+    assert (error <= quantization_bound(vertices)).all()
+
+    loaded_low, loaded_high = loaded_vertices.min(axis=0), loaded_vertices.max(axis=0)
+    np.testing.assert_allclose(loaded_low, vertices.min(axis=0), atol=quantization_bound(vertices).max())
+    np.testing.assert_allclose(loaded_high, vertices.max(axis=0), atol=quantization_bound(vertices).max())
+
+
+def test_quantized_glb_layout(mesh, tmp_path):
+    vertices, faces = mesh
+    path = str(tmp_path / 'preview.glb')
+    size = mesh_formats.write_quantized_glb(path, vertices, faces)
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    magic, version, length = struct.unpack_from('<III', data)
+    assert (magic, version, length) == (glb_engine.GLB_MAGIC, 2, size)
+    json_length, chunk_type = struct.unpack_from('<II', data, 12)
+    assert chunk_type == glb_engine.CHUNK_JSON
+    assert json_length % 4 == 0
+    gltf = json.loads(data[20:20 + json_length])
+    assert gltf['extensionsRequired'] == ['KHR_mesh_quantization']
+    position, indices = gltf['accessors']
+    assert position['componentType'] == mesh_formats.UNSIGNED_SHORT
+    assert indices['componentType'] == mesh_formats.UNSIGNED_SHORT
+    assert gltf['bufferViews'][0]['byteStride'] == 8
+    # 8 bytes per vertex and 2 per index instead of 12 and 4
+    assert size < 12 * len(vertices) + 4 * faces.size
+
+
+def test_quantized_glb_with_32_bit_indices(tmp_path):
+    rng = np.random.default_rng(0)
+    vertices = rng.random((mesh_formats.QUANTIZED_MAX + 10, 3)) * [5.0, 1.0, 2.0]
+    faces = np.stack([np.arange(0, len(vertices) - 2, 3) + k for k in range(3)], axis=1)
+    path = str(tmp_path / 'big.glb')
+    mesh_formats.write_quantized_glb(path, vertices, faces)
+    loaded_vertices, loaded_faces = glb_engine.load_glb_mesh(path)
+    np.testing.assert_array_equal(loaded_faces, faces)
+    assert (np.abs(loaded_vertices - vertices).max(axis=0) <= quantization_bound(vertices)).all()
+
+
+def test_flat_mesh_quantizes(tmp_path):
+    vertices = np.array([[0, 0, 1], [1, 0, 1], [0, 1, 1]], dtype=np.float64)
+    path = str(tmp_path / 'flat.glb')
+    mesh_formats.write_quantized_glb(path, vertices, np.array([[0, 1, 2]]))
+    loaded_vertices, _ = glb_engine.load_glb_mesh(path)
+    np.testing.assert_allclose(loaded_vertices, vertices, atol=1e-4)
+
+
+def test_parse_formats():
+    assert mesh_formats.parse_formats(None) == ['stl']
+    assert mesh_formats.parse_formats('3mf') == ['3mf']
+    assert mesh_formats.parse_formats(['stl_gzip', 'stl', 'stl_gzip']) == ['stl_gzip', 'stl']
+    for bad in ([], 'obj', ['stl', 'fbx'], {"stl": True}):
+        with pytest.raises(ValueError):
+            mesh_formats.parse_formats(bad)
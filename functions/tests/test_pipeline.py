@@ -0,0 +1,217 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import local_storage
+import pipeline
+
+DELAY = 0.2
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def slow(value, delay=DELAY, error=None):
+    time.sleep(delay)
+    if error is not None:
+        raise error
+    return value
+
+
+def test_background_work_overlaps_the_next_stage(executor):
+    stages = pipeline.StagePipeline(executor)
+    with stages.stage('first'):
+        time.sleep(DELAY)
+    stages.submit('upload_first', slow, 'a')
+    with stages.stage('second'):
+        time.sleep(DELAY)
+    assert stages.gather() == ['a']
+
+    report = stages.report()
+    assert [s['name'] for s in report['stages']] == ['first', 'upload_first', 'second']
+    assert all(s['ok'] for s in report['stages'])
+    assert report['overlap_saved'] >= DELAY / 2
+    assert report['cancelled'] == []
+
+
+def test_gather_raises_the_first_failure_in_submit_order():
+    stages = pipeline.StagePipeline(ThreadPoolExecutor(max_workers=2))
+    stages.submit('a', slow, 'a', delay=DELAY, error=ValueError('a failed'))
+    stages.submit('b', slow, 'b', delay=0.0, error=KeyError('b'))
+    with pytest.raises(ValueError, match='a failed'):
+        stages.gather()
+
+
+def test_failed_stage_cancels_queued_work(executor):
+    stages = pipeline.StagePipeline(executor)
+    running = stages.submit('upload_0', slow, 0)
+    queued = [stages.submit(f'upload_{n}', slow, n) for n in (1, 2)]
+    with pytest.raises(ValueError):
+        with stages.stage('generate'):
+            raise ValueError('generation failed')
+    assert all(future.cancelled() for future in queued)
+    stages.wait_all()
+    assert running.result() == 0
+
+    report = stages.report()
+    assert report['cancelled'] == ['upload_1', 'upload_2']
+    assert [(s['name'], s['ok']) for s in report['stages']] == [('upload_0', True), ('generate', False)]
+    # Nothing new starts, and gather reports the stage's failure
+    with pytest.raises(ValueError, match='generation failed'):
+        stages.submit('upload_3', slow, 3)
+    with pytest.raises(ValueError, match='generation failed'):
+        stages.gather()
+
+
+def test_failed_background_task_stops_the_next_stage(executor):
+    stages = pipeline.StagePipeline(executor)
+    stages.submit('upload', slow, None, delay=0.0, error=ValueError('upload failed'))
+    stages.wait_all()
+    started = []
+    with pytest.raises(ValueError, match='upload failed'):
+        with stages.stage('generate'):
+            started.append('generate')
+    assert started == []
+
+
+def test_gather_timeout(executor):
+    stages = pipeline.StagePipeline(executor)
+    stages.submit('upload', slow, 'a', delay=1.0)
+    with pytest.raises(TimeoutError):
+        stages.gather(timeout=0.05)
+    stages.wait_all()
+
+
+###############################################################################
+# run_3d_pipeline with a fake Gradio client and a slow local bucket
+###############################################################################
+class FakeGradioClient:
+    """Answers the three TRELLIS endpoints after a delay, with files under tmp_path."""
+
+    def __init__(self, tmp_path, glbs=2, fail=None):
+        self.tmp_path = tmp_path
+        self.glbs = glbs
+        self.fail = fail
+        self.calls = []
+
+    def _file(self, name):
+        path = self.tmp_path / name
+        path.write_bytes(name.encode() * 100)
+        return str(path)
+
+    def predict(self, api_name, **kwargs):
+        self.calls.append(api_name)
+        time.sleep(DELAY)
+        if api_name == self.fail:
+            raise ValueError(f"{api_name} failed")
+        if api_name == '/preprocess_image':
+            return self._file('preprocessed.png')
+        if api_name == '/image_to_3d':
+            return {'video': self._file('preview.mp4')}
+        return [self._file(f'model_{n}.glb') for n in range(self.glbs)]
+
+
+class SlowBucket(local_storage.LocalBucket):
+    """LocalBucket whose uploads take DELAY; names containing `fail` fail straight away."""
+
+    def __init__(self, root, fail=None):
+        super().__init__(root)
+        self.fail = fail
+        self.uploads = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def blob(self, name):
+        blob = super().blob(name)
+        upload = blob.upload_from_filename
+
+        def slow_upload(filename, **kwargs):
+            with self._lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            try:
+                if self.fail and self.fail in name:
+                    raise ValueError(f"upload of {name} failed")
+                time.sleep(DELAY)
+                upload(filename, **kwargs)
+                self.uploads.append(name)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        blob.upload_from_filename = slow_upload
+        return blob
+
+
+@pytest.fixture
+def run(main, tmp_path, monkeypatch):
+    def run(client, bucket_fail=None):
+        bucket = SlowBucket(str(tmp_path / 'bucket'), fail=bucket_fail)
+        monkeypatch.setattr(main, 'get_bucket', lambda: bucket)
+        image = tmp_path / 'image.png'
+        image.write_bytes(b'png' * 100)
+        stages = pipeline.StagePipeline(ThreadPoolExecutor(max_workers=4))
+        events = []
+        try:
+            result = main.run_3d_pipeline(client, stages, str(image), 'user', 1, [],
+                                          lambda stage, **data: events.append((stage, sorted(data))))
+        finally:
+            run.bucket, run.events = bucket, events
+        return result
+
+    return run
+
+
+def test_run_3d_pipeline_overlaps_uploads(run, tmp_path):
+    client = FakeGradioClient(tmp_path, glbs=3)
+    result = run(client)
+
+    assert client.calls == ['/preprocess_image', '/image_to_3d', '/extract_glb']
+    assert result['preprocessed_url'].endswith('processed/user/1/preprocessed.png')
+    assert result['video_url'].endswith('processed/user/1/preview.mp4')
+    assert [url.rsplit('/', 1)[1] for url in result['glb_urls']] == ['model_0.glb', 'model_1.glb', 'model_2.glb']
+    assert sorted(run.bucket.uploads) == sorted(
+        ['processed/user/1/preprocessed.png', 'processed/user/1/preview.mp4'] +
+        [f'processed/user/1/model_{n}.glb' for n in range(3)])
+    # Stage results arrive in pipeline order, the GLBs once they're all uploaded
+    assert run.events == [('preprocess', ['preprocessed_url']), ('generate_3d', ['video_url']),
+                          ('extract_glb', ['glb_urls'])]
+
+    names = [s['name'] for s in result['timings']['stages']]
+    assert names.index('upload_preprocessed') < names.index('generate_3d') < names.index('upload_video')
+    assert run.bucket.max_active >= 3  # the GLBs upload in parallel
+    assert result['timings']['overlap_saved'] > DELAY
+
+
+@pytest.mark.parametrize('stage', ['/preprocess_image', '/image_to_3d', '/extract_glb'])
+def test_run_3d_pipeline_propagates_gradio_failures(run, tmp_path, stage):
+    client = FakeGradioClient(tmp_path, fail=stage)
+    with pytest.raises(ValueError, match=f'{stage} failed'):
+        run(client)
+    # Nothing after the failed stage ran, and every upload already started has finished
+    assert client.calls[-1] == stage
+    assert run.bucket.active == 0
+
+
+@pytest.mark.parametrize('upload', ['preprocessed', 'preview', 'model_1'])
+def test_run_3d_pipeline_propagates_upload_failures(run, tmp_path, upload):
+    client = FakeGradioClient(tmp_path)
+    with pytest.raises(ValueError, match=f'upload of .*{upload}.* failed'):
+        run(client, bucket_fail=upload)
+    assert run.bucket.active == 0
+
+
+def test_failed_upload_cancels_the_rest_of_the_pipeline(run, tmp_path):
+    # The preprocessed upload fails while /image_to_3d runs: GLB extraction never starts
+    client = FakeGradioClient(tmp_path)
+    with pytest.raises(ValueError, match='preprocessed'):
+        run(client, bucket_fail='preprocessed')
+    assert client.calls == ['/preprocess_image', '/image_to_3d']
+    assert 'processed/user/1/preview.mp4' not in run.bucket.uploads
@@ -0,0 +1,165 @@
+import time
+
+import pytest
+
+import retries
+
+
+class HttpError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.code = status
+
+
+class Flaky:
+    """Raises each error in turn, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def policy(**kwargs):
+    sleeps = []
+    kwargs.setdefault('rng', lambda: 1.0)
+    return retries.RetryPolicy('test', sleep=sleeps.append, **kwargs), sleeps
+
+
+def test_no_deadline_means_no_timeout():
+    assert retries.remaining() is None
+    assert retries.timeout() is None
+    assert retries.timeout(30.0) == 30.0
+    retries.check_deadline()
+
+
+def test_timeout_is_capped_by_deadline():
+    with retries.deadline(5.0):
+        assert 4.0 < retries.remaining() <= 5.0
+        assert retries.timeout(2.0) == 2.0
+        assert 4.0 < retries.timeout(60.0) <= 5.0
+        assert 4.0 < retries.timeout() <= 5.0
+    assert retries.remaining() is None
+
+
+def test_inner_deadline_cannot_extend_outer():
+    with retries.deadline(1.0):
+        with retries.deadline(60.0):
+            assert retries.remaining() <= 1.0
+        with retries.deadline(0.5):
+            assert retries.remaining() <= 0.5
+
+
+def test_expired_deadline_raises():
+    with retries.deadline(0.0):
+        with pytest.raises(retries.DeadlineExceeded):
+            retries.timeout(10.0)
+        with pytest.raises(retries.DeadlineExceeded, match='upload'):
+            retries.check_deadline('upload')
+
+
+@pytest.mark.parametrize('error, expected', [
+    (retries.DeadlineExceeded(), False),
+    (TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (HttpError(503), True),
+    (HttpError(429), True),
+    (HttpError(404), False),
+    (ValueError('bad glb'), False),
+    (FileNotFoundError(), False),
+    (type('AppError', (Exception,), {})(), False),
+    (RuntimeError('unknown'), True),
+])
+def test_is_retryable(error, expected):
+    assert retries.is_retryable(error) is expected
+
+
+def test_retries_until_success():
+    retry_policy, sleeps = policy(max_attempts=3, base_delay=1.0)
+    fn = Flaky(HttpError(503), ConnectionError())
+    assert retry_policy.call(fn) == 'ok'
+    assert fn.calls == 3
+    # Full jitter with rng() == 1: base * 2^attempt
+    assert sleeps == [1.0, 2.0]
+
+
+def test_backoff_is_capped():
+    retry_policy, _ = policy(base_delay=1.0, max_delay=5.0)
+    assert retry_policy.backoff(10) == 5.0
+
+
+def test_permanent_error_is_not_retried():
+    retry_policy, sleeps = policy(max_attempts=5)
+    fn = Flaky(HttpError(404))
+    with pytest.raises(HttpError):
+        retry_policy.call(fn)
+    assert fn.calls == 1
+    assert sleeps == []
+
+
+def test_exhausted_attempts_raise_last_error():
+    retry_policy, sleeps = policy(max_attempts=2, base_delay=0.1)
+    fn = Flaky(TimeoutError('first'), TimeoutError('second'), TimeoutError('third'))
+    with pytest.raises(TimeoutError, match='second'):
+        retry_policy.call(fn)
+    assert fn.calls == 2
+    assert len(sleeps) == 1
+
+
+def test_gives_up_when_deadline_leaves_no_room_for_another_attempt():
+    retry_policy, sleeps = policy(max_attempts=5, base_delay=2.0, min_attempt_seconds=1.0)
+    fn = Flaky(TimeoutError(), TimeoutError())
+    with retries.deadline(2.5):
+        # 2.5s left - 2s delay < 1s minimum: no retry
+        with pytest.raises(TimeoutError):
+            retry_policy.call(fn)
+    assert fn.calls == 1
+    assert sleeps == []
+
+
+def test_retries_while_deadline_allows():
+    retry_policy, sleeps = policy(max_attempts=5, base_delay=0.5, min_attempt_seconds=1.0)
+    fn = Flaky(TimeoutError())
+    with retries.deadline(30.0):
+        assert retry_policy.call(fn) == 'ok'
+    assert sleeps == [0.5]
+
+
+def test_deadline_exceeded_inside_attempt_is_not_retried():
+    retry_policy, sleeps = policy(max_attempts=5)
+    fn = Flaky(retries.DeadlineExceeded('download'))
+    with pytest.raises(retries.DeadlineExceeded):
+        retry_policy.call(fn)
+    assert fn.calls == 1
+
+
+def test_hedged_second_attempt_wins_when_first_is_slow():
+    def attempt(index, cancel):
+        if index == 0:
+            cancel.wait(5.0)
+            raise TimeoutError('cancelled')
+        return 'backup'
+
+    losers = []
+    assert retries.hedged(attempt, 0.05, 'test', on_loser=losers.append) == 'backup'
+    deadline = time.monotonic() + 5.0
+    while not losers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert losers == [0]
+
+
+def test_hedged_stops_at_deadline():
+    def attempt(index, cancel):
+        cancel.wait(5.0)
+        raise TimeoutError('cancelled')
+
+    start = time.monotonic()
+    with retries.deadline(0.3):
+        with pytest.raises(retries.DeadlineExceeded):
+            retries.hedged(attempt, 10.0, 'test')
+    assert time.monotonic() - start < 2.0
@@ -0,0 +1,173 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytest
+
+import local_storage
+import singleflight
+
+
+class Counter:
+    """fn() for SingleFlight/Deduplicator: counts runs, holds each one open for `delay`."""
+
+    def __init__(self, delay=0.2, error=None):
+        self.delay = delay
+        self.error = error
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.runs += 1
+            run = self.runs
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"run": run}
+
+
+def run_concurrently(n, fn):
+    """Calls fn() from n threads at once; returns each call's result or exception."""
+    barrier = threading.Barrier(n)
+
+    def call():
+        barrier.wait()
+        try:
+            return fn()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(lambda _: call(), range(n)))
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = singleflight.SingleFlight()
+    work = Counter()
+    results = run_concurrently(8, lambda: flight.do('key', work))
+    assert work.runs == 1
+    assert all(result == {"run": 1} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_run_separately():
+    flight = singleflight.SingleFlight()
+    work = Counter()
+    run_concurrently(4, lambda: flight.do(threading.current_thread().name, work))
+    assert work.runs == 4
+
+
+def test_leader_exception_reaches_every_follower():
+    flight = singleflight.SingleFlight()
+    work = Counter(error=ValueError('generation failed'))
+    results = run_concurrently(6, lambda: flight.do('key', work))
+    assert work.runs == 1
+    assert all(isinstance(result, ValueError) and str(result) == 'generation failed' for result in results)
+    # Failures aren't remembered: the next call runs again
+    work.error = None
+    assert flight.do('key', work) == ({"run": 2}, False)
+
+
+def test_request_key():
+    params = {"seed": 0, "steps": 12}
+    key = singleflight.request_key('a' * 64, params)
+    assert key == singleflight.request_key('a' * 64, {"steps": 12, "seed": 0})
+    assert key != singleflight.request_key('b' * 64, params)
+    assert key != singleflight.request_key('a' * 64, dict(params, seed=1))
+
+
+def test_deduplicator_sources_and_ttl(tmp_path):
+    now = [1000.0]
+    bucket = local_storage.LocalBucket(str(tmp_path))
+    index = singleflight.ResultIndex(ttl=60, max_entries=4, get_bucket=lambda: bucket, prefix='processed/_index',
+                                     clock=lambda: now[0])
+    dedup = singleflight.Deduplicator(index)
+    work = Counter(delay=0.1)
+
+    results = run_concurrently(3, lambda: dedup.run('key', work))
+    assert sorted(source for _, source in results) == ['coalesced', 'coalesced', 'fresh']
+    assert dedup.run('key', work) == ({"run": 1}, 'cached')
+
+    # Another instance finds it through the bucket index until it expires
+    other = singleflight.Deduplicator(singleflight.ResultIndex(
+        ttl=60, get_bucket=lambda: bucket, prefix='processed/_index', clock=lambda: now[0]))
+    assert other.run('key', work) == ({"run": 1}, 'cached')
+    now[0] += 61
+    assert dedup.run('key', work) == ({"run": 2}, 'fresh')
+    assert work.runs == 2
+    assert dedup.stats() == {"cached": 1, "coalesced": 2, "fresh": 2, "failed": 0, "in_flight": 0, "indexed": 1}
+
+
+def test_deduplicator_does_not_cache_failures():
+    dedup = singleflight.Deduplicator(singleflight.ResultIndex())
+    work = Counter(delay=0.0, error=ValueError('bad image'))
+    with pytest.raises(ValueError):
+        dedup.run('key', work)
+    work.error = None
+    assert dedup.run('key', work) == ({"run": 2}, 'fresh')
+    assert dedup.stats()['failed'] == 1
+
+
+###############################################################################
+# generate_3d: the key is the image content plus GENERATION_PARAMS and userId
+###############################################################################
+class FakePool:
+    @contextmanager
+    def borrow(self):
+        yield object()
+
+
+@pytest.fixture
+def generate(main, monkeypatch):
+    images = {}
+    runs = []
+    lock = threading.Lock()
+
+    def download_image(url, temp_path):
+        return {"sha256": images[url]}
+
+    def run_3d_pipeline(client, stages, image_path, user_id, timestamp, temp_files, report):
+        with lock:
+            runs.append(user_id)
+        time.sleep(0.2)
+        return {"preprocessed_url": f"{user_id}/preprocessed.png", "video_url": f"{user_id}/preview.mp4",
+                "glb_urls": [f"{user_id}/model.glb"], "timestamp": timestamp, "timings": {}}
+
+    monkeypatch.setattr(main, 'download_image', download_image)
+    monkeypatch.setattr(main, 'run_3d_pipeline', run_3d_pipeline)
+    monkeypatch.setattr(main, 'get_gradio_pool', FakePool)
+
+    def generate(url, user_id):
+        return main.generate_3d(url, user_id, [])
+
+    generate.images = images
+    generate.runs = runs
+    return generate
+
+
+def test_same_image_from_one_user_generates_once(generate):
+    generate.images.update({'https://a/1.png': 'f' * 64, 'https://b/copy.png': 'f' * 64})
+    urls = ['https://a/1.png', 'https://b/copy.png'] * 3
+    results = run_concurrently(6, lambda: generate(urls.pop(), 'alice'))
+    assert generate.runs == ['alice']
+    assert sorted(result['source'] for result in results) == ['coalesced'] * 5 + ['fresh']
+    assert generate('https://a/1.png', 'alice')['source'] == 'cached'
+    assert generate.runs == ['alice']
+
+
+def test_same_image_from_two_users_generates_twice(generate):
+    generate.images['https://a/1.png'] = 'f' * 64
+    users = ['alice', 'bob']
+    results = run_concurrently(2, lambda: generate('https://a/1.png', users.pop()))
+    assert sorted(generate.runs) == ['alice', 'bob']
+    assert sorted(result['glb_urls'][0] for result in results) == ['alice/model.glb', 'bob/model.glb']
+
+
+def test_different_images_generate_separately(generate):
+    generate.images.update({'https://a/1.png': '1' * 64, 'https://a/2.png': '2' * 64})
+    urls = ['https://a/1.png', 'https://a/2.png']
+    run_concurrently(2, lambda: generate(urls.pop(), 'alice'))
+    assert generate.runs == ['alice', 'alice']
@@ -0,0 +1,95 @@
+import tracing
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_histogram_buckets_are_upper_inclusive():
+    h = tracing.Histogram((1.0, 2.0, 5.0))
+    for value in (0.5, 1.0, 1.5, 2.0, 4.0, 7.0):
+        h.observe(value)
+    # le=1: 0.5, 1.0 / le=2: 1.5, 2.0 / le=5: 4.0 / +Inf: 7.0
+    assert h.counts == [2, 2, 1, 1]
+    assert h.count == 6
+    assert h.sum == 16.0
+
+
+def test_histogram_quantile_returns_bucket_bound():
+    h = tracing.Histogram((1.0, 2.0, 5.0))
+    assert h.quantile(0.5) == 0.0
+    for value in (0.5, 0.5, 1.5, 4.0):
+        h.observe(value)
+    assert h.quantile(0.5) == 1.0
+    assert h.quantile(0.75) == 2.0
+    assert h.quantile(1.0) == 5.0
+    h.observe(100.0)
+    assert h.quantile(1.0) == float('inf')
+
+
+def test_trace_collects_spans_with_fake_clock(monkeypatch):
+    clock = FakeClock()
+    registry = tracing.Registry(clock)
+    monkeypatch.setattr(tracing, 'registry', registry)
+
+    with tracing.trace('convert') as current:
+        clock.advance(0.1)
+        with tracing.span('download') as span:
+            clock.advance(0.3)
+            span.set(bytes=2048)
+    assert current.summary()['spans'] == [
+        {'bytes': 2048, 'name': 'download', 'outcome': 'ok', 'start': 0.1, 'duration': 0.3}]
+
+    exported = registry.export_json()
+    [duration] = exported['histograms']['stage_duration_seconds']
+    assert duration['labels'] == {'stage': 'download', 'outcome': 'ok'}
+    assert duration['count'] == 1
+    assert duration['sum'] == 0.3
+    assert duration['p50'] == 0.5
+    [request] = exported['histograms']['request_duration_seconds']
+    assert request['labels'] == {'endpoint': 'convert', 'outcome': 'ok'}
+    assert request['sum'] == 0.4
+    [size] = exported['histograms']['stage_bytes']
+    assert size['p50'] == 4096
+
+
+def test_export_prometheus_renders_cumulative_buckets():
+    registry = tracing.Registry(FakeClock())
+    registry.count('jobs_total', status='done')
+    registry.count('jobs_total', 2, status='done')
+    registry.observe('latency_seconds', 0.2, buckets=(0.1, 1.0), endpoint='convert')
+    registry.observe('latency_seconds', 0.05, buckets=(0.1, 1.0), endpoint='convert')
+    registry.observe('latency_seconds', 3.0, buckets=(0.1, 1.0), endpoint='convert')
+    registry.add_collector('pool', lambda: {'idle': 2, 'healthy': True, 'name': 'x'})
+
+    assert registry.export_prometheus().splitlines() == [
+        '# TYPE jobs_total counter',
+        'jobs_total{status="done"} 3',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{endpoint="convert",le="0.1"} 1',
+        'latency_seconds_bucket{endpoint="convert",le="1.0"} 2',
+        'latency_seconds_bucket{endpoint="convert",le="+Inf"} 3',
+        'latency_seconds_sum{endpoint="convert"} 3.25',
+        'latency_seconds_count{endpoint="convert"} 3',
+        # Booleans and strings from collectors are not gauges
+        '# TYPE pool_idle gauge',
+        'pool_idle 2',
+    ]
+
+
+def test_failing_collector_is_skipped():
+    registry = tracing.Registry(FakeClock())
+
+    def broken():
+        raise RuntimeError('stats unavailable')
+
+    registry.add_collector('broken', broken)
+    registry.add_collector('cache', lambda: {'hits': 4})
+    assert registry.export_json()['gauges'] == {'cache_hits': 4}
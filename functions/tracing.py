@@ -0,0 +1,257 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+###############################################################################
+# Stage Tracing and Metrics
+###############################################################################
+# span(name) times a block and records into in-process metrics:
+#   stage_duration_seconds{stage, outcome}   histogram
+#   stage_bytes{stage}                       histogram (when the span sets bytes)
+#   stage_total{stage, outcome}              counter
+#   request_duration_seconds{endpoint, outcome} histogram (per trace())
+# plus anything recorded with count()/observe(). If a request trace is active
+# (trace(name)), spans are also attached to it so the handler can return a
+# per-request summary. Traces follow contextvars, so work submitted through
+# pipeline.StagePipeline is attributed to the request that submitted it.
+#
+# export_json() / export_prometheus() render the registry for the metrics
+# endpoint; collectors registered with add_collector() contribute gauges
+# (cache/pool stats) at export time. The clock is swappable for tests.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                    30.0, 60.0, 120.0, 300.0, 600.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1 KiB .. 1 GiB
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (inf if past the last bucket)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            running += bucket_count
+            if running >= target:
+                return bound
+        return float('inf')
+
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {label_key: value}
+        self._histograms = {}  # name -> {label_key: Histogram}
+        self._collectors = {}  # prefix -> fn() -> {name: number}
+
+    def count(self, name: str, amount: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets=DURATION_BUCKETS, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def add_collector(self, prefix: str, fn):
+        with self._lock:
+            self._collectors[prefix] = fn
+
+    def _collect(self) -> dict:
+        with self._lock:
+            collectors = dict(self._collectors)
+        gauges = {}
+        for prefix, fn in collectors.items():
+            try:
+                values = fn() or {}
+            except Exception as e:
+                print(f"[tracing] Collector {prefix} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"{prefix}_{key}"] = value
+        return gauges
+
+    def export_json(self) -> dict:
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [{
+                    "labels": dict(key),
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "p50": h.quantile(0.5),
+                    "p90": h.quantile(0.9),
+                    "p99": h.quantile(0.99),
+                } for key, h in series.items()]
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms, "gauges": self._collect()}
+
+    def export_prometheus(self) -> str:
+        def fmt_labels(pairs):
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{fmt_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    running = 0
+                    for bound, bucket_count in zip(h.buckets, h.counts):
+                        running += bucket_count
+                        lines.append(f"{name}_bucket{fmt_labels(key + (('le', repr(bound)),))} {running}")
+                    lines.append(f"{name}_bucket{fmt_labels(key + (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{name}_sum{fmt_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{fmt_labels(key)} {h.count}")
+        for name, value in sorted(self._collect().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = Registry()
+
+
+###############################################################################
+# Spans and Request Traces
+###############################################################################
+class Trace:
+    def __init__(self, name: str, clock):
+        self.name = name
+        self.clock = clock
+        self.start = clock()
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "name": self.name,
+            "total": round(self.clock() - self.start, 3),
+            "spans": spans,
+        }
+
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def trace(name: str):
+    """Starts a per-request trace; spans inside (and in copied contexts) attach to it."""
+    current = Trace(name, registry.clock)
+    token = _current_trace.set(current)
+    outcome = 'error'
+    try:
+        yield current
+        outcome = 'ok'
+    finally:
+        _current_trace.reset(token)
+        registry.observe('request_duration_seconds', registry.clock() - current.start,
+                         endpoint=name, outcome=outcome)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times a block. Set span.set(bytes=...) to also record a size."""
+    current = Span(name, dict(attrs))
+    start = registry.clock()
+    outcome = 'error'
+    try:
+        yield current
+        outcome = 'ok'
+    finally:
+        duration = registry.clock() - start
+        registry.observe('stage_duration_seconds', duration, stage=name, outcome=outcome)
+        registry.count('stage_total', stage=name, outcome=outcome)
+        size = current.attrs.get('bytes')
+        if isinstance(size, (int, float)):
+            registry.observe('stage_bytes', size, buckets=SIZE_BUCKETS, stage=name)
+        print(f"[trace] {name} {outcome} in {duration:.2f}s" + (f" {current.attrs}" if current.attrs else ""))
+        active = _current_trace.get()
+        if active is not None:
+            active.add(dict(current.attrs, name=name, outcome=outcome,
+                            start=round(start - active.start, 3), duration=round(duration, 3)))
+
+
+def record(name: str, duration: float, outcome: str = 'ok', **attrs):
+    """Records a stage timed elsewhere (e.g. reported by a subprocess) like a finished span."""
+    end = registry.clock()
+    registry.observe('stage_duration_seconds', duration, stage=name, outcome=outcome)
+    registry.count('stage_total', stage=name, outcome=outcome)
+    active = _current_trace.get()
+    if active is not None:
+        active.add(dict(attrs, name=name, outcome=outcome,
+                        start=round(end - duration - active.start, 3), duration=round(duration, 3)))
+
+
+def traced(name: str = None):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, amount: float = 1, **labels):
+    registry.count(name, amount, **labels)
+
+
+def observe(name: str, value: float, buckets=DURATION_BUCKETS, **labels):
+    registry.observe(name, value, buckets, **labels)
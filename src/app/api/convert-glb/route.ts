@@ -3,13 +3,19 @@ import { getStorage, ref, getDownloadURL } from 'firebase/storage';
 import { app } from '@/lib/firebase/config';
 
 const BLENDER_SERVICE_URL = 'https://blender-service-815257559066.us-central1.run.app';
+// Plain STL stays in the list: stlUrl (and whatever callers store from it)
+// points at it. The gzip copy is what this route downloads.
+const DEFAULT_FORMATS = ['stl', 'stl_gzip'];
 
 export const runtime = 'nodejs';
 export const dynamic = 'force-dynamic';
 
 export async function POST(req: Request) {
   try {
-    const { glbUrl, designId } = await req.json();
+    // Optional: `lods` is passed through to the converter (e.g. [0.1]); `lod`
+    // picks which level to return instead of the full-resolution STL;
+    // `formats` replaces DEFAULT_FORMATS
+    const { glbUrl, designId, lods, lod, formats } = await req.json();
     console.log('Starting GLB conversion with URL:', glbUrl);
 
     // Call Blender service
@@ -18,7 +24,11 @@ export async function POST(req: Request) {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ 
         glbUrl: glbUrl,
-        designId: designId
+        designId: designId,
+        // gzip-encoded STL: a fraction of the bytes to upload and fetch back;
+        // storage decompresses it for us (Content-Encoding: gzip)
+        formats: Array.isArray(formats) && formats.length ? formats : DEFAULT_FORMATS,
+        ...(lods ? { lods } : {})
       })
     });
 
@@ -32,12 +42,16 @@ export async function POST(req: Request) {
     const data = await response.json();
     console.log('Received response:', data);
 
-    if (!data.stlUrl) {
+    const fullStlUrl = data.outputs?.stl_gzip?.url ?? data.stlUrl;
+    if (!fullStlUrl) {
       throw new Error('No STL URL in response');
     }
 
+    const lodLevel = typeof lod === 'number' ? data.lods?.[lod] : undefined;
+    const stlUrl = lodLevel?.url ?? fullStlUrl;
+
     // Download the STL from Firebase Storage
-    const stlResponse = await fetch(data.stlUrl);
+    const stlResponse = await fetch(stlUrl);
     if (!stlResponse.ok) {
       throw new Error('Failed to download STL from storage');
     }
@@ -48,8 +62,10 @@ export async function POST(req: Request) {
     return new NextResponse(stlData, {
       headers: {
         'Content-Type': 'application/octet-stream',
-        'Content-Disposition': `attachment; filename="${designId}.stl"`,
-        'Content-Length': stlData.byteLength.toString()
+        'Content-Disposition': `attachment; filename="${lodLevel ? `${designId}_lod${lod}` : designId}.stl"`,
+        'Content-Length': stlData.byteLength.toString(),
+        // Geometry report (watertight, volume, bbox, issues) for the manufacturing flow
+        ...(data.analysis ? { 'X-Mesh-Analysis': JSON.stringify(data.analysis) } : {})
       }
     });
 
@@ -4,6 +4,7 @@ import { useState } from 'react';
 import { useSearchParams } from 'next/navigation';
 import { Download, Crown, Info as InfoIcon, Package, AlertTriangle, Loader2, Factory } from 'lucide-react';
 import { useDesignStore } from '@/lib/store/designs';
+import { process3D } from '@/lib/api/process3d';
 import Link from 'next/link';
 import { useToast } from "@/components/ui/use-toast";
 import { useSession } from 'next-auth/react';
@@ -29,32 +30,11 @@ export default function GetFiles() {
     
     while (attempts < MAX_RETRIES) {
       try {
-        const response = await fetch('https://us-central1-taiyaki-test1.cloudfunctions.net/process_3d', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            image_url: design.images[0],
-            userId: 'default'  // Replace with actual user ID when auth is implemented
-          })
+        const data = await process3D({
+          imageUrl: design.images[0],
+          userId: 'default'  // Replace with actual user ID when auth is implemented
         });
 
-        const rawText = await response.text();
-        console.log('Raw response:', rawText);
-
-        let data;
-        try {
-          data = JSON.parse(rawText);
-        } catch (e) {
-          console.error('Failed to parse response:', e);
-          throw new Error('Invalid response from server');
-        }
-
-        if (!response.ok) {
-          throw new Error(data.error || 'Server error');
-        }
-
         if (data.success && data.video_url) {
           // Update the design with 3D data
           updateDesign(design.id, {
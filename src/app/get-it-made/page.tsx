@@ -21,6 +21,7 @@ import { Textarea } from '@/components/ui/textarea';
 import { MATERIAL_OPTIONS } from '@/lib/constants/materials';
 import SignInPopup from '@/components/SignInPopup';
 import { canDownloadFile, recordDownload, getUserSubscription } from '@/lib/firebase/subscriptions';
+import { process3D } from '@/lib/api/process3d';
 import { motion } from 'framer-motion';
 import Image from 'next/image';
 import { PLAN_LIMITS } from '@/types/subscription';
@@ -279,32 +280,11 @@ export default function GetItMade() {
     
     while (attempts < MAX_RETRIES) {
       try {
-        const response = await fetch('https://us-central1-taiyaki-test1.cloudfunctions.net/process_3d', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            image_url: design.images[0],
-            userId: session?.user?.id || 'default'
-          })
+        const data = await process3D({
+          imageUrl: design.images[0],
+          userId: session?.user?.id || 'default'
         });
 
-        const rawText = await response.text();
-        console.log('Raw response:', rawText);
-
-        let data;
-        try {
-          data = JSON.parse(rawText);
-        } catch (e) {
-          console.error('Failed to parse response:', e);
-          throw new Error('Invalid response from server');
-        }
-
-        if (!response.ok) {
-          throw new Error(data.error || 'Server error');
-        }
-
         if (data.success && data.video_url) {
           updateDesign(design.id, {
             threeDData: {
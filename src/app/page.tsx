@@ -18,6 +18,7 @@ import { DesignFeeSection } from '@/components/DesignFeeSection';
 import { SIZES } from '@/lib/types/sizes';
 import { saveDesignToFirebase } from '@/lib/firebase/utils';
 import { handleSignOut } from "@/lib/firebase/auth";
+import { process3D } from '@/lib/api/process3d';
 import { useAuth } from "@/contexts/AuthContext";
 
 const PROGRESS_STEPS = [
@@ -1761,32 +1762,11 @@ export default function LandingPage() {
     
     try {
       while (attempts < MAX_RETRIES) {
-        const response = await fetch('https://us-central1-taiyaki-test1.cloudfunctions.net/process_3d', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            image_url: selectedDesign,
-            userId: session?.user?.id || 'default'
-          })
+        const data = await process3D({
+          imageUrl: selectedDesign,
+          userId: session?.user?.id || 'default'
         });
 
-        const rawText = await response.text();
-        console.log('Raw response:', rawText);
-
-        let data;
-        try {
-          data = JSON.parse(rawText);
-        } catch (e) {
-          console.error('Failed to parse response:', e);
-          throw new Error('Invalid response from server');
-        }
-
-        if (!response.ok) {
-          throw new Error(data.error || 'Server error');
-        }
-
         if (data.success && data.video_url) {
           const currentDesign = designs.find(d => d.images.includes(selectedDesign));
           if (currentDesign) {
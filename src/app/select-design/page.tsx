@@ -19,6 +19,7 @@ import { DesignFeeSection } from '@/components/DesignFeeSection';
 import { SIZES } from '@/lib/types/sizes';
 import { saveDesignToFirebase } from '@/lib/firebase/utils';
 import { MATERIAL_OPTIONS } from '@/lib/constants/materials';
+import { process3D } from '@/lib/api/process3d';
 
 const PROGRESS_STEPS = [
   {
@@ -1710,33 +1711,11 @@ export default function LandingPage() {
     
     while (attempts < MAX_RETRIES) {
       try {
-        const response = await fetch('https://us-central1-taiyaki-test1.cloudfunctions.net/process_3d', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            image_url: selectedDesign,
-            userId: session?.user?.id || 'default'
-          })
+        const data = await process3D({
+          imageUrl: selectedDesign,
+          userId: session?.user?.id || 'default'
         });
 
-        // Get the raw response text first for debugging
-        const rawText = await response.text();
-        console.log('Raw response:', rawText);
-
-        let data;
-        try {
-          data = JSON.parse(rawText);
-        } catch (e) {
-          console.error('Failed to parse response:', e);
-          throw new Error('Invalid response from server');
-        }
-
-        if (!response.ok) {
-          throw new Error(data.error || 'Server error');
-        }
-
         if (data.success && data.video_url) {
           const currentDesign = designs.find(d => d.images.includes(selectedDesign));
           if (currentDesign) {
@@ -4,6 +4,7 @@ import { Button } from '@/components/ui/button';
 import { Loader2 } from 'lucide-react';
 import { useToast } from '@/components/ui/use-toast';
 import { Design } from '@/lib/store/designs';
+import { process3D } from '@/lib/api/process3d';
 
 interface Show3DButtonProps {
   design: Design | undefined;
@@ -32,23 +33,11 @@ export default function Show3DButton({
     
     setProcessing3D(true);
     try {
-      const response = await fetch('https://us-central1-taiyaki-test1.cloudfunctions.net/process_3d', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          image_url: design.images[0],
-          userId: design.userId || 'default'
-        })
+      const data = await process3D({
+        imageUrl: design.images[0],
+        userId: design.userId || 'default'
       });
 
-      const data = await response.json();
-
-      if (!response.ok) {
-        throw new Error(data.error || 'Failed to process 3D model');
-      }
-
       if (data.success) {
         toast({
           title: "Success",
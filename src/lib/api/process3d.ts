@@ -0,0 +1,121 @@
+// 3D generation runs as a job on the process_3d_jobs function: submit it,
+// follow its progress as server-sent events, and poll for the result. The
+// synchronous process_3d endpoint can't outlast the 540s function timeout.
+const JOBS_URL = 'https://us-central1-taiyaki-test1.cloudfunctions.net/process_3d_jobs';
+const POLL_INTERVAL_MS = 3000;
+// A running job fails itself at its deadline; allow for the last update to land
+const DEADLINE_GRACE_MS = 30_000;
+
+export interface Process3DResult {
+  success: boolean;
+  video_url: string;
+  preprocessed_url: string;
+  glb_urls: string[];
+  timestamp: number;
+  userId: string;
+  source?: string;
+}
+
+export interface Process3DJob {
+  id: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  stages: Record<string, Record<string, unknown>>;
+  result: Partial<Process3DResult> | null;
+  error: string | null;
+  deadline?: number;
+}
+
+interface SubmitResponse {
+  jobId: string;
+  status: string;
+  deadlineSeconds: number;
+}
+
+interface Process3DOptions {
+  imageUrl: string;
+  userId: string;
+  signal?: AbortSignal;
+  onProgress?: (job: Process3DJob) => void;
+}
+
+const sleep = (ms: number, signal?: AbortSignal) =>
+  new Promise<void>((resolve, reject) => {
+    const timer = setTimeout(resolve, ms);
+    signal?.addEventListener('abort', (event) => {
+      clearTimeout(timer);
+      reject((event.target as AbortSignal).reason);
+    }, { once: true });
+  });
+
+// Resolves when the job finishes or the stream closes; polling has the final word either way
+const followEvents = (
+  jobId: string,
+  signal: AbortSignal | undefined,
+  onEvent: (job: Process3DJob) => void
+) =>
+  new Promise<void>((resolve) => {
+    if (typeof EventSource === 'undefined') {
+      resolve();
+      return;
+    }
+    const source = new EventSource(`${JOBS_URL}/${jobId}/events`);
+    const close = () => {
+      source.close();
+      resolve();
+    };
+    source.addEventListener('progress', (event) => onEvent(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('done', (event) => {
+      onEvent(JSON.parse((event as MessageEvent).data));
+      close();
+    });
+    source.onerror = close;
+    signal?.addEventListener('abort', close, { once: true });
+  });
+
+export async function process3D({ imageUrl, userId, signal, onProgress }: Process3DOptions): Promise<Process3DResult> {
+  const submitResponse = await fetch(JOBS_URL, {
+    signal,
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({
+      image_url: imageUrl,
+      userId
+    })
+  });
+  const submitted = await submitResponse.json();
+  if (!submitResponse.ok) {
+    throw new Error(submitted.error || `Job submission failed: ${submitResponse.status}`);
+  }
+  const { jobId, deadlineSeconds }: SubmitResponse = submitted;
+
+  // Until the job reports its own deadline, assume it starts running right away
+  let deadline = Date.now() + deadlineSeconds * 1000 + DEADLINE_GRACE_MS;
+  const noteDeadline = (jobDeadline?: number | null) => {
+    if (jobDeadline) {
+      deadline = jobDeadline * 1000 + DEADLINE_GRACE_MS;
+    }
+  };
+
+  await followEvents(jobId, signal, (job) => {
+    noteDeadline(job.deadline);
+    onProgress?.(job);
+  });
+
+  while (true) {
+    const response = await fetch(`${JOBS_URL}/${jobId}/result`, { signal });
+    const data = await response.json();
+    if (response.status !== 202) {
+      if (!response.ok) {
+        throw new Error(data.error || `Job ${jobId} failed: ${response.status}`);
+      }
+      return data as Process3DResult;
+    }
+    noteDeadline(data.deadline);
+    if (Date.now() + POLL_INTERVAL_MS > deadline) {
+      throw new Error(`Job ${jobId} did not finish before its deadline`);
+    }
+    await sleep(POLL_INTERVAL_MS, signal);
+  }
+}